@@ -5,9 +5,6 @@ from flask_jwt_extended import JWTManager
 from apscheduler.schedulers.background import BackgroundScheduler
 from config import config
 import os
-
-from .utils.moderation import contains_sensitive_word, DEFAULT_SENSITIVE_WORDS
-from .utils.db import get_db_connection 
 from datetime import datetime 
 
 
@@ -16,6 +13,12 @@ db = SQLAlchemy()
 jwt = JWTManager()
 scheduler = BackgroundScheduler()
 
+from .utils.db import init_db_pool
+from .utils.migrate import migrate_on_startup
+from .utils.counts import init_count_cache
+from .utils.log_storage import init_log_storage
+from .utils.audit_log import init_audit_log
+
 def create_app(config_name='default'):
     app = Flask(__name__)
 
@@ -23,6 +26,12 @@ def create_app(config_name='default'):
     
     # 初始化扩展
     db.init_app(app)
+    init_db_pool(app)
+    # 先把数据库结构迁移到当前版本，再启动依赖新列/新表的组件
+    migrate_on_startup(app)
+    init_count_cache(app)
+    init_log_storage(app)
+    init_audit_log(app)
     jwt.init_app(app)
     CORS(app) # 保留
     
@@ -51,69 +60,39 @@ def create_app(config_name='default'):
     app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
     app.register_blueprint(review_bp, url_prefix='/api/reviews')
     
-    # 定时任务函数 - 自动审核评论
-    def auto_moderate_comments():
-
-        with app.app_context(): 
-            app.logger.info("Starting automatic comment moderation task...")
-            conn = None
-            try:
-                conn = get_db_connection() 
-                with conn.cursor() as cursor:
-                    query = "SELECT id, comment FROM comments WHERE passed = 1"
-                    cursor.execute(query)
-                    comments_to_review = cursor.fetchall()
-                    
-                    processed_count = 0 
-                    sensitive_updated_count = 0 
-
-                    if not comments_to_review:
-                        app.logger.info("No comments with passed=1 found for moderation at this time.")
-                        return 
-
-                    for comment_row in comments_to_review:
-                        comment_id = comment_row['id']
-                        comment_text = comment_row['comment']
-                        processed_count += 1
-                        
-                        if contains_sensitive_word(comment_text, DEFAULT_SENSITIVE_WORDS):
-                            update_query = "UPDATE comments SET passed = 0 WHERE id = %s"
-                            cursor.execute(update_query, (comment_id,))
-                            app.logger.info(f"Comment ID {comment_id} automatically marked as not passed (sensitive content found).")
-                            sensitive_updated_count += 1
-
-                    
-                    if sensitive_updated_count > 0: 
-                        conn.commit()
-                        app.logger.info(f"Moderation task: {sensitive_updated_count} comment(s) updated to passed=0 due to sensitive content.")
-
-                    app.logger.info(f"Automatic comment moderation task finished. Reviewed: {processed_count} comments. Updated due to sensitive content: {sensitive_updated_count}.")
-
-            except Exception as e:
-                if conn and conn.open: 
-                    try:
-                        conn.rollback()
-                        app.logger.warning("Transaction rolled back due to error in moderation task.")
-                    except Exception as rb_e:
-                        app.logger.error(f"Error during rollback: {rb_e}")
-                app.logger.error(f"Error during comment moderation task: {e}", exc_info=True)
-            finally:
-                if conn and conn.open: 
-                    conn.close()
-
     # 启动定时任务
     from .utils.backup import schedule_backup 
+    from .utils.moderation_job import run_auto_moderation
+    from .utils.scheduling import run_in_app_context
+    from .utils.dashboard import refresh_dashboard_snapshot
+    from .utils.log_storage import ensure_log_rollups, run_log_maintenance
+    from .utils.met_clear_delete import resume_delete_jobs
     
     with app.app_context(): 
 
         if not scheduler.get_job('auto_moderate_comments_task'):
-            scheduler.add_job(id='auto_moderate_comments_task', func=auto_moderate_comments, trigger='interval', minutes=1, misfire_grace_time=60)
+            scheduler.add_job(id='auto_moderate_comments_task', func=run_auto_moderation, args=[app], trigger='interval', minutes=1, misfire_grace_time=60, max_instances=1)
             app.logger.info("Automatic comment moderation task has been scheduled.")
         else:
             app.logger.info("Automatic comment moderation task was already scheduled.")
 
+        if not scheduler.get_job('refresh_dashboard_snapshot_task'):
+            scheduler.add_job(id='refresh_dashboard_snapshot_task', func=run_in_app_context, args=[app, refresh_dashboard_snapshot], trigger='interval', seconds=app.config['DASHBOARD_REFRESH_SECONDS'], misfire_grace_time=60, max_instances=1)
+            app.logger.info("Dashboard stats snapshot refresh task has been scheduled.")
+
+        # 启动后立即准备日志预聚合表（必要时回填），之后每天凌晨归档过期日志
+        scheduler.add_job(id='ensure_log_rollups_task', func=run_in_app_context, args=[app, ensure_log_rollups], trigger='date', replace_existing=True, misfire_grace_time=None)
+        if not scheduler.get_job('log_maintenance_task'):
+            scheduler.add_job(id='log_maintenance_task', func=run_in_app_context, args=[app, run_log_maintenance], trigger='cron', hour=4, minute=30, misfire_grace_time=3600, max_instances=1)
+            app.logger.info("Operation log maintenance task has been scheduled.")
+
+        # 继续执行中断（进程重启、数据库故障）的 met_clear 批量删除任务
+        if not scheduler.get_job('resume_batch_delete_jobs_task'):
+            scheduler.add_job(id='resume_batch_delete_jobs_task', func=run_in_app_context, args=[app, resume_delete_jobs, app], trigger='interval', seconds=app.config['BATCH_DELETE_STALE_SECONDS'], next_run_time=datetime.now(), misfire_grace_time=60, max_instances=1)
+            app.logger.info("Batch delete job recovery task has been scheduled.")
+
 
-        schedule_backup() 
+        schedule_backup(app) 
 
 
         if not scheduler.running:
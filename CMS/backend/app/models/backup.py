@@ -13,6 +13,13 @@ class BackupRecord(db.Model):
     backup_type = db.Column(db.String(20), nullable=False)  # 'manual', 'auto'
     status = db.Column(db.String(20), nullable=False)  # 'success', 'failed'
     description = db.Column(db.Text)
+    compression = db.Column(db.String(10))  # 'zstd', 'gzip', 'none'；为空表示升级前的未压缩备份
+    original_size = db.Column(db.BigInteger)  # 压缩前的导出大小，backup_size 为压缩后的文件大小
+    compression_ratio = db.Column(db.Float)
+    checksum = db.Column(db.String(64))  # 备份文件的 SHA-256
+    backup_kind = db.Column(db.String(20))  # 增量链中的 'full' / 'incremental'；为空表示独立的备份
+    parent_id = db.Column(db.Integer, index=True)  # 增量备份所基于的上一个备份
+    base_id = db.Column(db.Integer)  # 增量链起点的全量备份
     
     def to_dict(self):
         """转换为字典"""
@@ -23,5 +30,12 @@ class BackupRecord(db.Model):
             'backup_time': self.backup_time.strftime('%Y-%m-%d %H:%M:%S'),
             'backup_type': self.backup_type,
             'status': self.status,
-            'description': self.description
+            'description': self.description,
+            'compression': self.compression,
+            'original_size': self.original_size,
+            'compression_ratio': self.compression_ratio,
+            'checksum': self.checksum,
+            'backup_kind': self.backup_kind,
+            'parent_id': self.parent_id,
+            'base_id': self.base_id
         } 
\ No newline at end of file
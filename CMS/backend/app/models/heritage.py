@@ -57,33 +57,42 @@ class MetClear:
         conn.commit()
     
     @staticmethod
-    def search_items(conn, criteria):
-        """根据条件搜索元数据清洗表项目"""
-        # 注意：这个搜索实现比较基础，可能需要根据实际字段和需求进行优化
-        # 例如，对于多个搜索词，可能需要更复杂的查询逻辑
-        sql = "SELECT * FROM `met_clear` WHERE 1=1"
-        values = []
-        
-        # 假设 criteria 是一个字典，如 {'title': 'search_term', 'artist': 'another_term'}
-        # 并且我们希望在 met_clear 表中对应的字段中进行模糊匹配
-        # 请根据 met_clear 表的实际可搜索字段进行调整
-        # 例如，假设有 'title', 'artist', 'period', 'material' 等字段可以搜索
-        
+    def search_items(conn, criteria, with_engine=False):
+        """根据条件搜索元数据清洗表项目
+
+        title/artist/classify 以及组合关键词 keyword 优先走 ngram 全文索引（见 app.utils.search），
+        其余字段仍按 LIKE 模糊匹配。keyword 检索走全文索引时结果按相关度排序。
+
+        Args:
+            conn: 数据库连接
+            criteria: 如 {'title': 'search_term', 'keyword': '青铜'}
+            with_engine: 为 True 时返回 (结果列表, 检索引擎)
+        """
+        from app.utils.search import build_met_clear_search, FULLTEXT_COLUMNS
+
         searchable_fields = ['title', 'artist', 'period', 'material', 'dynasty', 'excavation_site', 'dimensions', 'description']
 
-        for field, term in criteria.items():
-            if field in searchable_fields and term:
-                sql += f" AND `{field}` LIKE %s"
-                values.append(f"%{term}%")
-            # 如果有更复杂的搜索逻辑（例如，一个关键词搜索多个字段），需要在这里实现
-            # elif field == 'keyword' and term: 
-            #    keyword_conditions = []
-            #    for s_field in ['title', 'artist', 'description']:
-            #        keyword_conditions.append(f"`{s_field}` LIKE %s")
-            #        values.append(f"%{term}%")
-            #    if keyword_conditions:
-            #        sql += " AND (" + " OR ".join(keyword_conditions) + ")"
-        
         with conn.cursor() as cursor:
+            plan = build_met_clear_search(
+                cursor,
+                {field: term for field, term in criteria.items() if field in FULLTEXT_COLUMNS},
+                criteria.get('keyword', '')
+            )
+            conditions = list(plan.conditions)
+            values = list(plan.params)
+
+            for field, term in criteria.items():
+                if field in searchable_fields and field not in FULLTEXT_COLUMNS and term:
+                    conditions.append(f"`{field}` LIKE %s")
+                    values.append(f"%{term}%")
+
+            sql = "SELECT * FROM `met_clear` WHERE 1=1"
+            if conditions:
+                sql += " AND " + " AND ".join(conditions)
+            if plan.relevance_sql:
+                sql += f" ORDER BY {plan.relevance_sql} DESC, `id` ASC"
+                values.extend(plan.relevance_params)
+
             cursor.execute(sql, tuple(values))
-            return cursor.fetchall() 
\ No newline at end of file
+            rows = cursor.fetchall()
+        return (rows, plan.engine) if with_engine else rows
@@ -10,7 +10,7 @@ class OperationLog(db.Model):
     admin_username = db.Column(db.String(50), nullable=False)
     operation_type = db.Column(db.String(50), nullable=False)  # 'user_manage', 'data_manage', 'backup', 'restore'
     operation_content = db.Column(db.Text)
-    operation_time = db.Column(db.DateTime, default=datetime.now)
+    operation_time = db.Column(db.DateTime, default=datetime.now, index=True)
     ip_address = db.Column(db.String(50))
     
     def to_dict(self):
@@ -23,4 +23,27 @@ class OperationLog(db.Model):
             'operation_content': self.operation_content,
             'operation_time': self.operation_time.strftime('%Y-%m-%d %H:%M:%S'),
             'ip_address': self.ip_address
-        } 
\ No newline at end of file
+        } 
+
+
+class OperationLogRollup(db.Model):
+    """操作日志预聚合表：按小时/天、操作类型、管理员统计日志条数"""
+    __tablename__ = 'operation_log_rollups'
+
+    granularity = db.Column(db.String(10), primary_key=True)  # 'hour', 'day'
+    bucket_start = db.Column(db.DateTime, primary_key=True)  # 时间段起点
+    operation_type = db.Column(db.String(50), primary_key=True)
+    admin_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class OperationLogRollupState(db.Model):
+    """预聚合表的回填状态（单行）
+
+    backfill_through_id 之后的日志由写入时增量维护；backfilled_at 非空表示此前的历史日志已回填完成。
+    """
+    __tablename__ = 'operation_log_rollup_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    backfill_through_id = db.Column(db.BigInteger, nullable=False, default=0)
+    backfilled_at = db.Column(db.DateTime)
@@ -0,0 +1,26 @@
+from app import db
+from datetime import datetime
+
+class ModerationCheckpoint(db.Model):
+    """自动审核任务的断点记录（高水位）"""
+    __tablename__ = 'moderation_checkpoints'
+
+    job_name = db.Column(db.String(50), primary_key=True)
+    last_comment_id = db.Column(db.Integer, nullable=False, default=0)  # 已审核到的最大评论ID
+    last_comment_time = db.Column(db.DateTime)  # 增量扫描的时间水位（上次扫描开始时的数据库时间）
+    word_list_version = db.Column(db.String(32))  # 已完成全量扫描所使用的词表版本
+    rescan_version = db.Column(db.String(32))  # 正在进行的全量扫描所使用的词表版本
+    rescan_from_id = db.Column(db.Integer, nullable=False, default=0)  # 全量扫描已处理到的评论ID
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'job_name': self.job_name,
+            'last_comment_id': self.last_comment_id,
+            'last_comment_time': self.last_comment_time.strftime('%Y-%m-%d %H:%M:%S') if self.last_comment_time else None,
+            'word_list_version': self.word_list_version,
+            'rescan_version': self.rescan_version,
+            'rescan_from_id': self.rescan_from_id,
+            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
+        }
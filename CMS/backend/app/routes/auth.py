@@ -2,7 +2,8 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from app import db
 from app.models.user import AdminUser
-from app.models.log import OperationLog
+from app.utils.audit_log import log_operation
+from app.utils.auth import jwt_role_claims
 from datetime import datetime, timedelta
 
 auth_bp = Blueprint('auth', __name__)
@@ -43,19 +44,18 @@ def login():
         db.session.commit()
         
         # 记录操作日志
-        log = OperationLog(
+        log_operation(
             admin_id=user.id,
             admin_username=user.username,
             operation_type='login',
             operation_content=f'用户 {username} 登录系统',
             ip_address=request.remote_addr
         )
-        db.session.add(log)
-        db.session.commit()
         
         # 创建访问令牌, 暂时恢复 identity 为不含 role
         access_token = create_access_token(
             identity={'id': user.id, 'username': user.username}, # 恢复: 移除 role
+            additional_claims=jwt_role_claims(user), # 角色声明，AUTH_TRUST_JWT_ROLE=true 时鉴权直接使用
             expires_delta=timedelta(hours=8)
         )
         # <<< 新增调试信息
@@ -102,15 +102,13 @@ def change_password():
     db.session.commit()
     
     # 记录操作日志
-    log = OperationLog(
+    log_operation(
         admin_id=user.id,
         admin_username=user.username,
         operation_type='password_change',
         operation_content=f'用户 {user.username} 修改了密码',
         ip_address=request.remote_addr
     )
-    db.session.add(log)
-    db.session.commit()
     
     return jsonify({'message': '密码修改成功'})
 
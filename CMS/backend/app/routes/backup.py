@@ -1,12 +1,16 @@
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, Response, request, jsonify, current_app, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.backup import BackupRecord
-from app.models.log import OperationLog
+from app.utils.audit_log import log_operation
+from app.utils.backup import remove_backup_files
+from app.utils.backup_jobs import (
+    BackupJobConflict, backup_job_status, cancel_backup_job, create_backup_job, database_key,
+    get_backup_job, list_backup_jobs, submit_backup_job
+)
+from app.utils.db import get_db_connection
+from app.utils.parallel_dump import iter_directory_tar
 import os
-import datetime
-import subprocess
-import platform
 
 from .user import role_required
 
@@ -44,78 +48,45 @@ def get_backup_records(current_user_from_decorator, **kwargs):
         return jsonify({'code': 50000, 'message': f'获取备份列表失败: {str(e)}'}), 500
 
 
-@backup_bp.route('', methods=['POST'])
-@role_required(['admin', 'super_admin'])
-def create_backup(current_user_from_decorator, **kwargs):
-    """创建数据库备份"""
-    admin_user = current_user_from_decorator
-    data = request.get_json()
-    description = data.get('description', '')
-    
-    # 生成备份文件名
-    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-    backup_name = f"backup_{timestamp}.sql"
-    backup_path = os.path.join(current_app.config['BACKUP_DIR'], backup_name)
-    
-    # 确保备份目录存在
-    os.makedirs(current_app.config['BACKUP_DIR'], exist_ok=True)
-    
+def _submit_job(job_type, admin_user, record_id=None, backup_type=None, description=None):
+    """登记并提交后台任务，立即返回任务信息；同一数据库已有未结束的任务时返回 409"""
+    config = current_app.config
+    conn = None
     try:
-        # 执行备份命令
-        if platform.system() == 'Windows':
-            # Windows 环境
-            cmd = f"mysqldump -h {current_app.config['DB_HOST']} -u {current_app.config['DB_USER']} -p{current_app.config['DB_PASSWORD']} {current_app.config['DB_NAME']} > {backup_path}"
-        else:
-            # Linux 环境
-            cmd = f"mysqldump -h {current_app.config['DB_HOST']} -u {current_app.config['DB_USER']} -p{current_app.config['DB_PASSWORD']} {current_app.config['DB_NAME']} > {backup_path}"
-        
-        subprocess.run(cmd, shell=True, check=True)
-        
-        # 获取文件大小
-        backup_size = os.path.getsize(backup_path)
-        
-        # 创建备份记录
-        record = BackupRecord(
-            backup_name=backup_name,
-            backup_path=backup_path,
-            backup_size=backup_size,
-            backup_type='manual',
-            status='success',
-            description=description
-        )
-        db.session.add(record)
-        db.session.commit()
-        
-        # 记录操作日志
-        log = OperationLog(
-            admin_id=admin_user.id,
-            admin_username=admin_user.username,
-            operation_type='backup',
-            operation_content=f'创建数据库备份 (ID: {record.id}, 名称: {backup_name})',
-            ip_address=request.remote_addr
+        conn = get_db_connection()
+        job_id = create_backup_job(
+            conn, job_type, database_key(config), record_id=record_id, backup_type=backup_type,
+            description=description, admin_id=admin_user.id, admin_username=admin_user.username,
+            ip_address=request.remote_addr, stale_seconds=config.get('BACKUP_JOB_STALE_SECONDS', 900)
         )
-        db.session.add(log)
-        db.session.commit()
-        
+        job = get_backup_job(conn, job_id)
+        submit_backup_job(current_app._get_current_object(), job_id)
         return jsonify({
-            'message': '备份成功',
-            'record': record.to_dict()
+            'code': 20000,
+            'data': backup_job_status(job),
+            'message': '已提交备份任务' if job_type == 'backup' else '已提交恢复任务'
         })
-        
+    except BackupJobConflict as e:
+        return jsonify({
+            'code': 40900,
+            'data': backup_job_status(e.job) if e.job else None,
+            'message': f'{e}，请等待其完成或取消后再试'
+        }), 409
     except Exception as e:
-        # 备份失败，记录失败信息
-        record = BackupRecord(
-            backup_name=backup_name,
-            backup_path=backup_path,
-            backup_size=0,
-            backup_type='manual',
-            status='failed',
-            description=f"{description}\n错误信息: {str(e)}"
-        )
-        db.session.add(record)
-        db.session.commit()
-        
-        return jsonify({'message': f'备份失败: {str(e)}'}), 500
+        current_app.logger.error(f"Error submitting {job_type} job: {e}")
+        return jsonify({'code': 50000, 'message': f'提交任务失败: {str(e)}'}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
+@backup_bp.route('', methods=['POST'])
+@role_required(['admin', 'super_admin'])
+def create_backup(current_user_from_decorator, **kwargs):
+    """提交数据库备份任务，立即返回 job_id；进度通过 GET /jobs/<job_id> 查询"""
+    data = request.get_json() or {}
+    return _submit_job('backup', current_user_from_decorator, backup_type='manual',
+                       description=data.get('description', ''))
 
 
 @backup_bp.route('/<int:record_id>', methods=['GET'])
@@ -129,6 +100,14 @@ def download_backup(record_id, current_user_from_decorator, **kwargs):
         
     if not os.path.exists(record.backup_path):
         return jsonify({'message': '备份文件不存在'}), 404
+
+    if os.path.isdir(record.backup_path):
+        # 并行备份是目录，打包为 tar 流式下载（分块文件本身已压缩）
+        return Response(
+            iter_directory_tar(record.backup_path),
+            mimetype='application/x-tar',
+            headers={'Content-Disposition': f'attachment; filename={record.backup_name}.tar'}
+        )
         
     return send_file(record.backup_path, as_attachment=True)
 
@@ -136,8 +115,7 @@ def download_backup(record_id, current_user_from_decorator, **kwargs):
 @backup_bp.route('/<int:record_id>/restore', methods=['POST'])
 @role_required(['admin', 'super_admin'])
 def restore_backup(record_id, current_user_from_decorator, **kwargs):
-    """恢复数据库备份"""
-    admin_user = current_user_from_decorator
+    """提交数据库恢复任务，立即返回 job_id；校验备份（含整条增量链）与恢复都在后台执行"""
     record = BackupRecord.query.get(record_id)
     
     if not record:
@@ -145,33 +123,74 @@ def restore_backup(record_id, current_user_from_decorator, **kwargs):
         
     if not os.path.exists(record.backup_path):
         return jsonify({'message': '备份文件不存在'}), 404
-        
+
+    return _submit_job('restore', current_user_from_decorator, record_id=record.id)
+
+
+@backup_bp.route('/jobs', methods=['GET'])
+@role_required(['admin', 'super_admin'])
+def get_backup_jobs(current_user_from_decorator, **kwargs):
+    """最近的备份/恢复任务列表"""
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    conn = None
     try:
-        # 执行恢复命令
-        if platform.system() == 'Windows':
-            # Windows 环境
-            cmd = f"mysql -h {current_app.config['DB_HOST']} -u {current_app.config['DB_USER']} -p{current_app.config['DB_PASSWORD']} {current_app.config['DB_NAME']} < {record.backup_path}"
-        else:
-            # Linux 环境
-            cmd = f"mysql -h {current_app.config['DB_HOST']} -u {current_app.config['DB_USER']} -p{current_app.config['DB_PASSWORD']} {current_app.config['DB_NAME']} < {record.backup_path}"
-        
-        subprocess.run(cmd, shell=True, check=True)
-        
-        # 记录操作日志
-        log = OperationLog(
+        conn = get_db_connection()
+        jobs = list_backup_jobs(conn, limit)
+        return jsonify({'code': 20000, 'data': {'items': [backup_job_status(job) for job in jobs]}})
+    except Exception as e:
+        current_app.logger.error(f"Error fetching backup jobs: {e}")
+        return jsonify({'code': 50000, 'message': '获取任务列表失败'}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
+@backup_bp.route('/jobs/<job_id>', methods=['GET'])
+@role_required(['admin', 'super_admin'])
+def get_backup_job_status(job_id, current_user_from_decorator, **kwargs):
+    """查询备份/恢复任务的进度（字节/行/表数）与预计剩余时间"""
+    conn = None
+    try:
+        conn = get_db_connection()
+        job = get_backup_job(conn, job_id)
+        if not job:
+            return jsonify({'code': 40400, 'message': '任务不存在'}), 404
+        return jsonify({'code': 20000, 'data': backup_job_status(job)})
+    except Exception as e:
+        current_app.logger.error(f"Error fetching backup job {job_id}: {e}")
+        return jsonify({'code': 50000, 'message': '获取任务失败'}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
+@backup_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+@role_required(['admin', 'super_admin'])
+def cancel_backup_job_route(job_id, current_user_from_decorator, **kwargs):
+    """取消备份/恢复任务；运行中的任务在下一次报告进度时中止"""
+    admin_user = current_user_from_decorator
+    conn = None
+    try:
+        conn = get_db_connection()
+        if not get_backup_job(conn, job_id):
+            return jsonify({'code': 40400, 'message': '任务不存在'}), 404
+        job = cancel_backup_job(conn, job_id)
+        if job['status'] not in ('cancelling', 'cancelled'):
+            return jsonify({'code': 40900, 'data': backup_job_status(job), 'message': '任务已结束，无法取消'}), 409
+        log_operation(
             admin_id=admin_user.id,
             admin_username=admin_user.username,
-            operation_type='restore',
-            operation_content=f'恢复数据库备份 (ID: {record.id}, 名称: {record.backup_name})',
+            operation_type=job['job_type'],
+            operation_content=f"取消{'备份' if job['job_type'] == 'backup' else '恢复'}任务 {job_id}",
             ip_address=request.remote_addr
         )
-        db.session.add(log)
-        db.session.commit()
-        
-        return jsonify({'message': '恢复成功'})
-        
+        return jsonify({'code': 20000, 'data': backup_job_status(job), 'message': '已请求取消任务'})
     except Exception as e:
-        return jsonify({'message': f'恢复失败: {str(e)}'}), 500
+        current_app.logger.error(f"Error cancelling backup job {job_id}: {e}")
+        return jsonify({'code': 50000, 'message': '取消任务失败'}), 500
+    finally:
+        if conn:
+            conn.close()
 
 
 @backup_bp.route('/<int:record_id>', methods=['DELETE'])
@@ -184,20 +203,22 @@ def delete_backup(record_id, current_user_from_decorator, **kwargs):
     if not record:
         return jsonify({'message': '备份记录不存在'}), 404
         
+    dependants = BackupRecord.query.filter_by(parent_id=record.id).count()
+    if dependants:
+        return jsonify({'message': f'有 {dependants} 个增量备份依赖此备份，请先删除这些增量备份'}), 409
+        
     try:
-        # 删除备份文件
-        if os.path.exists(record.backup_path):
-            os.remove(record.backup_path)
+        # 删除备份文件（并行备份为目录）
+        remove_backup_files(record.backup_path)
             
         # 记录操作日志
-        log = OperationLog(
+        log_operation(
             admin_id=admin_user.id,
             admin_username=admin_user.username,
             operation_type='backup',
             operation_content=f'删除数据库备份 (ID: {record.id}, 名称: {record.backup_name})',
             ip_address=request.remote_addr
         )
-        db.session.add(log)
         
         # 删除备份记录
         db.session.delete(record)
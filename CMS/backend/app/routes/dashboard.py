@@ -1,80 +1,34 @@
 from flask import Blueprint, jsonify, current_app
-from app import db # For SQLAlchemy models like AdminUser, BackupRecord
-from app.models.log import OperationLog
-from app.models.user import AdminUser
-# MetClear is not an SQLAlchemy model in the same way, it uses direct DB connections
-# from app.models.heritage import MetClear # Remove this if MetClear is not a standard SQLAlchemy model here
-from .user import get_cloud_db_connection # To connect to cloud DB for mobile_users, web_users, and met_clear
-from datetime import datetime, date
+from .user import role_required
+from app.utils.db import get_pool_stats
+from app.utils.dashboard import get_dashboard_snapshot
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 @dashboard_bp.route('/stats', methods=['GET'])
 def get_dashboard_stats():
-    try:
-        heritage_count = 0
-        conn = None # Initialize conn outside try block for broader scope
-        try:
-            conn = get_cloud_db_connection()
-            with conn.cursor() as cursor:
-                # 1. 文物总数 (met_clear table)
-                cursor.execute("SELECT COUNT(*) as count FROM met_clear")
-                result = cursor.fetchone()
-                if result:
-                    heritage_count = result['count']
-                
-                # 2. 用户总数 (part 1: cloud users)
-                mobile_user_count = 0
-                cursor.execute("SELECT COUNT(*) as count FROM mobile_users")
-                result = cursor.fetchone()
-                if result:
-                    mobile_user_count = result['count']
-                
-                web_user_count = 0
-                cursor.execute("SELECT COUNT(*) as count FROM web_users")
-                result = cursor.fetchone()
-                if result:
-                    web_user_count = result['count']
-        except Exception as e:
-            current_app.logger.error(f"Error fetching cloud data (heritage/users): {e}")
-            # Depending on desired behavior, you might want to re-raise or return error here
-        finally:
-            if conn:
-                conn.close()
-
-        # 2. 用户总数 (part 2: admin users and total)
-        admin_user_count = AdminUser.query.count() # This uses SQLAlchemy
-        total_user_count = admin_user_count + mobile_user_count + web_user_count
+    """获取仪表盘统计数据
 
-        # 3. 备份数量 (backup_records table)
-        from app.models.backup import BackupRecord # SQLAlchemy model
-        backup_count = BackupRecord.query.count()
-
-        # 4. 今日访问量 (管理员今日登录次数)
-        today_start = datetime.combine(date.today(), datetime.min.time())
-        today_logins = OperationLog.query.filter(
-            OperationLog.operation_type == 'login',
-            OperationLog.operation_time >= today_start
-        ).count() # SQLAlchemy model
+    数据来自进程内快照（定时刷新，超出 DASHBOARD_STALENESS_SECONDS 时按需重算）。
+    """
+    try:
+        stats, generated_at, age = get_dashboard_snapshot()
+        data = dict(stats)
+        data['snapshot_time'] = generated_at.strftime('%Y-%m-%d %H:%M:%S') if generated_at else None
+        data['snapshot_age_seconds'] = round(age, 3)
+        return jsonify({'code': 20000, 'data': data}), 200
 
-        # 5. 最近操作记录
-        recent_logs = OperationLog.query.order_by(OperationLog.operation_time.desc()).limit(5).all()
-        recent_logs_data = [log.to_dict() for log in recent_logs]
+    except Exception as e:
+        current_app.logger.error(f"Error fetching dashboard stats: {e}")
+        return jsonify({'code': 50000, 'message': f'获取仪表盘数据失败: {str(e)}'}), 500
 
-        return jsonify({
-            'code': 20000,
-            'data': {
-                'heritage_count': heritage_count,
-                'total_user_count': total_user_count,
-                'admin_user_count': admin_user_count,
-                'mobile_user_count': mobile_user_count,
-                'web_user_count': web_user_count,
-                'backup_count': backup_count,
-                'today_visits': today_logins,
-                'recent_logs': recent_logs_data
-            }
-        }), 200
 
+@dashboard_bp.route('/pool', methods=['GET'])
+@role_required(['admin', 'super_admin'])
+def get_db_pool_stats(current_user_from_decorator, **kwargs):
+    """获取数据库连接池指标（借出数、等待数、新建数、回收数等）"""
+    try:
+        return jsonify({'code': 20000, 'data': get_pool_stats()}), 200
     except Exception as e:
-        current_app.logger.error(f"Error fetching dashboard stats: {e}")
-        return jsonify({'code': 50000, 'message': f'获取仪表盘数据失败: {str(e)}'}), 500 
\ No newline at end of file
+        current_app.logger.error(f"Error fetching db pool stats: {e}")
+        return jsonify({'code': 50000, 'message': f'获取连接池状态失败: {str(e)}'}), 500
@@ -1,11 +1,23 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app import db
-from app.models.user import AdminUser
 from app.models.heritage import MetClear
-from app.models.log import OperationLog
-import pymysql
+from app.utils.audit_log import log_operation
+from app.utils.auth import get_current_admin
+from app.utils.db import get_db_connection
+from app.utils.pagination import encode_cursor, decode_cursor, build_keyset_clause
+from app.utils.counts import resolve_total, get_count_mode, invalidate_counts
+from app.utils.search import build_met_clear_search
+from app.utils.met_clear_delete import (
+    create_delete_job, delete_job_status, get_delete_job, get_delete_job_ids, submit_delete_job
+)
+from app.utils.met_clear_bulk import MAX_BULK_UPDATE_ITEMS, bulk_update_by_filter, bulk_update_patches, validate_update_fields
+from app.utils.met_clear_import import ImportFileError, ImportJobStore, detect_format, get_met_clear_schema, job_to_dict
+from app.utils.met_clear_import_jobs import submit_import_job
 import json
+import os
+import time
+import uuid
 import functools
 
 heritage_bp = Blueprint('heritage', __name__)
@@ -16,8 +28,7 @@ def heritage_require_permission(permission):
         @jwt_required()
         @functools.wraps(fn)  # 这保留了原始函数的名称和元数据
         def wrapper(*args, **kwargs):
-            identity = get_jwt_identity()
-            user = AdminUser.query.get(identity['id'])
+            user = get_current_admin()
             
             if not user:
                 return jsonify({'message': '用户不存在'}), 404
@@ -30,16 +41,9 @@ def heritage_require_permission(permission):
     return decorator
 
 
+# 从进程级连接池借出数据库连接（close() 即归还）
 def get_cloud_db_connection():
-    return pymysql.connect(
-        host=current_app.config['DB_HOST'],
-        port=current_app.config['DB_PORT'],
-        user=current_app.config['DB_USER'],
-        password=current_app.config['DB_PASSWORD'],
-        database=current_app.config['DB_NAME'],
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return get_db_connection()
 
 
 @heritage_bp.route('/met-clear', methods=['GET'])
@@ -50,10 +54,16 @@ def get_met_clear_items():
     title_filter = request.args.get('title', '')
     artist_filter = request.args.get('artist', '')
     classify_filter = request.args.get('classify', '')
+    keyword = request.args.get('keyword', '') # 组合关键词，同时检索 title/artist/classify
+    search_engine = request.args.get('engine') # 可选 auto/fulltext/like，用于对比两种检索路径
+    if search_engine not in ['auto', 'fulltext', 'like']:
+        search_engine = None
     
     # 获取排序参数
     sort_by = request.args.get('sort_by', 'id')
     order = request.args.get('order', 'asc').lower() # 前端已设为asc，这里转小写确保一致
+    # sort_by=relevance 按全文检索相关度排序（仅对 keyword 检索且非游标分页时生效）
+    sort_by_relevance = sort_by == 'relevance'
 
     # 参数校验
     allowed_sort_columns = ['id', 'title', 'artist', 'age', 'classify'] # 可根据实际情况调整允许排序的列
@@ -61,6 +71,21 @@ def get_met_clear_items():
         sort_by = 'id' # 如果传入无效列名，则默认按id排序
     if order not in ['asc', 'desc']:
         order = 'asc' # 如果传入无效排序方向，则默认升序
+
+    # 游标(keyset)分页: 传入 after 或 before 参数即启用 (首页可传空的 after)
+    # 按 (排序列, id) 定位，不再 OFFSET 扫描丢弃前面的行，深翻页与首页开销相同
+    cursor_mode = 'after' in request.args or 'before' in request.args
+    after_cursor = request.args.get('after', '')
+    before_cursor = request.args.get('before', '')
+    seek = None
+    if cursor_mode:
+        try:
+            if before_cursor:
+                seek = ('before',) + decode_cursor(before_cursor, sort_by, order)
+            elif after_cursor:
+                seek = ('after',) + decode_cursor(after_cursor, sort_by, order)
+        except ValueError as e:
+            return jsonify({'code': 40000, 'message': str(e)}), 400
     
     try:
         conn = get_cloud_db_connection()
@@ -69,47 +94,74 @@ def get_met_clear_items():
             count_query = f"SELECT COUNT(*) as total {base_query}"
             data_query = f"SELECT * {base_query}"
             
-            conditions = []
-            params = []
-
-            # Build conditions based on individual filters
-            if title_filter:
-                conditions.append("title LIKE %s")
-                params.append(f'%{title_filter}%')
-            if artist_filter:
-                conditions.append("artist LIKE %s")
-                params.append(f'%{artist_filter}%')
-            if classify_filter:
-                # Assuming the database column name is 'classify' for the "分类" field
-                conditions.append("classify LIKE %s") 
-                params.append(f'%{classify_filter}%')
+            # Build conditions based on individual filters and the combined keyword
+            # (uses the ngram FULLTEXT index when present, otherwise LIKE)
+            plan = build_met_clear_search(
+                cursor,
+                {'title': title_filter, 'artist': artist_filter, 'classify': classify_filter},
+                keyword, search_engine
+            )
+            conditions = list(plan.conditions)
+            params = list(plan.params)
             
             if conditions:
                 where_clause = " WHERE " + " AND ".join(conditions)
                 count_query += where_clause
                 data_query += where_clause
 
-            cursor.execute(count_query, tuple(params))
-            total_records_result = cursor.fetchone()
-            total_records = total_records_result['total'] if total_records_result else 0
+            def count_met_clear():
+                cursor.execute(count_query, tuple(params))
+                total_records_result = cursor.fetchone()
+                return total_records_result['total'] if total_records_result else 0
+
+            total_records, total_type = resolve_total(
+                'met_clear', ('met_clear',),
+                {'title': title_filter, 'artist': artist_filter, 'classify': classify_filter, 'keyword': keyword},
+                count_met_clear, get_count_mode()
+            )
+
+            query_started = time.perf_counter()
+            if cursor_mode:
+                page_data = _fetch_met_clear_keyset_page(cursor, conditions, params, sort_by, order, limit, seek)
+                conn.close()
+                page_data['total'] = total_records
+                page_data['total_type'] = total_type
+                page_data['search_engine'] = plan.engine
+                page_data['query_ms'] = round((time.perf_counter() - query_started) * 1000, 3)
+                return jsonify({'code': 20000, 'data': page_data}), 200
             
             # Add LIMIT and OFFSET for pagination AFTER filtering and counting
             # Need to re-add params for pagination if they were used in conditions for count
+            # 多取一行用于判断 has_more（count=none 模式下客户端依赖它翻页）
             pagination_params = list(params) 
-            pagination_params.extend([limit, (page - 1) * limit])
+            pagination_params.extend([limit + 1, (page - 1) * limit])
             
             # 构建动态的 ORDER BY 子句
             # 注意: 直接将 sort_by 和 order 拼接到SQL字符串中，需要确保这两个变量是安全的
             # (已经通过上面的校验来限制允许的值)
-            data_query += f" ORDER BY `{sort_by}` {order.upper()} LIMIT %s OFFSET %s"
+            if sort_by_relevance and plan.relevance_sql:
+                data_query = data_query.replace("SELECT *", f"SELECT *, {plan.relevance_sql} AS relevance", 1)
+                pagination_params = plan.relevance_params + pagination_params
+                data_query += " ORDER BY relevance DESC, `id` ASC LIMIT %s OFFSET %s"
+            else:
+                data_query += f" ORDER BY `{sort_by}` {order.upper()} LIMIT %s OFFSET %s"
             
             cursor.execute(data_query, tuple(pagination_params))
             items = cursor.fetchall()
+            has_more = len(items) > limit
+            items = items[:limit]
+            query_ms = round((time.perf_counter() - query_started) * 1000, 3)
         conn.close()
+        if plan.engine:
+            current_app.logger.debug(f"met_clear search served by {plan.engine} in {query_ms} ms")
         return jsonify({
             'code': 20000, 
             'data': {
                 'total': total_records,
+                'total_type': total_type,
+                'has_more': has_more,
+                'search_engine': plan.engine,
+                'query_ms': query_ms,
                 'items': items
             }
         }), 200
@@ -118,6 +170,57 @@ def get_met_clear_items():
         return jsonify({'code': 50000, 'message': f'获取数据失败: {str(e)}'}), 500
 
 
+def _fetch_met_clear_keyset_page(cursor, conditions, params, sort_by, order, limit, seek):
+    """按游标获取 met_clear 的一页数据
+
+    Args:
+        seek: None 表示第一页，否则为 ('after'|'before', 排序列值, id)
+
+    Returns:
+        包含 items / next_cursor / prev_cursor / has_more 的字典
+    """
+    direction = seek[0] if seek else 'after'
+    # 向前翻页(before)时反向扫描，取到后再翻转回请求的顺序
+    scan_desc = (order == 'desc') != (direction == 'before')
+    conditions = list(conditions)
+    query_params = list(params)
+    if seek:
+        clause, clause_params = build_keyset_clause(sort_by, seek[1], seek[2], '<' if scan_desc else '>')
+        conditions.append(clause)
+        query_params.extend(clause_params)
+
+    scan_order = 'DESC' if scan_desc else 'ASC'
+    order_clause = f"`id` {scan_order}" if sort_by == 'id' else f"`{sort_by}` {scan_order}, `id` {scan_order}"
+    sql = "SELECT * FROM met_clear"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {order_clause} LIMIT %s"
+    query_params.append(limit + 1) # 多取一行用于判断是否还有下一页
+
+    cursor.execute(sql, tuple(query_params))
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    if direction == 'before':
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if direction == 'after':
+            next_cursor = encode_cursor(sort_by, order, rows[-1]) if has_more else None
+            prev_cursor = encode_cursor(sort_by, order, rows[0]) if seek else None
+        else:
+            next_cursor = encode_cursor(sort_by, order, rows[-1])
+            prev_cursor = encode_cursor(sort_by, order, rows[0]) if has_more else None
+
+    return {
+        'items': rows,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'has_more': has_more
+    }
+
+
 @heritage_bp.route('/met-clear/<int:item_id>', methods=['GET'])
 @jwt_required()
 def get_met_clear_item(item_id):
@@ -152,12 +255,10 @@ def create_met_clear_item():
             cursor.execute(sql, list(data.values()))
             new_id = cursor.lastrowid
         conn.commit()
+        invalidate_counts('met_clear')
         conn.close()
-        identity = get_jwt_identity()
-        admin = AdminUser.query.get(identity['id'])
-        log = OperationLog(admin_id=admin.id, admin_username=admin.username, operation_type='create_heritage', operation_content=f'创建文物(met_clear): ID {new_id}', ip_address=request.remote_addr)
-        db.session.add(log)
-        db.session.commit()
+        admin = get_current_admin()
+        log_operation(admin_id=admin.id, admin_username=admin.username, operation_type='create_heritage', operation_content=f'创建文物(met_clear): ID {new_id}', ip_address=request.remote_addr)
         return jsonify({'code': 20000, 'data': {'id': new_id}, 'message': '创建成功'}), 201
     except Exception as e:
         current_app.logger.error(f"Error creating met_clear item: {e}")
@@ -188,11 +289,9 @@ def update_met_clear_item(item_id):
             sql = f"UPDATE `met_clear` SET {set_clause} WHERE `id` = %s"
             cursor.execute(sql, tuple(values))
         conn.commit()
-        identity = get_jwt_identity()
-        admin = AdminUser.query.get(identity['id'])
-        log = OperationLog(admin_id=admin.id, admin_username=admin.username, operation_type='update_heritage', operation_content=f'更新文物(met_clear): ID {item_id}', ip_address=request.remote_addr)
-        db.session.add(log)
-        db.session.commit()
+        invalidate_counts('met_clear')
+        admin = get_current_admin()
+        log_operation(admin_id=admin.id, admin_username=admin.username, operation_type='update_heritage', operation_content=f'更新文物(met_clear): ID {item_id}', ip_address=request.remote_addr)
         return jsonify({'code': 20000, 'message': '更新成功'}), 200
     except Exception as e:
         current_app.logger.error(f"Error updating met_clear item {item_id}: {e}")
@@ -214,11 +313,9 @@ def delete_met_clear_item(item_id):
                 return jsonify({'code': 40400, 'message': '记录未找到'}), 404
             cursor.execute("DELETE FROM met_clear WHERE id = %s", (item_id,))
         conn.commit()
-        identity = get_jwt_identity()
-        admin = AdminUser.query.get(identity['id'])
-        log = OperationLog(admin_id=admin.id, admin_username=admin.username, operation_type='delete_heritage', operation_content=f'删除文物(met_clear): ID {item_id}', ip_address=request.remote_addr)
-        db.session.add(log)
-        db.session.commit()
+        invalidate_counts('met_clear')
+        admin = get_current_admin()
+        log_operation(admin_id=admin.id, admin_username=admin.username, operation_type='delete_heritage', operation_content=f'删除文物(met_clear): ID {item_id}', ip_address=request.remote_addr)
         return jsonify({'code': 20000, 'message': '删除成功'}), 200
     except Exception as e:
         current_app.logger.error(f"Error deleting met_clear item {item_id}: {e}")
@@ -231,6 +328,7 @@ def delete_met_clear_item(item_id):
 @heritage_bp.route('/met-clear/batch-delete', methods=['DELETE'])
 @jwt_required() # 或者使用 @heritage_require_permission 如果有特定的批量删除权限
 def batch_delete_met_clear_items():
+    """提交批量删除任务，立即返回 job_id；删除在后台按块执行，进度通过 GET /met-clear/batch-delete/<job_id> 查询"""
     data = request.get_json()
     if not data or 'ids' not in data:
         return jsonify({'code': 40000, 'message': '请求数据无效，缺少ids字段'}), 400
@@ -245,39 +343,187 @@ def batch_delete_met_clear_items():
     conn = None  # Ensure conn is defined for finally block
     try:
         conn = get_cloud_db_connection()
-        with conn.cursor() as cursor:
-            # 构建占位符字符串, e.g., (%s, %s, %s)
-            placeholders = ', '.join(['%s'] * len(item_ids))
-            # SQL语句，使用IN子句进行批量删除
-            sql = f"DELETE FROM met_clear WHERE id IN ({placeholders})"
-            
-            # 执行删除操作
-            rows_deleted = cursor.execute(sql, tuple(item_ids))
-        
-        conn.commit() # 提交事务
-
-        identity = get_jwt_identity()
-        admin = AdminUser.query.get(identity['id'])
-        log_content = f'批量删除文物(met_clear): 共 {rows_deleted} 条, IDs: {json.dumps(item_ids)}'
-        if len(log_content) > 255: # 假设 operation_content 长度限制为255
-            log_content = f'批量删除文物(met_clear): 共 {rows_deleted} 条, IDs: {json.dumps(item_ids)[:200]}...'
-        
-        log = OperationLog(
-            admin_id=admin.id, 
-            admin_username=admin.username, 
-            operation_type='batch_delete_heritage', # 新的操作类型
-            operation_content=log_content, 
-            ip_address=request.remote_addr
+        admin = get_current_admin()
+        job_id = create_delete_job(
+            conn, item_ids, current_app.config.get('BATCH_DELETE_CHUNK_SIZE', 1000),
+            admin_id=admin.id, admin_username=admin.username, ip_address=request.remote_addr
         )
-        db.session.add(log)
-        db.session.commit() # 提交日志事务
-
-        return jsonify({'code': 20000, 'message': f'成功删除 {rows_deleted} 条记录'}), 200
+        job = get_delete_job(conn, job_id)
+        submit_delete_job(current_app._get_current_object(), job_id)
+        return jsonify({
+            'code': 20000,
+            'data': delete_job_status(job),
+            'message': f"已提交批量删除任务，共 {job['total_ids']} 条"
+        }), 200
 
     except Exception as e:
         if conn: conn.rollback() # 如果发生错误，回滚事务
-        current_app.logger.error(f"Error batch deleting met_clear items: {e}")
+        current_app.logger.error(f"Error submitting met_clear batch delete job: {e}")
         return jsonify({'code': 50000, 'message': f'批量删除失败: {str(e)}'}), 500
     finally:
         if conn and conn.open:
-            conn.close() 
\ No newline at end of file
+            conn.close()
+
+
+@heritage_bp.route('/met-clear/batch-delete/<job_id>', methods=['GET'])
+@jwt_required()
+def get_met_clear_batch_delete_job(job_id):
+    """查询批量删除任务的进度与预计剩余时间；include_ids=true 时同时返回完整的 id 列表"""
+    conn = None
+    try:
+        conn = get_cloud_db_connection()
+        job = get_delete_job(conn, job_id)
+        if not job:
+            return jsonify({'code': 40400, 'message': '删除任务不存在'}), 404
+        data = delete_job_status(job)
+        if request.args.get('include_ids', '').lower() == 'true':
+            data['ids'] = get_delete_job_ids(conn, job_id)
+        return jsonify({'code': 20000, 'data': data}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching met_clear batch delete job {job_id}: {e}")
+        return jsonify({'code': 50000, 'message': '获取删除任务失败'}), 500
+    finally:
+        if conn and conn.open:
+            conn.close()
+
+
+@heritage_bp.route('/met-clear/batch-update', methods=['PUT'])
+@jwt_required()
+def batch_update_met_clear_items():
+    """批量更新 met_clear
+
+    两种请求体:
+      {"items": [{"id": 1, "fields": {"classify": "..."}}, ...]}  逐 id 修改，返回每个 id 的结果
+      {"filter": {"title"|"artist"|"classify"|"keyword": ...}, "set": {...}}  把匹配的行设为相同的值
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or ('items' not in data and 'filter' not in data):
+        return jsonify({'code': 40000, 'message': '请求数据无效，需要 items 或 filter + set'}), 400
+    chunk_size = current_app.config.get('BULK_UPDATE_CHUNK_SIZE', 500)
+    admin = get_current_admin()
+
+    conn = None
+    try:
+        conn = get_cloud_db_connection()
+        schema = get_met_clear_schema(conn)
+        if 'items' in data:
+            items = data.get('items')
+            if not isinstance(items, list) or not items:
+                return jsonify({'code': 40000, 'message': 'items必须是一个非空列表'}), 400
+            if len(items) > MAX_BULK_UPDATE_ITEMS:
+                return jsonify({'code': 40000, 'message': f'单次最多更新 {MAX_BULK_UPDATE_ITEMS} 条'}), 400
+            results, summary = bulk_update_patches(conn, items, schema, chunk_size, logger=current_app.logger)
+            updated_ids = [r['id'] for r in results if r['status'] == 'updated']
+            log_content = f"批量更新文物(met_clear): 成功 {summary['updated']} 条, 不存在 {summary['not_found']} 条, " \
+                          f"无效 {summary['invalid']} 条, 失败 {summary['failed']} 条, IDs: {json.dumps(updated_ids)}"
+            response = {'summary': summary, 'results': results}
+        else:
+            filters = data.get('filter')
+            if not isinstance(filters, dict):
+                return jsonify({'code': 40000, 'message': 'filter必须是对象'}), 400
+            values, error = validate_update_fields(data.get('set'), schema)
+            if error:
+                return jsonify({'code': 40000, 'message': error}), 400
+            with conn.cursor() as cursor:
+                plan = build_met_clear_search(
+                    cursor,
+                    {key: filters.get(key, '') for key in ('title', 'artist', 'classify')},
+                    filters.get('keyword', '')
+                )
+            if not plan.conditions:
+                return jsonify({'code': 40000, 'message': 'filter不能为空'}), 400
+            summary = bulk_update_by_filter(conn, plan.conditions, plan.params, values, chunk_size)
+            log_content = f"按条件批量更新文物(met_clear): 条件 {json.dumps(filters, ensure_ascii=False)}, " \
+                          f"字段 {', '.join(values)}, 共 {summary['matched']} 条"
+            response = {'summary': summary}
+        invalidate_counts('met_clear')
+        log_operation(
+            admin_id=admin.id,
+            admin_username=admin.username,
+            operation_type='batch_update_heritage',
+            operation_content=log_content,
+            ip_address=request.remote_addr
+        )
+        if response['summary'].get('error'):
+            return jsonify({'code': 50000, 'message': f"批量更新中断: {response['summary']['error']}", 'data': response}), 500
+        return jsonify({'code': 20000, 'data': response, 'message': '批量更新完成'}), 200
+    except Exception as e:
+        if conn: conn.rollback()
+        current_app.logger.error(f"Error batch updating met_clear items: {e}")
+        return jsonify({'code': 50000, 'message': f'批量更新失败: {str(e)}'}), 500
+    finally:
+        if conn and conn.open:
+            conn.close()
+
+
+@heritage_bp.route('/met-clear/import', methods=['POST'])
+@jwt_required()
+def import_met_clear_items():
+    """上传 CSV/JSONL 文件批量导入 met_clear；传入 job_id（不带文件）可继续中断的导入任务
+
+    导入在后台任务中执行，接口立即返回任务信息；进度、逐行错误与最终状态通过 GET /met-clear/import/<job_id> 查询。
+    """
+    upload = request.files.get('file')
+    job_id = request.form.get('job_id')
+    if not upload and not job_id:
+        return jsonify({'code': 40000, 'message': '请上传导入文件或提供要继续的 job_id'}), 400
+    try:
+        batch_size = int(request.form.get('batch_size') or current_app.config.get('IMPORT_BATCH_SIZE', 1000))
+        if batch_size <= 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'code': 40000, 'message': 'batch_size 必须是正整数'}), 400
+
+    admin = get_current_admin()
+    conn = None
+    try:
+        conn = get_cloud_db_connection()
+        store = ImportJobStore(conn)
+        if upload:
+            try:
+                fmt = detect_format(upload.filename, request.form.get('format'))
+            except ImportFileError as e:
+                return jsonify({'code': 40000, 'message': str(e)}), 400
+            import_dir = current_app.config.get('IMPORT_DIR', 'imports')
+            os.makedirs(import_dir, exist_ok=True)
+            job_id = uuid.uuid4().hex
+            source_path = os.path.join(import_dir, f'{job_id}.{fmt}')
+            upload.save(source_path)
+            store.create(upload.filename, source_path, fmt, created_by=admin.username, job_id=job_id)
+        elif store.get(job_id) is None:
+            return jsonify({'code': 40400, 'message': '导入任务不存在'}), 404
+
+        if not store.claim(job_id):
+            return jsonify({'code': 40900, 'message': '导入任务已完成或正在执行', 'data': job_to_dict(store.get(job_id))}), 409
+
+        submit_import_job(
+            current_app._get_current_object(), job_id, batch_size,
+            admin_id=admin.id, admin_username=admin.username, ip_address=request.remote_addr
+        )
+        return jsonify({'code': 20000, 'data': job_to_dict(store.get(job_id)), 'message': '已提交导入任务'}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error submitting met_clear import job {job_id}: {e}")
+        return jsonify({'code': 50000, 'message': f'提交导入任务失败: {str(e)}', 'data': {'job_id': job_id}}), 500
+    finally:
+        if conn and conn.open:
+            conn.close()
+
+
+@heritage_bp.route('/met-clear/import/<job_id>', methods=['GET'])
+@jwt_required()
+def get_met_clear_import_job(job_id):
+    """查询导入任务的进度与逐行错误"""
+    conn = None
+    try:
+        conn = get_cloud_db_connection()
+        store = ImportJobStore(conn)
+        job = store.get(job_id)
+        if not job:
+            return jsonify({'code': 40400, 'message': '导入任务不存在'}), 404
+        return jsonify({'code': 20000, 'data': job_to_dict(job)}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching met_clear import job {job_id}: {e}")
+        return jsonify({'code': 50000, 'message': '获取导入任务失败'}), 500
+    finally:
+        if conn and conn.open:
+            conn.close()
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.log import OperationLog
@@ -8,6 +8,11 @@ from datetime import datetime, timedelta
 # This assumes user.py is in the same directory or a proper Python path is set up
 # If this causes an import error, the structure or import method needs adjustment.
 from .user import role_required # Assuming user.py is in the same routes directory
+from app.utils.counts import resolve_total, get_count_mode
+from app.utils.log_export import build_log_query, stream_log_export, EXPORT_FORMATS
+from app.utils.log_stats import get_log_overview_stats, get_hourly_stats, MAX_OVERVIEW_DAYS, MAX_OVERVIEW_HOURS
+from app.utils.log_storage import rollups_ready
+from app.utils.audit_log import get_audit_log_stats
 
 log_bp = Blueprint('log', __name__)
 
@@ -24,95 +29,59 @@ def get_logs(current_user_from_decorator, **kwargs):
     keyword = request.args.get('keyword', '')
     
     # 构建查询
-    query = OperationLog.query
-    
-    if operation_type:
-        query = query.filter(OperationLog.operation_type == operation_type)
-        
-    if admin_id:
-        query = query.filter(OperationLog.admin_id == admin_id)
-        
-    if start_time:
-        try:
-            start_datetime = datetime.strptime(start_time, '%Y-%m-%d')
-            query = query.filter(OperationLog.operation_time >= start_datetime)
-        except ValueError:
-            pass
-            
-    if end_time:
-        try:
-            end_datetime = datetime.strptime(end_time, '%Y-%m-%d') + timedelta(days=1)
-            query = query.filter(OperationLog.operation_time < end_datetime)
-        except ValueError:
-            pass
-            
-    if keyword:
-        query = query.filter(OperationLog.operation_content.like(f'%{keyword}%'))
-    
-    # 获取分页数据
-    total = query.count()
+    query = build_log_query(operation_type, admin_id, start_time, end_time, keyword)
+    
+    # 获取分页数据（总数按过滤条件缓存，count=none 时只返回 has_more）
+    total, total_type = resolve_total(
+        'operation_logs', ('operation_logs',),
+        {'operation_type': operation_type, 'admin_id': admin_id, 'start_time': start_time,
+         'end_time': end_time, 'keyword': keyword},
+        query.count, get_count_mode()
+    )
     offset = (page - 1) * size
-    logs = query.order_by(OperationLog.operation_time.desc()).offset(offset).limit(size).all()
+    logs = query.order_by(OperationLog.operation_time.desc()).offset(offset).limit(size + 1).all()
+    has_more = len(logs) > size
+    logs = logs[:size]
     
     return jsonify({
         'logs': [log.to_dict() for log in logs],
         'total': total,
+        'total_type': total_type,
+        'has_more': has_more,
         'page': page,
         'size': size,
-        'pages': (total + size - 1) // size
+        'pages': (total + size - 1) // size if total is not None else None
     })
 
 
 @log_bp.route('/overview', methods=['GET'])
 @role_required(['admin', 'super_admin'])
 def get_log_overview(current_user_from_decorator, **kwargs):
-    """获取日志概览信息"""
-    # 获取当日日志数量
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_logs_count = OperationLog.query.filter(OperationLog.operation_time >= today).count()
-    
-    # 获取本周日志数量
-    week_start = today - timedelta(days=today.weekday())
-    week_logs_count = OperationLog.query.filter(OperationLog.operation_time >= week_start).count()
-    
-    # 获取本月日志数量
-    month_start = today.replace(day=1)
-    month_logs_count = OperationLog.query.filter(OperationLog.operation_time >= month_start).count()
-    
-    # 获取总日志数量
-    total_logs_count = OperationLog.query.count()
-    
-    # 获取各类型日志数量
-    type_stats = db.session.query(
-        OperationLog.operation_type,
-        db.func.count(OperationLog.id)
-    ).group_by(OperationLog.operation_type).all()
-    
-    # 获取最近一周每天的日志数量
-    daily_stats = []
-    for i in range(7):
-        day = today - timedelta(days=i)
-        next_day = day + timedelta(days=1)
-        count = OperationLog.query.filter(
-            OperationLog.operation_time >= day,
-            OperationLog.operation_time < next_day
-        ).count()
-        daily_stats.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'count': count
-        })
-    
-    return jsonify({
-        'today_logs_count': today_logs_count,
-        'week_logs_count': week_logs_count,
-        'month_logs_count': month_logs_count,
-        'total_logs_count': total_logs_count,
-        'type_stats': [
-            {'type': type_name, 'count': count}
-            for type_name, count in type_stats
-        ],
-        'daily_stats': daily_stats
-    })
+    """获取日志概览信息
+
+    参数 days 指定每日统计覆盖的天数（默认 7，最大 366），查询次数不随天数增加；
+    参数 hours 返回最近若干小时（最大 168）的每小时数量。
+    """
+    try:
+        days = int(request.args.get('days', 7))
+    except ValueError:
+        return jsonify({'code': 40000, 'message': 'days 必须是整数'}), 400
+    if days < 1 or days > MAX_OVERVIEW_DAYS:
+        return jsonify({'code': 40000, 'message': f'days 必须在 1 到 {MAX_OVERVIEW_DAYS} 之间'}), 400
+
+    stats = get_log_overview_stats(days)
+    hours = request.args.get('hours', type=int)
+    if hours and rollups_ready():
+        stats['hourly_stats'] = get_hourly_stats(min(max(hours, 1), MAX_OVERVIEW_HOURS))
+    return jsonify(stats)
+
+
+@log_bp.route('/writer-stats', methods=['GET'])
+@role_required(['admin', 'super_admin'])
+def get_log_writer_stats(current_user_from_decorator, **kwargs):
+    """获取操作日志异步写入器的指标（队列深度、刷新延迟、溢出数量等）"""
+    stats = get_audit_log_stats()
+    return jsonify({'code': 20000, 'data': stats if stats is not None else {'mode': 'sync'}}), 200
 
 
 @log_bp.route('/export', methods=['GET'])
@@ -126,64 +95,24 @@ def export_logs(current_user_from_decorator, **kwargs):
     keyword = request.args.get('keyword', '')
     
     # 构建查询
-    query = OperationLog.query
-    
-    if operation_type:
-        query = query.filter(OperationLog.operation_type == operation_type)
-        
-    if admin_id:
-        query = query.filter(OperationLog.admin_id == admin_id)
-        
-    if start_time:
-        try:
-            start_datetime = datetime.strptime(start_time, '%Y-%m-%d')
-            query = query.filter(OperationLog.operation_time >= start_datetime)
-        except ValueError:
-            pass
-            
-    if end_time:
-        try:
-            end_datetime = datetime.strptime(end_time, '%Y-%m-%d') + timedelta(days=1)
-            query = query.filter(OperationLog.operation_time < end_datetime)
-        except ValueError:
-            pass
-            
-    if keyword:
-        query = query.filter(OperationLog.operation_content.like(f'%{keyword}%'))
-    
-    # 获取所有符合条件的日志
-    logs = query.order_by(OperationLog.operation_time.desc()).all()
-    
-    # 将日志转换为CSV格式
-    # 使用 StringIO 来构建 CSV，更高效且避免大量字符串拼接
-    import io
-    si = io.StringIO()
-    # 写入UTF-8 BOM头，确保Excel等软件能正确识别中文
-    si.write('\ufeff') 
-    
-    # 写入CSV表头
-    header = "ID,用户ID,用户名,操作类型,操作内容,操作时间,IP地址\n"
-    si.write(header)
-    
-    # 写入数据行
-    for log in logs:
-        # 对于可能包含逗号或引号的内容，最好用双引号包裹，并对内部的双引号进行转义
-        # 但为了简化，这里先保持原样，如果内容本身简单则问题不大
-        operation_content_escaped = log.operation_content.replace('"', '""') # 简单处理引号
-        si.write(f"{log.id},{log.admin_id or ''},{log.admin_username or ''},{log.operation_type or ''},\"{operation_content_escaped}\",{log.operation_time.strftime('%Y-%m-%d %H:%M:%S') if log.operation_time else ''},{log.ip_address or ''}\n")
-    
-    csv_data = si.getvalue()
-    si.close()
+    query = build_log_query(operation_type, admin_id, start_time, end_time, keyword)
     
-    # 将Unicode字符串编码为UTF-8字节串
-    byte_csv_data = csv_data.encode('utf-8')
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'code': 40000, 'message': f"不支持的导出格式，可选: {', '.join(EXPORT_FORMATS)}"}), 400
+    compress = request.args.get('gzip', '').lower() in ('1', 'true')
     
-    # 返回CSV文件
+    mimetype, extension = EXPORT_FORMATS[export_format]
     timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    filename = f"logs_export_{timestamp}.csv"
+    filename = f"logs_export_{timestamp}.{extension}"
+    if compress:
+        mimetype = 'application/gzip'
+        filename += '.gz'
     
+    # 边查询边输出：服务端游标分块读取，不在内存中拼接整个文件
+    stream = stream_log_export(query, export_format, compress, current_app.config.get('LOG_EXPORT_CHUNK_SIZE', 1000))
     return Response(
-        byte_csv_data,  # 使用编码后的字节串
-        mimetype='text/csv; charset=utf-8',
+        stream_with_context(stream),
+        mimetype=mimetype,
         headers={'Content-Disposition': f'attachment;filename={filename}'}
-    ) 
\ No newline at end of file
+    )
@@ -1,9 +1,16 @@
 from flask import Blueprint, request, jsonify, current_app
 from app import db # For OperationLog
-from app.models.log import OperationLog
+from app.utils.audit_log import log_operation
+from app.utils.auth import get_current_admin
 from app.models.user import AdminUser, CloudUser # For updating mobile_user status
 from .user import get_cloud_db_connection, role_required # For DB connection and auth
+from app.utils.counts import resolve_total, get_count_mode, invalidate_counts
+from app.utils.comment_review import (
+    MAX_REVIEW_DECISIONS, apply_review_by_filter, apply_review_decisions, build_comment_conditions, format_id_ranges,
+    review_count_sql, review_list_sql
+)
 from datetime import datetime
+import json
 
 review_bp = Blueprint('review', __name__)
 
@@ -12,18 +19,18 @@ def add_review_log(admin_username, content):
     # In a real app, get current admin user properly
     # For now, assuming admin_username is passed or known
     # A more robust way would be to get admin_id from JWT like in other routes
-    admin_user = AdminUser.query.filter_by(username=admin_username).first()
+    admin_user = get_current_admin() # role_required 已在本请求中解析过当前管理员
+    if not admin_user or admin_user.username != admin_username:
+        admin_user = AdminUser.query.filter_by(username=admin_username).first()
     admin_id_to_log = admin_user.id if admin_user else 0 # Default to 0 if not found, or handle error
 
-    log = OperationLog(
+    log_operation(
         admin_id=admin_id_to_log, # This needs to be the ID of the admin performing the action
         admin_username=admin_username, # Username of the admin
         operation_type='信息审核', # Unified type for review operations
         operation_content=content,
         ip_address=request.remote_addr
     )
-    db.session.add(log)
-    db.session.commit()
 
 @review_bp.route('/comments', methods=['GET'])
 @role_required(['admin', 'super_admin'])
@@ -38,58 +45,36 @@ def get_pending_comments(current_user_from_decorator, **kwargs):
     try:
         conn = get_cloud_db_connection()
         with conn.cursor() as cursor:
-            base_query = """
-                SELECT c.id, c.user_id, c.artifact_id, c.comment, c.comment_time, c.passed,
-                       mu.username as mobile_username, mu.status as mobile_user_status
-                FROM comments c
-                LEFT JOIN mobile_users mu ON c.user_id = mu.userid
-            """
-            count_query = """
-                SELECT COUNT(c.id) as total
-                FROM comments c
-                LEFT JOIN mobile_users mu ON c.user_id = mu.userid
-            """
-            
-            conditions = []
-            params = []
-
-            if passed_status is not None and passed_status in ['0', '1']:
-                conditions.append("c.passed = %s")
-                params.append(int(passed_status))
-            
-            if search_keyword:
-                conditions.append("(c.comment LIKE %s OR mu.username LIKE %s)") # Search in comment or username
-                params.extend([f"%{search_keyword}%", f"%{search_keyword}%"])
-            
-            if user_identifier:
-                if user_identifier.isdigit():
-                    conditions.append("c.user_id = %s")
-                    params.append(int(user_identifier))
-                else: # assume it is a username if not digit
-                    conditions.append("mu.username = %s")
-                    params.append(user_identifier)
-
-            where_clause = ""
-            if conditions:
-                where_clause = " WHERE " + " AND ".join(conditions)
-            
-            # Get total count with filters
-            cursor.execute(count_query + where_clause, tuple(params))
-            total_count = cursor.fetchone()['total']
-
-            # Get paginated data
-            query_pagination = f" ORDER BY c.comment_time DESC LIMIT %s OFFSET %s"
+            conditions, params = build_comment_conditions(passed_status, search_keyword, user_identifier)
+
+            # Get total count with filters (cached per filter, see app.utils.counts)
+            def count_comments():
+                cursor.execute(*review_count_sql(conditions, params))
+                return cursor.fetchone()['total']
+
+            total_count, total_type = resolve_total(
+                'comments', ('comments', 'mobile_users'),
+                {'passed': passed_status if passed_status in ['0', '1'] else None,
+                 'keyword': search_keyword, 'user': user_identifier},
+                count_comments, get_count_mode(),
+                # mobile_users 按主键 LEFT JOIN，不改变评论行数，无过滤时可按 comments 估算
+                estimate_table='comments'
+            )
+
+            # Get paginated data (fetch one extra row to compute has_more)
             offset = (page - 1) * limit
-            final_params = tuple(params + [limit, offset])
-            
-            cursor.execute(base_query + where_clause + query_pagination, final_params)
+            cursor.execute(*review_list_sql(conditions, params, limit + 1, offset))
             comments_page = cursor.fetchall()
+            has_more = len(comments_page) > limit
+            comments_page = comments_page[:limit]
 
         return jsonify({
             'code': 20000,
             'data': {
                 'comments': comments_page,
                 'total': total_count,
+                'total_type': total_type,
+                'has_more': has_more,
                 'page': page,
                 'limit': limit
             }
@@ -121,8 +106,10 @@ def update_comment_status(comment_id, current_user_from_decorator, **kwargs):
             if not comment:
                 return jsonify({'code': 40400, 'message': '评论不存在'}), 404
             
-            cursor.execute("UPDATE comments SET passed = %s WHERE id = %s", (new_passed_status, comment_id))
+            # 审核状态变更不刷新 updated_at（自动审核的增量水位列）
+            cursor.execute("UPDATE comments SET passed = %s, updated_at = updated_at WHERE id = %s", (new_passed_status, comment_id))
             conn.commit()
+            invalidate_counts('comments')
         
         status_text = "通过" if new_passed_status == 1 else "不通过"
         add_review_log(current_user_from_decorator.username, f'审核评论 (ID: {comment_id})，状态更新为: {status_text}')
@@ -135,6 +122,88 @@ def update_comment_status(comment_id, current_user_from_decorator, **kwargs):
         if conn:
             conn.close()
 
+@review_bp.route('/comments/status', methods=['PUT'])
+@role_required(['admin', 'super_admin'])
+def batch_update_comment_status(current_user_from_decorator, **kwargs):
+    """批量审核评论
+
+    三种请求体:
+      {"decisions": [{"id": 1, "passed": 1}, {"id": 2, "passed": 0}, ...]}
+      {"ids": [1, 2, 3], "passed": 1}
+      {"filter": {"passed": "0", "user": "X", "keyword": "..."}, "passed": 1}  例如通过用户 X 所有待审核的评论
+    整个请求只写一条汇总操作日志。
+    """
+    data = request.get_json(silent=True) or {}
+    chunk_size = current_app.config.get('REVIEW_BATCH_CHUNK_SIZE', 1000)
+
+    by_filter = 'decisions' not in data and 'ids' not in data
+    if not by_filter:
+        if 'decisions' in data:
+            raw = data.get('decisions')
+            if not isinstance(raw, list):
+                return jsonify({'code': 40000, 'message': 'decisions必须是一个列表'}), 400
+            decisions = [(d.get('id'), d.get('passed')) if isinstance(d, dict) else (None, None) for d in raw]
+        else:
+            ids = data.get('ids')
+            if not isinstance(ids, list):
+                return jsonify({'code': 40000, 'message': 'ids必须是一个列表'}), 400
+            decisions = [(comment_id, data.get('passed')) for comment_id in ids]
+        if not decisions:
+            return jsonify({'code': 40000, 'message': '审核列表不能为空'}), 400
+        if len(decisions) > MAX_REVIEW_DECISIONS:
+            return jsonify({'code': 40000, 'message': f'单次最多审核 {MAX_REVIEW_DECISIONS} 条'}), 400
+        for comment_id, passed in decisions:
+            if not isinstance(comment_id, int) or isinstance(comment_id, bool):
+                return jsonify({'code': 40000, 'message': f'无效的评论ID: {comment_id!r}'}), 400
+            if passed not in [0, 1] or isinstance(passed, bool):
+                return jsonify({'code': 40000, 'message': f'评论 {comment_id} 的审核状态无效，必须是0或1'}), 400
+    elif 'filter' in data:
+        filters = data.get('filter')
+        passed = data.get('passed')
+        if not isinstance(filters, dict):
+            return jsonify({'code': 40000, 'message': 'filter必须是对象'}), 400
+        if passed not in [0, 1] or isinstance(passed, bool):
+            return jsonify({'code': 40000, 'message': '无效的审核状态值，必须是0或1'}), 400
+        conditions, params = build_comment_conditions(filters.get('passed'), filters.get('keyword', ''), filters.get('user', ''))
+        if not conditions:
+            return jsonify({'code': 40000, 'message': 'filter不能为空'}), 400
+    else:
+        return jsonify({'code': 40000, 'message': '请求数据无效，需要 decisions、ids 或 filter'}), 400
+
+    conn = None
+    try:
+        conn = get_cloud_db_connection()
+        if by_filter:
+            result = apply_review_by_filter(conn, conditions, params, passed, chunk_size)
+            status_text = "通过" if passed == 1 else "不通过"
+            content = f"按条件批量审核评论: 条件 {json.dumps(filters, ensure_ascii=False)}, 共 {result['matched']} 条, 状态更新为: {status_text}"
+        else:
+            result = apply_review_decisions(conn, decisions, chunk_size)
+            content = f"批量审核评论: 共 {result['requested']} 条"
+            if result['passed']:
+                content += f", 通过 {len(result['passed'])} 条 (ID: {format_id_ranges(result['passed'])})"
+            if result['rejected']:
+                content += f", 不通过 {len(result['rejected'])} 条 (ID: {format_id_ranges(result['rejected'])})"
+            result = {key: result[key] for key in ('requested', 'affected', 'chunks')}
+        invalidate_counts('comments')
+
+        admin = current_user_from_decorator
+        log_operation(
+            admin_id=admin.id,
+            admin_username=admin.username,
+            operation_type='信息审核', # Unified type for review operations
+            operation_content=content,
+            ip_address=request.remote_addr
+        )
+        return jsonify({'code': 20000, 'data': result, 'message': '批量审核完成'})
+    except Exception as e:
+        if conn: conn.rollback()
+        current_app.logger.error(f"Error batch updating comment status: {e}")
+        return jsonify({'code': 50000, 'message': f'批量审核失败: {str(e)}'}), 500
+    finally:
+        if conn:
+            conn.close()
+
 @review_bp.route('/users/<int:user_id>/status', methods=['PUT'])
 @role_required(['admin', 'super_admin'])
 def update_mobile_user_status_by_review(user_id, current_user_from_decorator, **kwargs):
@@ -159,6 +228,7 @@ def update_mobile_user_status_by_review(user_id, current_user_from_decorator, **
             # Update using direct SQL as CloudUser.update_user might expect more fields or different structure
             cursor.execute("UPDATE mobile_users SET status = %s WHERE userid = %s", (new_status, user_id))
             conn.commit()
+            invalidate_counts('mobile_users')
 
         add_review_log(current_user_from_decorator.username, f'更新移动端用户 (ID: {user_id}, 用户名: {username_for_log}) 状态为: {new_status}')
         return jsonify({'code': 20000, 'message': '移动端用户状态更新成功'})
@@ -2,7 +2,10 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.user import AdminUser, CloudUser, WebUser
-from app.models.log import OperationLog
+from app.utils.audit_log import log_operation
+from app.utils.auth import get_current_admin, invalidate_admin
+from app.utils.db import get_db_connection
+from app.utils.counts import resolve_total, get_count_mode, invalidate_counts
 import pymysql
 import functools
 from datetime import datetime
@@ -10,17 +13,9 @@ import json
 
 user_bp = Blueprint('user', __name__)
 
-# 创建数据库连接
+# 从进程级连接池借出数据库连接（close() 即归还）
 def get_cloud_db_connection():
-    return pymysql.connect(
-        host=current_app.config['DB_HOST'],
-        port=current_app.config['DB_PORT'],
-        user=current_app.config['DB_USER'],
-        password=current_app.config['DB_PASSWORD'],
-        database=current_app.config['DB_NAME'],
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return get_db_connection()
 
 # 新的基于角色的权限检查装饰器
 def role_required(required_roles):
@@ -37,7 +32,8 @@ def role_required(required_roles):
             if not isinstance(identity, dict) or 'id' not in identity:
                 return jsonify(message="无效的令牌格式"), 401
 
-            current_user = AdminUser.query.get(identity['id'])
+            # 每个请求只解析一次管理员（缓存在 g 上，角色/状态另有进程内 TTL 缓存）
+            current_user = get_current_admin()
             if not current_user:
                 return jsonify(message="用户未找到或令牌无效"), 401
             
@@ -112,15 +108,13 @@ def create_admin_user(current_user_from_decorator, **kwargs):
     db.session.add(new_user)
     db.session.commit()
     
-    log = OperationLog(
+    log_operation(
         admin_id=current_operator.id,
         admin_username=current_operator.username,
         operation_type='用户管理',
         operation_content=f'创建管理员用户 {username} (角色: {role})',
         ip_address=request.remote_addr
     )
-    db.session.add(log)
-    db.session.commit()
     
     return jsonify({
         'message': '管理员创建成功',
@@ -137,8 +131,7 @@ def create_admin_user(current_user_from_decorator, **kwargs):
 @jwt_required() 
 def update_admin_user(user_id, **kwargs):
     """更新管理员用户"""
-    identity = get_jwt_identity()
-    current_operator = AdminUser.query.get(identity['id']) # Get current_operator from JWT identity directly
+    current_operator = get_current_admin() # 与 role_required 共用同一次解析结果
     if not current_operator:
         return jsonify({'message': '操作用户未找到'}), 401
 
@@ -213,6 +206,7 @@ def update_admin_user(user_id, **kwargs):
         })
 
     db.session.commit()
+    invalidate_admin(user_to_update.id)
     
     log_operation_content = f'更新管理员用户 {user_to_update.username} (ID: {user_to_update.id})。'
     if log_details:
@@ -221,15 +215,13 @@ def update_admin_user(user_id, **kwargs):
         log_operation_content += " (可能仅更新了密码或无实际数据更改)。"
 
 
-    log = OperationLog(
+    log_operation(
         admin_id=current_operator.id,
         admin_username=current_operator.username,
         operation_type='用户管理',
         operation_content=log_operation_content,
         ip_address=request.remote_addr
     )
-    db.session.add(log)
-    db.session.commit()
     
     return jsonify({
         'message': '管理员信息更新成功',
@@ -265,16 +257,15 @@ def delete_admin_user(user_id, current_user_from_decorator, **kwargs):
     
     db.session.delete(user_to_delete)
     db.session.commit()
+    invalidate_admin(user_id)
     
-    log = OperationLog(
+    log_operation(
         admin_id=current_operator.id,
         admin_username=current_operator.username,
         operation_type='用户管理',
         operation_content=f'删除管理员用户 {username_deleted} (ID: {user_id}, 角色: {role_deleted})',
         ip_address=request.remote_addr
     )
-    db.session.add(log)
-    db.session.commit()
     
     return jsonify({'message': '管理员删除成功'})
 
@@ -311,21 +302,30 @@ def get_mobile_users(current_user_from_decorator, **kwargs):
         if conditions:
             where_clause = " WHERE " + " AND ".join(conditions)
 
-        # Get total count with filters
-        with conn.cursor() as cursor:
-            cursor.execute(count_select + where_clause, tuple(params))
-            total_count = cursor.fetchone()['total']
+        # Get total count with filters (cached per filter, see app.utils.counts)
+        def count_users():
+            with conn.cursor() as cursor:
+                cursor.execute(count_select + where_clause, tuple(params))
+                return cursor.fetchone()['total']
+
+        total_count, total_type = resolve_total(
+            'mobile_users', ('mobile_users',),
+            {'username': username_filter, 'status': status_filter},
+            count_users, get_count_mode()
+        )
         
-        # Get paginated data
+        # Get paginated data (fetch one extra row to compute has_more)
         query_pagination = f" ORDER BY userid ASC LIMIT %s OFFSET %s" # Default order by userid ASC
         offset = (page - 1) * limit
         
         final_query = base_select + where_clause + query_pagination
-        final_params = tuple(params + [limit, offset])
+        final_params = tuple(params + [limit + 1, offset])
 
         with conn.cursor() as cursor:
             cursor.execute(final_query, final_params)
             users_page = cursor.fetchall()
+        has_more = len(users_page) > limit
+        users_page = users_page[:limit]
 
         conn.close()
         
@@ -338,7 +338,7 @@ def get_mobile_users(current_user_from_decorator, **kwargs):
                 if 'avatar' in user:
                     user.pop('avatar')
         
-        return jsonify({'code': 20000, 'data': {'users': users_page, 'total': total_count}})
+        return jsonify({'code': 20000, 'data': {'users': users_page, 'total': total_count, 'total_type': total_type, 'has_more': has_more}})
         
     except Exception as e:
         current_app.logger.error(f"Error fetching mobile users: {e}")
@@ -382,20 +382,19 @@ def create_mobile_user(current_user_from_decorator, **kwargs):
             return jsonify({'code': 40000, 'message': '无效的用户状态值'}), 400
 
         new_user_id = CloudUser.create_user(conn, user_data_to_create)
+        invalidate_counts('mobile_users')
         
         # Fetch the created user's full info for logging and response
         new_user_info = CloudUser.get_user(conn, new_user_id) if new_user_id else {"username": data['username'], "userid": new_user_id}
         conn.close()
 
-        log = OperationLog(
+        log_operation(
             admin_id=current_operator.id,
             admin_username=current_operator.username,
             operation_type='用户管理',
             operation_content=f'创建移动端用户 {new_user_info.get("username", "N/A")} (ID: {new_user_id})',
             ip_address=request.remote_addr
         )
-        db.session.add(log)
-        db.session.commit()
         
         return jsonify({'code': 20000, 'message': '移动端用户创建成功', 'data': {'user': new_user_info}}), 201
         
@@ -432,6 +431,7 @@ def update_mobile_user(user_id, current_user_from_decorator, **kwargs):
                  return jsonify({'code': 40000, 'message': '没有有效的更新字段'}), 400
 
             CloudUser.update_user(conn, user_id, data_to_persist) 
+            invalidate_counts('mobile_users')
 
         # Log operation
         try:
@@ -443,15 +443,13 @@ def update_mobile_user(user_id, current_user_from_decorator, **kwargs):
         
         operation_content = f'更新移动端用户 {username_for_log} (ID: {user_id})。更新内容: {log_changes_str}'
 
-        log_entry = OperationLog(
+        log_operation(
             admin_id=current_user_from_decorator.id,
             admin_username=current_user_from_decorator.username,
             operation_type='用户管理', 
             operation_content=operation_content,
             ip_address=request.remote_addr
         )
-        db.session.add(log_entry)
-        db.session.commit()
 
         return jsonify({'code': 20000, 'message': '移动端用户信息更新成功'}), 200
 
@@ -501,17 +499,16 @@ def delete_mobile_user(user_id, current_user_from_decorator, **kwargs):
             
         username_deleted = user_to_delete.get('username', 'N/A')
         CloudUser.delete_user(conn, user_id)
+        invalidate_counts('mobile_users')
         conn.close()
 
-        log = OperationLog(
+        log_operation(
             admin_id=current_operator.id,
             admin_username=current_operator.username,
             operation_type='用户管理',
             operation_content=f'删除移动端用户 {username_deleted} (ID: {user_id})',
             ip_address=request.remote_addr
         )
-        db.session.add(log)
-        db.session.commit()
         
         return jsonify({'message': '移动端用户删除成功'})
         
@@ -551,19 +548,30 @@ def get_web_users(current_user_from_decorator, **kwargs):
         if conditions:
             where_clause = " WHERE " + " AND ".join(conditions)
 
-        with conn.cursor() as cursor:
-            cursor.execute(count_select + where_clause, tuple(params))
-            total_count = cursor.fetchone()['total']
+        # Get total count with filters (cached per filter, see app.utils.counts)
+        def count_users():
+            with conn.cursor() as cursor:
+                cursor.execute(count_select + where_clause, tuple(params))
+                return cursor.fetchone()['total']
+
+        total_count, total_type = resolve_total(
+            'web_users', ('web_users',),
+            {'username': username_filter, 'status': status_filter},
+            count_users, get_count_mode()
+        )
         
+        # Get paginated data (fetch one extra row to compute has_more)
         query_pagination = f" ORDER BY id ASC LIMIT %s OFFSET %s" # Default order by id ASC
         offset = (page - 1) * limit
         
         final_query = base_select + where_clause + query_pagination
-        final_params = tuple(params + [limit, offset])
+        final_params = tuple(params + [limit + 1, offset])
 
         with conn.cursor() as cursor:
             cursor.execute(final_query, final_params)
             users_page = cursor.fetchall()
+        has_more = len(users_page) > limit
+        users_page = users_page[:limit]
 
         conn.close()
 
@@ -576,7 +584,7 @@ def get_web_users(current_user_from_decorator, **kwargs):
                 if 'avatar' in user:
                     user.pop('avatar')
         
-        return jsonify({'code': 20000, 'data': {'users': users_page, 'total': total_count}})
+        return jsonify({'code': 20000, 'data': {'users': users_page, 'total': total_count, 'total_type': total_type, 'has_more': has_more}})
     except Exception as e:
         current_app.logger.error(f"Error fetching web users: {e}")
         return jsonify({'code': 50000, 'message': f'获取Web端用户列表失败: {str(e)}'}), 500
@@ -613,11 +621,12 @@ def create_web_user(current_user_from_decorator, **kwargs):
             return jsonify({'code': 40000, 'message': '无效的用户状态值'}), 400
 
         new_user_actual_id = WebUser.create_user(conn, user_data_to_create)
+        invalidate_counts('web_users')
         # 获取新创建用户的信息，模型返回的是id
         new_user_info = WebUser.get_user(conn, new_user_actual_id) if new_user_actual_id else {"username": data['username'], "id": new_user_actual_id} 
         conn.close()
 
-        log = OperationLog(
+        log_operation(
             admin_id=current_operator.id,
             admin_username=current_operator.username,
             operation_type='用户管理',
@@ -625,8 +634,6 @@ def create_web_user(current_user_from_decorator, **kwargs):
             operation_content=f'创建Web端用户 {new_user_info.get("username", "N/A")} (ID: {new_user_actual_id})',
             ip_address=request.remote_addr
         )
-        db.session.add(log)
-        db.session.commit()
         # 返回给前端的 user 对象也应该包含 id 而不是 userid
         return jsonify({'code': 20000, 'message': 'Web端用户创建成功', 'data': {'user': new_user_info}}), 201
     except Exception as e:
@@ -674,18 +681,17 @@ def update_web_user(user_id, current_user_from_decorator, **kwargs):
             return jsonify({'code': 40000, 'message': '没有有效字段可供更新'}), 400
             
         WebUser.update_user(conn, user_id, update_payload) # Model uses userid
+        invalidate_counts('web_users')
         updated_user_info = WebUser.get_user(conn, user_id)
         conn.close()
 
-        log = OperationLog(
+        log_operation(
             admin_id=current_operator.id,
             admin_username=current_operator.username,
             operation_type='用户管理',
             operation_content=f'更新Web端用户 {updated_user_info.get("username", "N/A")} (ID: {user_id})。详情: {json.dumps(update_payload)}',
             ip_address=request.remote_addr
         )
-        db.session.add(log)
-        db.session.commit()
 
         return jsonify({'code': 20000, 'message': 'Web端用户信息更新成功', 'data': {'user': updated_user_info}})
     except Exception as e:
@@ -708,17 +714,16 @@ def delete_web_user(user_id, current_user_from_decorator, **kwargs):
 
         username_deleted = user_to_delete.get('username', 'N/A') # Get username
         WebUser.delete_user(conn, user_id) # Model uses userid
+        invalidate_counts('web_users')
         conn.close()
 
-        log = OperationLog(
+        log_operation(
             admin_id=current_operator.id,
             admin_username=current_operator.username,
             operation_type='用户管理',
             operation_content=f'删除Web端用户 {username_deleted} (ID: {user_id})',
             ip_address=request.remote_addr
         )
-        db.session.add(log)
-        db.session.commit()
 
         return jsonify({'code': 20000, 'message': 'Web端用户删除成功'})
     except Exception as e:
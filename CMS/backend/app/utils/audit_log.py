@@ -0,0 +1,248 @@
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from flask import current_app, has_request_context, request
+from app import db
+from app.models.log import OperationLog
+from .counts import invalidate_counts
+from .log_storage import record_rollups
+
+LOG_FIELDS = ('admin_id', 'admin_username', 'operation_type', 'operation_content', 'operation_time', 'ip_address')
+
+
+class AuditLogWriter:
+    """异步批量写入操作日志
+
+    路由只把日志事件放入有界队列，后台线程按批量大小或时间间隔用一条多行 INSERT 写入，
+    并在同一事务中维护日志预聚合表。数据库不可用时整批追加到本地溢出文件（每次写入都 fsync），
+    数据库恢复后自动回放；队列满时事件同样直接写入溢出文件，审计日志不会被丢弃。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        config = app.config
+        self.batch_size = config.get('AUDIT_LOG_BATCH_SIZE', 200)
+        self.flush_interval = config.get('AUDIT_LOG_FLUSH_INTERVAL', 1.0)
+        self.enqueue_timeout = config.get('AUDIT_LOG_ENQUEUE_TIMEOUT', 0.5)
+        self.spill_dir = config.get('AUDIT_LOG_SPILL_DIR', os.path.join(config.get('LOG_DIR', 'logs'), 'audit_spill'))
+        self.spill_path = os.path.join(self.spill_dir, f'audit_spill_{os.getpid()}.ndjson')
+        self._queue = queue.Queue(maxsize=config.get('AUDIT_LOG_QUEUE_SIZE', 10000))
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._next_replay_at = 0.0
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'failed_flushes': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+            'last_flush_at': None,
+            'last_error': None
+        }
+
+    def _incr(self, **values):
+        with self._metrics_lock:
+            for name, value in values.items():
+                self._metrics[name] += value
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, event):
+        """放入一条日志事件（字典，字段见 LOG_FIELDS）；队列满时写入溢出文件"""
+        self._ensure_started()
+        try:
+            self._queue.put(event, timeout=self.enqueue_timeout)
+            self._incr(enqueued=1)
+        except queue.Full:
+            self._spill([event])
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._replay_spill()
+                continue
+            # 凑批：达到批量大小或等满一个刷新间隔就写入
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop.is_set():
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if self._flush(batch):
+                self._replay_spill()
+
+    def _write(self, rows):
+        """在一个事务中写入日志并维护预聚合表"""
+        with db.engine.begin() as connection:
+            connection.execute(OperationLog.__table__.insert(), rows)
+            record_rollups(connection, [(r['operation_time'], r['operation_type'], r['admin_id']) for r in rows])
+        invalidate_counts('operation_logs')
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                self._write(batch)
+            except Exception as e:
+                self._incr(failed_flushes=1)
+                with self._metrics_lock:
+                    self._metrics['last_error'] = str(e)
+                current_app.logger.error(f"Audit log flush of {len(batch)} event(s) failed, spilling to {self.spill_path}: {e}")
+                self._spill(batch)
+                return False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._metrics_lock:
+            self._metrics['written'] += len(batch)
+            self._metrics['batches'] += 1
+            self._metrics['last_flush_ms'] = round(elapsed_ms, 2)
+            self._metrics['max_flush_ms'] = round(max(self._metrics['max_flush_ms'], elapsed_ms), 2)
+            self._metrics['total_flush_ms'] += elapsed_ms
+            self._metrics['last_flush_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self._metrics['last_error'] = None
+        return True
+
+    def _spill(self, events):
+        """把事件追加到本进程的溢出文件并落盘"""
+        lines = ''.join(
+            json.dumps(dict(e, operation_time=e['operation_time'].strftime('%Y-%m-%d %H:%M:%S.%f')), ensure_ascii=False) + '\n'
+            for e in events
+        )
+        with self._spill_lock:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        self._incr(spilled=len(events))
+
+    def _claimable_spill_files(self):
+        """本进程的溢出/回放文件，以及其他进程遗留且一段时间未再写入的文件"""
+        own_replaying = f'.{os.getpid()}.replaying'
+        stale_after = max(60.0, self.flush_interval * 10)
+        now = time.time()
+        for path in glob.glob(os.path.join(self.spill_dir, 'audit_spill_*')):
+            if path == self.spill_path or path.endswith(own_replaying):
+                yield path
+            elif now - os.path.getmtime(path) > stale_after:
+                yield path
+
+    def _replay_spill(self):
+        """数据库可用时把溢出文件中的事件写回 operation_logs，每个文件一个事务"""
+        if time.monotonic() < self._next_replay_at or not os.path.isdir(self.spill_dir):
+            return
+        own_replaying = f'.{os.getpid()}.replaying'
+        for path in list(self._claimable_spill_files()):
+            # 先改名认领，之后的溢出写入新文件，其他进程也不会重复回放
+            claimed = path if path.endswith(own_replaying) else path[:path.index('.ndjson')] + '.ndjson' + own_replaying
+            try:
+                if claimed != path:
+                    with self._spill_lock:
+                        os.replace(path, claimed)
+                with open(claimed, encoding='utf-8') as f:
+                    rows = [json.loads(line) for line in f if line.strip()]
+                for row in rows:
+                    row['operation_time'] = datetime.strptime(row['operation_time'], '%Y-%m-%d %H:%M:%S.%f')
+                with self.app.app_context():
+                    if rows:
+                        self._write(rows)
+                    current_app.logger.info(f"Replayed {len(rows)} spilled audit log event(s) from {path}.")
+                os.remove(claimed)
+                self._incr(replayed=len(rows))
+            except FileNotFoundError:
+                continue  # 被其他进程抢先认领
+            except Exception as e:
+                # 保留 .replaying 文件，稍后重试
+                self._next_replay_at = time.monotonic() + max(30.0, self.flush_interval * 10)
+                with self.app.app_context():
+                    current_app.logger.warning(f"Replaying spilled audit logs from {claimed} failed: {e}")
+                return
+
+    def stats(self):
+        """队列深度与刷新延迟等指标"""
+        with self._metrics_lock:
+            data = dict(self._metrics)
+        data['queue_depth'] = self._queue.qsize()
+        data['queue_capacity'] = self._queue.maxsize
+        data['avg_flush_ms'] = round(data.pop('total_flush_ms') / data['batches'], 2) if data['batches'] else 0.0
+        data['running'] = self._thread is not None and self._thread.is_alive()
+        return data
+
+    def shutdown(self, timeout=5.0):
+        """停止后台线程并尽量写完队列中剩余的事件，写不完的转入溢出文件"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if remaining:
+            self._flush(remaining)  # 失败时 _flush 会写入溢出文件
+
+
+_writer = None
+
+
+def init_audit_log(app):
+    """创建进程内的审计日志写入器（后台线程在第一次写入日志时启动）"""
+    global _writer
+    if not app.config.get('AUDIT_LOG_ASYNC', True):
+        return None
+    if _writer is None:
+        _writer = AuditLogWriter(app)
+        atexit.register(_writer.shutdown)
+    return _writer
+
+
+def log_operation(admin_id, admin_username, operation_type, operation_content, ip_address=None):
+    """记录一条操作日志
+
+    默认只入队，由后台线程批量写入；配置 AUDIT_LOG_ASYNC=false 时在当前会话中同步写入。
+    """
+    if ip_address is None and has_request_context():
+        ip_address = request.remote_addr
+    event = {
+        'admin_id': admin_id,
+        'admin_username': admin_username,
+        'operation_type': operation_type,
+        'operation_content': operation_content,
+        'operation_time': datetime.now(),
+        'ip_address': ip_address
+    }
+    if _writer is None:
+        db.session.add(OperationLog(**event))
+        db.session.commit()
+        return
+    _writer.enqueue(event)
+
+
+def get_audit_log_stats():
+    """审计日志写入器的指标；同步模式下返回 None"""
+    return _writer.stats() if _writer is not None else None
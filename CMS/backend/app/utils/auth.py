@@ -0,0 +1,113 @@
+import threading
+import time
+from flask import current_app, g
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from app.models.user import AdminUser
+
+
+class AdminIdentity:
+    """鉴权所需的管理员信息快照（与 AdminUser 的 id/username/role/status 属性兼容）"""
+
+    __slots__ = ('id', 'username', 'role', 'status')
+
+    def __init__(self, id, username, role, status=None):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.status = status
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, getattr(user, 'role', None), getattr(user, 'status', None))
+
+    def __repr__(self):
+        return f'<AdminIdentity {self.username} ({self.role})>'
+
+
+class AdminIdentityCache:
+    """进程内的管理员 id -> 角色/状态缓存，带 TTL，管理员被修改或删除时按 id 失效"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._changed_at = {}  # 管理员最后一次被修改/删除的时间（epoch 秒），用于判断 JWT 声明是否过期
+
+    def get(self, admin_id, ttl):
+        with self._lock:
+            entry = self._entries.get(admin_id)
+            if entry is None:
+                return None
+            identity, stored_at = entry
+            if time.monotonic() - stored_at > ttl:
+                del self._entries[admin_id]
+                return None
+            return identity
+
+    def set(self, identity):
+        with self._lock:
+            self._entries[identity.id] = (identity, time.monotonic())
+
+    def invalidate(self, admin_id):
+        with self._lock:
+            self._entries.pop(admin_id, None)
+            self._changed_at[admin_id] = time.time()
+
+    def changed_since(self, admin_id, issued_at):
+        """管理员在令牌签发之后是否被修改过"""
+        with self._lock:
+            changed_at = self._changed_at.get(admin_id)
+        return changed_at is not None and (issued_at is None or changed_at >= issued_at)
+
+
+admin_cache = AdminIdentityCache()
+
+
+def jwt_role_claims(user):
+    """登录时写入访问令牌的附加声明"""
+    return {'role': getattr(user, 'role', None), 'username': user.username, 'status': getattr(user, 'status', None)}
+
+
+def _load_admin(admin_id):
+    ttl = current_app.config.get('ADMIN_CACHE_TTL', 30)
+    identity = admin_cache.get(admin_id, ttl)
+    if identity is None:
+        user = AdminUser.query.get(admin_id)
+        if user is None:
+            return None
+        identity = AdminIdentity.from_user(user)
+        admin_cache.set(identity)
+    return identity
+
+
+def get_current_admin():
+    """解析当前请求的管理员，每个请求只解析一次并保存在 g 上
+
+    配置 AUTH_TRUST_JWT_ROLE=true 且令牌带有角色声明时直接使用声明，不访问数据库
+    （本进程内该管理员在签发后被修改或删除的除外）；否则读取带 TTL 的进程内缓存，未命中时查询数据库。
+
+    Returns:
+        AdminIdentity；令牌无效或管理员不存在时返回 None
+    """
+    if 'current_admin' in g:
+        return g.current_admin
+
+    admin = None
+    identity = get_jwt_identity()
+    if isinstance(identity, dict) and 'id' in identity:
+        admin_id = identity['id']
+        claims = get_jwt()
+        if (current_app.config.get('AUTH_TRUST_JWT_ROLE', False) and claims.get('role')
+                and not admin_cache.changed_since(admin_id, claims.get('iat'))):
+            admin = AdminIdentity(admin_id, claims.get('username') or identity.get('username'), claims['role'], claims.get('status'))
+        else:
+            admin = _load_admin(admin_id)
+
+    g.current_admin = admin
+    return admin
+
+
+def invalidate_admin(admin_id):
+    """管理员的角色/状态被修改或管理员被删除后调用"""
+    admin_cache.invalidate(admin_id)
+    if getattr(g, 'current_admin', None) is not None and g.current_admin.id == admin_id:
+        g.pop('current_admin')
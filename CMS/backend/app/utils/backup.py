@@ -1,84 +1,184 @@
 import os
+import shutil
 import datetime
-import subprocess
-import platform
+import pymysql
 from flask import current_app
 from app import db, scheduler
 from app.models.backup import BackupRecord
+from .backup_stream import BACKUP_SUFFIXES, BackupCancelled, dump_to_file, file_checksum, resolve_compression, restore_from_file
+from .counts import count_cache
+from .dump_engine import DUMP_FORMATS, detect_dump_format, dump_database, list_tables, load_dump
+from .log_storage import rebuild_rollups, rollups_ready
+from .incremental_backup import STATE_SUFFIX, load_state, run_full, save_state, write_increment
+from .db import db_params_from_config
+from .parallel_dump import dump_parallel, load_manifest, restore_order, verify_manifest
+from .scheduling import run_in_app_context
 
-def create_backup(backup_type='auto', description='自动备份'):
+# 定时备份的表
+BACKUP_TABLES = [
+    'admin_users', 
+    'operation_logs', 
+    'backup_records', 
+    'mobile_users', 
+    'web_users', 
+    'met_clear',  # 文物列表依赖此表
+    'comments'
+    # artifacts 表已移除
+    # loves 表根据用户需求不包含在此系统备份中
+]
+
+# 后台任务的记录表描述的是“正在进行的任务”（含数据库互斥），不属于业务数据：
+# 导出整个库时排除，恢复时跳过，避免把进行中的旧任务写回来
+JOB_TABLES = ('backup_jobs', 'met_clear_delete_jobs', 'met_clear_delete_job_chunks', 'met_clear_import_jobs')
+
+
+def backup_mode():
+    """'single'：一个 mysqldump 进程输出单个文件；'parallel'：多连接从同一快照按表/主键范围并行导出到目录"""
+    mode = current_app.config.get('BACKUP_MODE', 'single')
+    if mode not in ('single', 'parallel'):
+        raise ValueError(f'不支持的备份模式: {mode}')
+    return mode
+
+
+def backup_engine():
+    """单文件模式的导出方式: 'mysqldump' 调用客户端程序；'python' 使用内置导出引擎（见 dump_engine）"""
+    engine = current_app.config.get('BACKUP_ENGINE', 'mysqldump')
+    if engine not in ('mysqldump', 'python'):
+        raise ValueError(f'不支持的备份引擎: {engine}')
+    return engine
+
+
+def _dump_format():
+    fmt = current_app.config.get('BACKUP_DUMP_FORMAT', 'sql')
+    if fmt not in DUMP_FORMATS:
+        raise ValueError(f'不支持的导出格式: {fmt}')
+    return fmt
+
+
+def new_backup_file():
+    """按当前压缩配置生成备份文件名与路径，返回 (备份文件名, 路径, 压缩方式)
+
+    并行模式下备份是一个目录（分块文件 + manifest.json），名称不带扩展名。
+    """
+    method = resolve_compression(current_app.config.get('BACKUP_COMPRESSION', 'zstd'))
+    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    if backup_mode() == 'parallel':
+        suffix = ''
+    elif backup_engine() == 'python' and _dump_format() == 'rows':
+        suffix = BACKUP_SUFFIXES[method].replace('.sql', '.rows', 1)
+    else:
+        suffix = BACKUP_SUFFIXES[method]
+    backup_name = f"backup_{timestamp}{suffix}"
+    # 确保备份目录存在
+    os.makedirs(current_app.config['BACKUP_DIR'], exist_ok=True)
+    return backup_name, os.path.join(current_app.config['BACKUP_DIR'], backup_name), method
+
+
+def write_backup(backup_path, method, tables=None, progress=None):
+    """把备份流式压缩写入 backup_path（并行模式下为目录）
+
+    tables 为 None 时导出库中除 JOB_TABLES 以外的所有基表。
+    progress 为可选的进度回调（见 backup_jobs.JobProgress），抛出 BackupCancelled 时中止并删除半成品。
+
+    Returns:
+        压缩方式、原始大小、压缩后大小、压缩比与 SHA-256，可直接作为 BackupRecord 的字段
+    """
+    config = current_app.config
+    mode = backup_mode()
+    if tables is None:
+        conn = pymysql.connect(**db_params_from_config(config))
+        try:
+            tables = [table for table in list_tables(conn, 'mysql') if table not in JOB_TABLES]
+        finally:
+            conn.close()
+    current_app.logger.info(
+        f"Dumping {', '.join(tables)} to {backup_path} ({mode}, {method})."
+    )
+    if mode == 'parallel':
+        return dump_parallel(
+            db_params_from_config(config), backup_path, tables, method,
+            level=config.get('BACKUP_COMPRESSION_LEVEL', 3),
+            threads=config.get('BACKUP_COMPRESSION_THREADS', 0),
+            workers=config.get('BACKUP_PARALLEL_WORKERS', 4),
+            chunk_rows=config.get('BACKUP_CHUNK_ROWS', 500000),
+            insert_rows=config.get('BACKUP_INSERT_ROWS', 1000),
+            logger=current_app.logger,
+            progress=progress
+        )
+    if backup_engine() == 'python':
+        conn = pymysql.connect(**db_params_from_config(config))
+        try:
+            return dump_database(
+                conn, 'mysql', backup_path, tables, _dump_format(), method,
+                level=config.get('BACKUP_COMPRESSION_LEVEL', 3),
+                threads=config.get('BACKUP_COMPRESSION_THREADS', 0),
+                batch_rows=config.get('BACKUP_INSERT_ROWS', 1000),
+                logger=current_app.logger,
+                progress=progress
+            )
+        finally:
+            conn.close()
+    return dump_to_file(
+        config, backup_path, tables, method,
+        level=config.get('BACKUP_COMPRESSION_LEVEL', 3),
+        threads=config.get('BACKUP_COMPRESSION_THREADS', 0),
+        chunk_size=config.get('BACKUP_STREAM_CHUNK_SIZE', 1024 * 1024),
+        progress=progress
+    )
+
+
+def create_backup(backup_type='auto', description='自动备份', tables=BACKUP_TABLES, progress=None):
     """创建数据库备份
     
     Args:
         backup_type: 备份类型，'auto' 或 'manual'
         description: 备份描述
+        tables: 要备份的表，None 表示整个库（不含 JOB_TABLES；增量链始终使用 BACKUP_TABLES）
+        progress: 进度回调；任务被取消时抛出 BackupCancelled，不写备份记录
         
     Returns:
         备份记录对象
     """
-    # 生成备份文件名
-    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-    backup_name = f"backup_{timestamp}.sql"
-    backup_path = os.path.join(current_app.config['BACKUP_DIR'], backup_name)
-    
-    # 确保备份目录存在
-    os.makedirs(current_app.config['BACKUP_DIR'], exist_ok=True)
+    if current_app.config.get('BACKUP_INCREMENTAL'):
+        return create_chained_backup(backup_type, description, progress=progress)
+
+    backup_name, backup_path, method = new_backup_file()
     
     try:
-        # 执行备份命令
-        # 定义需要备份的表名列表
-        tables_to_backup = [
-            'admin_users', 
-            'operation_logs', 
-            'backup_records', 
-            'mobile_users', 
-            'web_users', 
-            'met_clear',  # 文物列表依赖此表
-            'comments'
-            # artifacts 表已移除
-            # loves 表根据用户需求不包含在此系统备份中
-
-        ]
-        tables_str = " ".join(tables_to_backup)
-
-        if platform.system() == 'Windows':
-            # Windows 环境
-            cmd = f"mysqldump -h {current_app.config['DB_HOST']} -u {current_app.config['DB_USER']} -p{current_app.config['DB_PASSWORD']} {current_app.config['DB_NAME']} {tables_str} > {backup_path}"
-        else:
-            # Linux 环境
-            cmd = f"mysqldump -h {current_app.config['DB_HOST']} -u {current_app.config['DB_USER']} -p{current_app.config['DB_PASSWORD']} {current_app.config['DB_NAME']} {tables_str} > {backup_path}"
-        
-        print(f"Executing backup command: {cmd}") # 打印到控制台
-        current_app.logger.info(f"Executing backup command: {cmd}") # 打印到应用日志
-
-        subprocess.run(cmd, shell=True, check=True)
-        
-        # 获取文件大小
-        backup_size = os.path.getsize(backup_path)
+        stats = write_backup(backup_path, method, tables, progress)
         
         # 创建备份记录
         record = BackupRecord(
             backup_name=backup_name,
             backup_path=backup_path,
-            backup_size=backup_size,
             backup_type=backup_type,
             status='success',
-            description=description
+            description=description,
+            **stats
         )
         db.session.add(record)
         db.session.commit()
+        current_app.logger.info(
+            f"Backup {backup_name} finished: {stats['original_size']} -> {stats['backup_size']} bytes "
+            f"(ratio {stats['compression_ratio']})."
+        )
         
         return record
         
+    except BackupCancelled:
+        current_app.logger.info(f"Backup {backup_name} cancelled.")
+        raise
     except Exception as e:
         # 备份失败，记录失败信息
+        current_app.logger.error(f"Backup {backup_name} failed: {e}")
         record = BackupRecord(
             backup_name=backup_name,
             backup_path=backup_path,
             backup_size=0,
             backup_type=backup_type,
             status='failed',
-            description=f"{description}\n错误信息: {str(e)}"
+            description=f"{description}\n错误信息: {str(e)}",
+            compression=method
         )
         db.session.add(record)
         db.session.commit()
@@ -86,6 +186,206 @@ def create_backup(backup_type='auto', description='自动备份'):
         return record
 
 
+def _chain_head():
+    """增量链的最新一环（最近一次成功的全量或增量备份），没有时返回 None"""
+    return BackupRecord.query.filter(
+        BackupRecord.status == 'success',
+        BackupRecord.backup_kind.in_(['full', 'incremental'])
+    ).order_by(BackupRecord.id.desc()).first()
+
+
+def backup_chain(record):
+    """返回恢复 record 需要依次重放的备份记录：链起点的全量备份在前，record 在最后"""
+    chain = [record]
+    while chain[-1].parent_id:
+        parent = BackupRecord.query.get(chain[-1].parent_id)
+        if not parent:
+            raise ValueError(f'增量链不完整: 缺少备份记录 {chain[-1].parent_id}')
+        chain.append(parent)
+    return list(reversed(chain))
+
+
+def create_chained_backup(backup_type='auto', description='自动备份', tables=BACKUP_TABLES, progress=None):
+    """创建增量链中的一个备份
+
+    没有可用的链头（或链头缺少块校验状态文件），或链长已达到 BACKUP_FULL_EVERY 时做一次全量，
+    否则只导出自链头以来有变化的主键块。始终使用内置导出引擎，每个备份旁保存 <路径>.state。
+
+    Returns:
+        备份记录对象
+    """
+    config = current_app.config
+    method = resolve_compression(config.get('BACKUP_COMPRESSION', 'zstd'))
+    head = _chain_head()
+    parent_state = None
+    if head and os.path.exists(head.backup_path + STATE_SUFFIX):
+        chain_length = len(backup_chain(head))
+        if chain_length < config.get('BACKUP_FULL_EVERY', 7):
+            parent_state = load_state(head.backup_path + STATE_SUFFIX)
+    kind = 'incremental' if parent_state else 'full'
+
+    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    fmt = 'sql' if parent_state else _dump_format()
+    suffix = BACKUP_SUFFIXES[method] if fmt == 'sql' else BACKUP_SUFFIXES[method].replace('.sql', '.rows', 1)
+    os.makedirs(config['BACKUP_DIR'], exist_ok=True)
+    # 链中的备份可能在同一秒内连续生成（手动 + 定时），重名时追加序号，避免覆盖上游文件
+    stem, seq = f"backup_{timestamp}{'_inc' if parent_state else ''}", 1
+    backup_name = stem + suffix
+    while os.path.exists(os.path.join(config['BACKUP_DIR'], backup_name)):
+        seq += 1
+        backup_name = f"{stem}_{seq}{suffix}"
+    backup_path = os.path.join(config['BACKUP_DIR'], backup_name)
+    options = dict(
+        method=method,
+        level=config.get('BACKUP_COMPRESSION_LEVEL', 3),
+        threads=config.get('BACKUP_COMPRESSION_THREADS', 0),
+        batch_rows=config.get('BACKUP_INSERT_ROWS', 1000),
+        logger=current_app.logger,
+        progress=progress
+    )
+
+    try:
+        conn = pymysql.connect(**db_params_from_config(config))
+        try:
+            if parent_state:
+                stats, state, summary = write_increment(conn, 'mysql', backup_path, parent_state, tables, **options)
+            else:
+                stats, state = run_full(conn, 'mysql', backup_path, tables, fmt,
+                                        block_rows=config.get('BACKUP_BLOCK_ROWS', 1000), **options)
+                summary = None
+        finally:
+            conn.close()
+        save_state(backup_path + STATE_SUFFIX, state)
+
+        record = BackupRecord(
+            backup_name=backup_name,
+            backup_path=backup_path,
+            backup_type=backup_type,
+            status='success',
+            description=description,
+            backup_kind=kind,
+            parent_id=head.id if parent_state else None,
+            base_id=(head.base_id or head.id) if parent_state else None,
+            **stats
+        )
+        db.session.add(record)
+        db.session.commit()
+        current_app.logger.info(
+            f"{kind.capitalize()} backup {backup_name} finished: {stats['original_size']} -> "
+            f"{stats['backup_size']} bytes (ratio {stats['compression_ratio']})"
+            + (f", changes: {summary or 'none'}." if parent_state else '.')
+        )
+        return record
+
+    except BackupCancelled:
+        current_app.logger.info(f"{kind.capitalize()} backup {backup_name} cancelled.")
+        remove_backup_files(backup_path)
+        raise
+    except Exception as e:
+        current_app.logger.error(f"{kind.capitalize()} backup {backup_name} failed: {e}")
+        remove_backup_files(backup_path)
+        record = BackupRecord(
+            backup_name=backup_name,
+            backup_path=backup_path,
+            backup_size=0,
+            backup_type=backup_type,
+            status='failed',
+            description=f"{description}\n错误信息: {str(e)}",
+            compression=method,
+            backup_kind=kind
+        )
+        db.session.add(record)
+        db.session.commit()
+
+        return record
+
+
+def verify_backup(record):
+    """检查备份文件存在且与记录的 SHA-256 一致（升级前的备份没有校验和，只检查存在）"""
+    if not os.path.exists(record.backup_path):
+        raise ValueError('备份文件不存在')
+    if os.path.isdir(record.backup_path):
+        problem = verify_manifest(record.backup_path, record.checksum)
+        if problem:
+            raise ValueError(problem)
+    elif record.checksum and file_checksum(record.backup_path) != record.checksum:
+        raise ValueError('备份文件校验失败，文件可能已损坏或被修改')
+
+
+def restore_backup_files(backup_path, progress=None):
+    """把备份写回数据库；并行备份按 manifest 先建表再逐个导入数据块
+
+    内置引擎生成的文件（包括并行备份的分块）直接通过数据库连接导入，不需要 mysql 客户端；
+    mysqldump 生成的文件仍交给 mysql 客户端执行。progress 收到解压后读取的字节数（内置引擎文件另有行数/表数）。
+    """
+    config = current_app.config
+    chunk_size = config.get('BACKUP_STREAM_CHUNK_SIZE', 1024 * 1024)
+    if os.path.isdir(backup_path):
+        paths = [os.path.join(backup_path, name) for name in restore_order(load_manifest(backup_path))]
+    else:
+        paths = [backup_path]
+    conn = None
+    try:
+        for path in paths:
+            if detect_dump_format(path) is None:
+                restore_from_file(config, path, chunk_size, progress, skip_tables=JOB_TABLES)
+                continue
+            if conn is None:
+                conn = pymysql.connect(**db_params_from_config(config))
+            load_dump(conn, 'mysql', path, config.get('BACKUP_INSERT_ROWS', 1000), logger=current_app.logger,
+                      progress=progress, skip_tables=JOB_TABLES)
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def remove_backup_files(backup_path):
+    if os.path.isdir(backup_path):
+        shutil.rmtree(backup_path)
+    elif os.path.exists(backup_path):
+        os.remove(backup_path)
+    if os.path.exists(backup_path + STATE_SUFFIX):
+        os.remove(backup_path + STATE_SUFFIX)
+
+
+def verify_chain(record):
+    """检查恢复 record 所需的整条增量链，返回按重放顺序排列的备份记录"""
+    chain = backup_chain(record)
+    for item in chain:
+        if item.status != 'success':
+            raise ValueError(f'增量链中的备份 {item.backup_name} 未成功完成')
+        verify_backup(item)
+    return chain
+
+
+def restore_chain(chain, progress=None):
+    """先恢复链起点的全量备份，再按顺序重放每个增量，最后刷新由业务表派生的数据"""
+    for item in chain:
+        current_app.logger.info(f"Restoring {item.backup_kind or 'backup'} {item.backup_name}.")
+        restore_backup_files(item.backup_path, progress)
+    refresh_after_restore()
+
+
+def refresh_after_restore():
+    """恢复后使总数缓存失效，并按恢复后的 operation_logs 重建日志预聚合表
+
+    整库备份可能覆盖任意表，总数缓存全部清空；预聚合表不在 BACKUP_TABLES 中，恢复后与日志不一致，
+    历史日志已回填时整体重算（尚未回填时由回填按恢复后的日志统计）。
+    """
+    count_cache.invalidate()
+    # 结束恢复前开启的读事务，重建读取的是恢复后的数据
+    db.session.commit()
+    if not rollups_ready():
+        return
+    try:
+        rows = rebuild_rollups(timeout=60)
+        current_app.logger.info(f"Operation log rollups rebuilt after restore ({rows} rollup row(s)).")
+    except Exception as e:
+        # 数据已经恢复完成，重建失败不影响恢复结果，只记录错误
+        db.session.rollback()
+        current_app.logger.error(f"Operation log rollups could not be rebuilt after restore and may be stale: {e}")
+
+
 def restore_backup(backup_id):
     """恢复数据库备份
     
@@ -100,19 +400,12 @@ def restore_backup(backup_id):
     if not record:
         raise ValueError('备份记录不存在')
         
-    if not os.path.exists(record.backup_path):
-        raise ValueError('备份文件不存在')
+    # 增量备份需要整条链都完整，先全部校验再开始写库
+    chain = verify_chain(record)
         
     try:
-        # 执行恢复命令
-        if platform.system() == 'Windows':
-            # Windows 环境
-            cmd = f"mysql -h {current_app.config['DB_HOST']} -u {current_app.config['DB_USER']} -p{current_app.config['DB_PASSWORD']} {current_app.config['DB_NAME']} < {record.backup_path}"
-        else:
-            # Linux 环境
-            cmd = f"mysql -h {current_app.config['DB_HOST']} -u {current_app.config['DB_USER']} -p{current_app.config['DB_PASSWORD']} {current_app.config['DB_NAME']} < {record.backup_path}"
-        
-        subprocess.run(cmd, shell=True, check=True)
+        # 边解压边写入 mysql 客户端，兼容未压缩的历史备份
+        restore_chain(chain)
         return True
         
     except Exception as e:
@@ -137,12 +430,25 @@ def clean_old_backups(days=30):
         BackupRecord.backup_type == 'auto'  # 只清理自动备份
     ).all()
     
+    # 仍被保留的增量备份所依赖的上游备份不能删除
+    parents = dict(db.session.query(BackupRecord.id, BackupRecord.parent_id).all())
+    expired = {record.id for record in old_records}
+    protected = set()
+    for record_id in parents:
+        if record_id in expired:
+            continue
+        parent_id = parents[record_id]
+        while parent_id and parent_id not in protected:
+            protected.add(parent_id)
+            parent_id = parents.get(parent_id)
+    
     count = 0
     for record in old_records:
+        if record.id in protected:
+            continue
         try:
-            # 删除备份文件
-            if os.path.exists(record.backup_path):
-                os.remove(record.backup_path)
+            # 删除备份文件（并行备份为目录）
+            remove_backup_files(record.backup_path)
                 
             # 删除备份记录
             db.session.delete(record)
@@ -154,10 +460,15 @@ def clean_old_backups(days=30):
     return count
 
 
-def schedule_backup():
-    """设置定时备份任务，确保任务只添加一次。"""
-    # 使用 app.logger 需要确保在 app context 中，或者 logger 已正确配置为可在后台线程使用
-    # from flask import current_app # 如果要用 current_app.logger
+def schedule_backup(app):
+    """设置定时备份任务，确保任务只添加一次。
+
+    Args:
+        app: Flask 应用实例，定时任务在其应用上下文中运行
+    """
+
+    # 定时备份登记为后台任务，与手动发起的备份/恢复互斥
+    from .backup_jobs import scheduled_backup
 
     backup_job_id = 'scheduled_create_backup_task_v2' # 使用 v2 以区别旧的潜在任务
     clean_job_id = 'scheduled_clean_backups_task_v2'
@@ -165,11 +476,11 @@ def schedule_backup():
     # 任务：每天凌晨3点执行备份
     if not scheduler.get_job(backup_job_id):
         scheduler.add_job(
-            func=create_backup,
+            func=run_in_app_context,
             trigger='cron',
             hour=3,
             minute=0,
-            args=['auto', '定时备份'],
+            args=[app, scheduled_backup, 'auto', '定时备份'],
             id=backup_job_id,
             replace_existing=True, 
             misfire_grace_time=3600 
@@ -177,9 +488,10 @@ def schedule_backup():
     # 任务：每周日凌晨4点清理旧备份
     if not scheduler.get_job(clean_job_id):
         scheduler.add_job(
-            func=clean_old_backups,
+            func=run_in_app_context,
             trigger='cron',
             day_of_week='sun',
+            args=[app, clean_old_backups],
             hour=4,
             minute=0,
             id=clean_job_id,
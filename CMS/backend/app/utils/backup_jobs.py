@@ -0,0 +1,349 @@
+import threading
+import time
+import uuid
+from datetime import datetime
+import pymysql
+from flask import current_app
+from app import scheduler
+from app.models.backup import BackupRecord
+from .audit_log import log_operation
+from .backup import BACKUP_TABLES, JOB_TABLES, create_backup, restore_chain, verify_chain
+from .backup_stream import BackupCancelled
+from .db import get_db_connection
+from .scheduling import run_in_app_context
+
+# 任务表由迁移 0008_background_job_tables 创建；lock_key 唯一约束保证同一数据库同时只有一个备份/恢复任务
+JOB_TABLE = 'backup_jobs'
+JOB_TYPES = ('backup', 'restore')
+
+
+class BackupJobConflict(Exception):
+    """同一数据库已有未结束的备份/恢复任务"""
+
+    def __init__(self, job):
+        super().__init__(f"备份/恢复任务 {job['job_id'] if job else ''} 正在进行中")
+        self.job = job
+
+
+class JobProgress:
+    """后台任务的进度回调：累加字节/行/表数，每 interval 秒写回任务表并检查是否已请求取消
+
+    可被多个线程同时调用（并行备份）；发现取消后每次调用都抛出 BackupCancelled。
+    """
+
+    def __init__(self, conn, job_id, interval=2.0):
+        self._conn = conn
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self.job_id = job_id
+        self.bytes = 0
+        self.rows = 0
+        self.tables = 0
+        self.cancelled = False
+
+    def __call__(self, bytes=0, rows=0, tables=0):
+        with self._lock:
+            if not self.cancelled:
+                self.bytes += bytes
+                self.rows += rows
+                self.tables += tables
+                if time.monotonic() - self._flushed_at >= self._interval:
+                    self.flush()
+            if self.cancelled:
+                raise BackupCancelled(f'任务 {self.job_id} 已取消')
+
+    def flush(self):
+        """写回当前进度（同时刷新 updated_at 作为心跳），并读取任务是否已被请求取消"""
+        with self._conn.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE `{JOB_TABLE}` SET `bytes_done` = %s, `rows_done` = %s, `tables_done` = %s, `updated_at` = %s "
+                f"WHERE `job_id` = %s",
+                (self.bytes, self.rows, self.tables, datetime.now(), self.job_id)
+            )
+            cursor.execute(f"SELECT `status` FROM `{JOB_TABLE}` WHERE `job_id` = %s", (self.job_id,))
+            row = cursor.fetchone()
+        self._conn.commit()
+        self._flushed_at = time.monotonic()
+        self.cancelled = bool(row) and row['status'] == 'cancelling'
+
+
+def database_key(config):
+    """任务互斥的范围：同一数据库服务器上的同一个库"""
+    return f"{config['DB_HOST']}:{config.get('DB_PORT', 3306)}/{config['DB_NAME']}"
+
+
+def release_stale_jobs(conn, stale_seconds):
+    """进程退出等原因留下的未结束任务超过 stale_seconds 没有心跳时标记为 interrupted 并释放互斥"""
+    now = datetime.now()
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE `{JOB_TABLE}` SET `status` = 'interrupted', `lock_key` = NULL, `message` = %s, `updated_at` = %s "
+            f"WHERE `lock_key` IS NOT NULL AND `updated_at` < %s",
+            ('任务长时间没有进度，已视为中断', now, datetime.fromtimestamp(time.time() - stale_seconds))
+        )
+        released = cursor.rowcount
+    conn.commit()
+    return released
+
+
+def get_backup_job(conn, job_id):
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM `{JOB_TABLE}` WHERE `job_id` = %s", (job_id,))
+        return cursor.fetchone()
+
+
+def get_active_job(conn, key):
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM `{JOB_TABLE}` WHERE `lock_key` = %s", (key,))
+        return cursor.fetchone()
+
+
+def list_backup_jobs(conn, limit=20):
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM `{JOB_TABLE}` ORDER BY `created_at` DESC LIMIT %s", (limit,))
+        return cursor.fetchall()
+
+
+def create_backup_job(conn, job_type, key, record_id=None, backup_type=None, description=None,
+                      admin_id=None, admin_username=None, ip_address=None, stale_seconds=900):
+    """登记一个备份/恢复任务并占用 key 对应数据库的互斥，返回 job_id
+
+    同一数据库已有未结束的任务时抛出 BackupJobConflict（携带该任务）。
+    """
+    if job_type not in JOB_TYPES:
+        raise ValueError(f'不支持的任务类型: {job_type}')
+    release_stale_jobs(conn, stale_seconds)
+    active = get_active_job(conn, key)
+    if active:
+        raise BackupJobConflict(active)
+    job_id = uuid.uuid4().hex
+    now = datetime.now()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO `{JOB_TABLE}` (`job_id`, `job_type`, `status`, `lock_key`, `record_id`, `backup_type`, "
+                f"`description`, `admin_id`, `admin_username`, `ip_address`, `created_at`, `updated_at`) "
+                f"VALUES (%s, %s, 'pending', %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                (job_id, job_type, key, record_id, backup_type, description, admin_id, admin_username, ip_address,
+                 now, now)
+            )
+        conn.commit()
+    except pymysql.err.IntegrityError:
+        # 另一个请求在检查之后抢先登记了任务
+        conn.rollback()
+        raise BackupJobConflict(get_active_job(conn, key))
+    return job_id
+
+
+def cancel_backup_job(conn, job_id):
+    """请求取消任务：尚未开始的直接标记为 cancelled，运行中的标记为 cancelling，由任务在下一次报告进度时中止
+
+    Returns:
+        更新后的任务记录；任务已结束时不做修改
+    """
+    now = datetime.now()
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE `{JOB_TABLE}` SET `status` = 'cancelled', `lock_key` = NULL, `message` = %s, `updated_at` = %s, "
+            f"`finished_at` = %s WHERE `job_id` = %s AND `status` = 'pending'",
+            ('任务在开始前被取消', now, now, job_id)
+        )
+        cursor.execute(
+            f"UPDATE `{JOB_TABLE}` SET `status` = 'cancelling', `updated_at` = %s WHERE `job_id` = %s AND `status` = 'running'",
+            (now, job_id)
+        )
+    conn.commit()
+    return get_backup_job(conn, job_id)
+
+
+def _set_totals(conn, job_id, bytes_total=None, rows_total=None, tables_total=None):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE `{JOB_TABLE}` SET `bytes_total` = %s, `rows_total` = %s, `tables_total` = %s, `updated_at` = %s "
+            f"WHERE `job_id` = %s",
+            (bytes_total, rows_total, tables_total, datetime.now(), job_id)
+        )
+    conn.commit()
+
+
+def _claim(conn, job_id):
+    """把 pending 任务标记为 running；已被取消或已由其他进程开始的任务返回 False"""
+    now = datetime.now()
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE `{JOB_TABLE}` SET `status` = 'running', `started_at` = %s, `updated_at` = %s "
+            f"WHERE `job_id` = %s AND `status` = 'pending'",
+            (now, now, job_id)
+        )
+        claimed = cursor.rowcount == 1
+    conn.commit()
+    return claimed
+
+
+def _finish(conn, job_id, status, progress=None, message=None, record_id=None):
+    """结束任务并释放数据库互斥"""
+    now = datetime.now()
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE `{JOB_TABLE}` SET `status` = %s, `lock_key` = NULL, `message` = %s, "
+            f"`record_id` = COALESCE(%s, `record_id`), `updated_at` = %s, `finished_at` = %s WHERE `job_id` = %s",
+            (status, (message or '')[:500] or None, record_id, now, now, job_id)
+        )
+        if progress:
+            cursor.execute(
+                f"UPDATE `{JOB_TABLE}` SET `bytes_done` = %s, `rows_done` = %s, `tables_done` = %s WHERE `job_id` = %s",
+                (progress.bytes, progress.rows, progress.tables, job_id)
+            )
+    conn.commit()
+
+
+def _estimate_backup(conn, tables):
+    """按 information_schema 估算要导出的数据量（InnoDB 的 TABLE_ROWS 为估算值），用于计算进度与剩余时间"""
+    if tables:
+        condition = f" AND `TABLE_NAME` IN ({', '.join(['%s'] * len(tables))})"
+        params = tuple(tables)
+    else:
+        condition = f" AND `TABLE_NAME` NOT IN ({', '.join(['%s'] * len(JOB_TABLES))})"
+        params = JOB_TABLES
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) AS tables_total, SUM(`DATA_LENGTH`) AS bytes_total, SUM(`TABLE_ROWS`) AS rows_total "
+            "FROM information_schema.TABLES WHERE `TABLE_SCHEMA` = DATABASE() AND `TABLE_TYPE` = 'BASE TABLE'"
+            + condition,
+            params
+        )
+        row = cursor.fetchone()
+    return (int(row['bytes_total'] or 0) or None, int(row['rows_total'] or 0) or None, int(row['tables_total'] or 0))
+
+
+def _run_backup(conn, job, progress):
+    # 定时备份只包含 BACKUP_TABLES；手动备份导出整个库
+    tables = BACKUP_TABLES if job['backup_type'] == 'auto' else None
+    if current_app.config.get('BACKUP_INCREMENTAL'):
+        # 增量备份只导出有变化的块，事先无法估算数据量
+        _set_totals(conn, job['job_id'], tables_total=len(BACKUP_TABLES))
+    else:
+        _set_totals(conn, job['job_id'], *_estimate_backup(conn, tables))
+    record = create_backup(job['backup_type'], job['description'] or '', tables, progress)
+    if record.status != 'success':
+        raise RuntimeError(record.description)
+    content = f'创建数据库备份 (ID: {record.id}, 名称: {record.backup_name}'
+    content += f', 类别: {record.backup_kind})' if record.backup_kind else ')'
+    return record.id, content
+
+
+def _run_restore(conn, job, progress):
+    record = BackupRecord.query.get(job['record_id'])
+    if not record:
+        raise ValueError('备份记录不存在')
+    # 增量备份需要从链起点的全量备份开始依次重放，先校验整条链
+    chain = verify_chain(record)
+    sizes = [item.original_size for item in chain]
+    _set_totals(conn, job['job_id'], sum(sizes) if all(sizes) else None)
+    restore_chain(chain, progress)
+    return record.id, f'恢复数据库备份 (ID: {record.id}, 名称: {record.backup_name})'
+
+
+def run_backup_job(job_id):
+    """执行一个备份/恢复任务（需在应用上下文中运行）
+
+    进度每 BACKUP_JOB_PROGRESS_INTERVAL 秒写回任务表；请求取消后在下一次写回时抛出 BackupCancelled，
+    导出中止并删除半成品文件。恢复被取消时数据库可能只恢复了一部分。
+    """
+    config = current_app.config
+    conn = get_db_connection()
+    progress = None
+    try:
+        if not _claim(conn, job_id):
+            return
+        job = get_backup_job(conn, job_id)
+        progress = JobProgress(conn, job_id, config.get('BACKUP_JOB_PROGRESS_INTERVAL', 2.0))
+        current_app.logger.info(f"Backup job {job_id} ({job['job_type']}) started.")
+        if job['job_type'] == 'backup':
+            record_id, content = _run_backup(conn, job, progress)
+        else:
+            record_id, content = _run_restore(conn, job, progress)
+        _finish(conn, job_id, 'completed', progress, record_id=record_id)
+        current_app.logger.info(
+            f"Backup job {job_id} completed: {progress.bytes} bytes, {progress.rows} rows, {progress.tables} tables."
+        )
+        if job['admin_id'] is not None:
+            log_operation(
+                admin_id=job['admin_id'],
+                admin_username=job['admin_username'],
+                operation_type=job['job_type'],
+                operation_content=content,
+                ip_address=job['ip_address']
+            )
+    except BackupCancelled:
+        conn.rollback()
+        current_app.logger.info(f"Backup job {job_id} cancelled.")
+        message = '任务已取消' if job['job_type'] == 'backup' else '任务已取消，数据库可能只恢复了一部分'
+        _finish(conn, job_id, 'cancelled', progress, message)
+    except Exception as e:
+        conn.rollback()
+        current_app.logger.error(f"Backup job {job_id} failed: {e}", exc_info=True)
+        try:
+            _finish(conn, job_id, 'failed', progress, str(e))
+        except Exception:
+            pass
+    finally:
+        conn.close()
+
+
+def backup_job_status(job, now=None):
+    """任务记录转换为接口返回的进度信息（含百分比、速率与预计剩余时间）
+
+    内置导出引擎能报告行数时按行数计算进度，否则按（解压后的）字节数计算；总量为估算值，
+    运行中的进度最多显示 99.9%。
+    """
+    now = now or datetime.now()
+    data = dict(job)
+    data.pop('lock_key', None)
+    if data.get('rows_total') and data['rows_done']:
+        done, total = data['rows_done'], data['rows_total']
+    else:
+        done, total = data['bytes_done'], data.get('bytes_total')
+    data['progress'] = min(round(done * 100.0 / total, 2), 99.9) if total else None
+    data['bytes_per_second'] = None
+    data['eta_seconds'] = None
+    started_at = data.get('started_at')
+    if started_at is not None and data['bytes_done']:
+        elapsed = ((data.get('finished_at') or now) - started_at).total_seconds()
+        if elapsed > 0:
+            data['bytes_per_second'] = round(data['bytes_done'] / elapsed, 2)
+            if data['status'] == 'running' and total and done:
+                data['eta_seconds'] = round(max(total - done, 0) * elapsed / done, 1)
+    if data['status'] == 'completed':
+        data['progress'] = 100.0
+        data['eta_seconds'] = 0
+    for key in ('created_at', 'started_at', 'updated_at', 'finished_at'):
+        if isinstance(data.get(key), datetime):
+            data[key] = data[key].strftime('%Y-%m-%d %H:%M:%S')
+    return data
+
+
+def submit_backup_job(app, job_id):
+    """把任务交给后台调度器立即执行，Web 请求不等待备份/恢复完成"""
+    scheduler.add_job(
+        id=f'backup_job_{job_id}', func=run_in_app_context, args=[app, run_backup_job, job_id],
+        trigger='date', replace_existing=True, misfire_grace_time=None
+    )
+
+
+def scheduled_backup(backup_type='auto', description='定时备份'):
+    """定时备份同样登记为任务，与手动发起的备份/恢复互斥（需在应用上下文中运行）"""
+    config = current_app.config
+    conn = get_db_connection()
+    try:
+        job_id = create_backup_job(conn, 'backup', database_key(config), backup_type=backup_type,
+                                   description=description,
+                                   stale_seconds=config.get('BACKUP_JOB_STALE_SECONDS', 900))
+    except BackupJobConflict as e:
+        current_app.logger.warning(f"Scheduled backup skipped: {e}")
+        return None
+    finally:
+        conn.close()
+    run_backup_job(job_id)
+    return job_id
@@ -0,0 +1,255 @@
+import gzip
+import hashlib
+import io
+import os
+import re
+import subprocess
+import tempfile
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # 未安装 zstandard 时 zstd 压缩回退为 gzip
+    zstandard = None
+
+# 压缩方式对应的备份文件扩展名
+BACKUP_SUFFIXES = {'zstd': '.sql.zst', 'gzip': '.sql.gz', 'none': '.sql'}
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+GZIP_MAGIC = b'\x1f\x8b'
+# mysqldump 输出中每段开头的注释，表名为该段所属的表（例程/事件段没有表名）
+MYSQLDUMP_SECTION = re.compile(
+    rb'^-- (?:Table structure for table|Dumping data for table|Temporary view structure for view|'
+    rb'Final view structure for view|Dumping events|Dumping routines)(?: .*?`([^`]+)`)?'
+)
+
+
+class BackupCancelled(Exception):
+    """进度回调发现任务已被取消时抛出；导出/导入随之中止，半成品文件由各写入方清理"""
+
+
+def resolve_compression(method):
+    """规范化压缩方式名称，zstd 不可用时回退为 gzip"""
+    method = (method or 'none').lower()
+    if method in ('zst', 'zstandard'):
+        method = 'zstd'
+    elif method == 'gz':
+        method = 'gzip'
+    if method not in BACKUP_SUFFIXES:
+        raise ValueError(f'不支持的备份压缩方式: {method}')
+    if method == 'zstd' and zstandard is None:
+        return 'gzip'
+    return method
+
+
+class _PlainCompressor:
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+def make_compressor(method, level=3, threads=0):
+    """返回带 compress(data) / flush() 的增量压缩器"""
+    if method == 'zstd':
+        return zstandard.ZstdCompressor(level=level, threads=threads).compressobj()
+    if method == 'gzip':
+        # wbits=31 输出带 gzip 头的流，可直接用 gunzip / zcat 解压
+        return zlib.compressobj(max(1, min(level, 9)), zlib.DEFLATED, 31)
+    return _PlainCompressor()
+
+
+class BackupWriter:
+    """把数据块压缩后追加写入备份文件，边写边统计原始/压缩大小并计算压缩文件的 SHA-256
+
+    先写入 <path>.part，close() 成功后才改名为最终文件；中途出错调用 abort() 删除半成品。
+    progress 为可选的进度回调，每写入一块以 progress(bytes=原始字节数) 调用一次。
+    """
+
+    def __init__(self, path, method='zstd', level=3, threads=0, progress=None):
+        self.path = path
+        self.method = resolve_compression(method)
+        self._compressor = make_compressor(self.method, level, threads)
+        self._sha256 = hashlib.sha256()
+        self._part_path = path + '.part'
+        self._file = open(self._part_path, 'wb')
+        self._progress = progress
+        self.original_size = 0
+        self.compressed_size = 0
+
+    def _emit(self, data):
+        if data:
+            self._file.write(data)
+            self._sha256.update(data)
+            self.compressed_size += len(data)
+
+    def write(self, chunk):
+        self.original_size += len(chunk)
+        self._emit(self._compressor.compress(chunk))
+        if self._progress:
+            self._progress(bytes=len(chunk))
+
+    def close(self):
+        self._emit(self._compressor.flush())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._part_path, self.path)
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._part_path):
+            os.remove(self._part_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def result(self):
+        return {
+            'compression': self.method,
+            'original_size': self.original_size,
+            'backup_size': self.compressed_size,
+            'compression_ratio': round(self.original_size / self.compressed_size, 2) if self.compressed_size else None,
+            'checksum': self._sha256.hexdigest()
+        }
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def detect_compression(path):
+    """根据文件头判断备份文件的压缩方式（兼容历史的未压缩 .sql 备份）"""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    if head.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    if head.startswith(GZIP_MAGIC):
+        return 'gzip'
+    return 'none'
+
+
+def open_backup_reader(path):
+    """以只读文件对象打开备份文件，read() 返回解压后的字节"""
+    method = detect_compression(path)
+    if method == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('该备份使用 zstd 压缩，需要安装 zstandard 才能恢复')
+        # 包装为 BufferedReader 以支持按行读取
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True))
+    if method == 'gzip':
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def iter_backup_chunks(path, chunk_size=1024 * 1024):
+    """逐块读取并解压备份文件，返回原始 SQL 字节块"""
+    with open_backup_reader(path) as reader:
+        for chunk in iter(lambda: reader.read(chunk_size), b''):
+            yield chunk
+
+
+def iter_backup_without_tables(path, tables):
+    """逐行读取 mysqldump 生成的备份，去掉属于 tables 的表结构与数据段
+
+    一张表的段从 “Table structure for table” 注释开始，到其数据段的 UNLOCK TABLES 结束
+    （mysqldump 默认 --add-locks）；遇到下一段的注释时也会结束。
+    """
+    skipping = False
+    with open_backup_reader(path) as reader:
+        for line in reader:
+            if line.startswith(b'-- '):
+                match = MYSQLDUMP_SECTION.match(line)
+                if match:
+                    skipping = match.group(1) is not None and match.group(1).decode('utf-8') in tables
+            if not skipping:
+                yield line
+            elif line.startswith(b'UNLOCK TABLES;'):
+                skipping = False
+
+
+def _client_env(config):
+    # 密码通过环境变量传给 mysql 客户端，不出现在命令行与进程列表中
+    env = dict(os.environ)
+    env['MYSQL_PWD'] = str(config['DB_PASSWORD'])
+    return env
+
+
+def _client_args(config):
+    return ['-h', str(config['DB_HOST']), '-P', str(config.get('DB_PORT', 3306)), '-u', str(config['DB_USER'])]
+
+
+def _read_stderr(stderr):
+    stderr.seek(0)
+    return stderr.read().decode('utf-8', errors='replace').strip()
+
+
+def dump_to_file(config, path, tables=None, method='zstd', level=3, threads=0, chunk_size=1024 * 1024, progress=None):
+    """执行 mysqldump，把标准输出分块压缩写入 path，不在内存或磁盘上保留未压缩的完整导出
+
+    Args:
+        config: Flask 配置（需包含 DB_HOST/DB_PORT/DB_USER/DB_PASSWORD/DB_NAME）
+        tables: 要备份的表名列表，None 表示整个库
+        progress: 进度回调，见 BackupWriter；抛出异常时 mysqldump 进程被终止
+
+    Returns:
+        BackupWriter.result() 的统计信息
+    """
+    cmd = ['mysqldump', *_client_args(config), '--single-transaction', '--quick',
+           config['DB_NAME'], *(tables or [])]
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, env=_client_env(config))
+        try:
+            with BackupWriter(path, method, level, threads, progress) as writer:
+                for chunk in iter(lambda: process.stdout.read(chunk_size), b''):
+                    writer.write(chunk)
+                if process.wait() != 0:
+                    raise RuntimeError(f'mysqldump 退出码 {process.returncode}: {_read_stderr(stderr)}')
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+    return writer.result()
+
+
+def restore_from_file(config, path, chunk_size=1024 * 1024, progress=None, skip_tables=()):
+    """把备份文件边解压边写入 mysql 客户端的标准输入；每写入一块以 progress(bytes=原始字节数) 报告进度
+
+    skip_tables 中的表不恢复（见 iter_backup_without_tables）。
+    """
+    cmd = ['mysql', *_client_args(config), config['DB_NAME']]
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr,
+                                   env=_client_env(config))
+        try:
+            try:
+                if skip_tables:
+                    chunks = iter_backup_without_tables(path, skip_tables)
+                else:
+                    chunks = iter_backup_chunks(path, chunk_size)
+                for chunk in chunks:
+                    process.stdin.write(chunk)
+                    if progress:
+                        progress(bytes=len(chunk))
+                process.stdin.close()
+            except BrokenPipeError:
+                pass  # mysql 提前退出，错误信息见退出码与 stderr
+            if process.wait() != 0:
+                raise RuntimeError(f'mysql 退出码 {process.returncode}: {_read_stderr(stderr)}')
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
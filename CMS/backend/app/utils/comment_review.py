@@ -0,0 +1,133 @@
+COMMENT_FROM = "FROM comments c LEFT JOIN mobile_users mu ON c.user_id = mu.userid"
+REVIEW_LIST_COLUMNS = ("c.id, c.user_id, c.artifact_id, c.comment, c.comment_time, c.passed, "
+                       "mu.username as mobile_username, mu.status as mobile_user_status")
+MAX_REVIEW_DECISIONS = 50000
+
+
+def build_comment_conditions(passed_status=None, search_keyword='', user_identifier=''):
+    """审核列表与按条件批量审核共用的过滤条件
+
+    Args:
+        passed_status: '0' / '1'，其他值表示不过滤
+        search_keyword: 在评论内容或用户名中模糊匹配
+        user_identifier: 纯数字按 user_id，否则按用户名精确匹配
+
+    Returns:
+        (conditions, params)
+    """
+    conditions, params = [], []
+    if passed_status is not None and str(passed_status) in ['0', '1']:
+        conditions.append("c.passed = %s")
+        params.append(int(passed_status))
+    if search_keyword:
+        conditions.append("(c.comment LIKE %s OR mu.username LIKE %s)")  # Search in comment or username
+        params.extend([f"%{search_keyword}%", f"%{search_keyword}%"])
+    if user_identifier:
+        user_identifier = str(user_identifier)
+        if user_identifier.isdigit():
+            conditions.append("c.user_id = %s")
+            params.append(int(user_identifier))
+        else:  # assume it is a username if not digit
+            conditions.append("mu.username = %s")
+            params.append(user_identifier)
+    return conditions, params
+
+
+def review_where_clause(conditions):
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def review_list_sql(conditions, params, limit, offset):
+    """审核列表的分页查询（按评论时间倒序），返回 (sql, params)"""
+    sql = f"SELECT {REVIEW_LIST_COLUMNS} {COMMENT_FROM}{review_where_clause(conditions)} ORDER BY c.comment_time DESC LIMIT %s OFFSET %s"
+    return sql, tuple(params) + (limit, offset)
+
+
+def review_count_sql(conditions, params):
+    return f"SELECT COUNT(c.id) as total {COMMENT_FROM}{review_where_clause(conditions)}", tuple(params)
+
+
+def _update_passed(cursor, passed, ids):
+    """只更新状态确实不同的行，返回状态发生变化的评论数
+
+    连接开启了 CLIENT.FOUND_ROWS，rowcount 是匹配行数而不是变化行数，因此把状态条件写进 WHERE。
+    """
+    return cursor.execute(
+        f"UPDATE comments SET passed = %s, updated_at = updated_at "
+        f"WHERE id IN ({', '.join(['%s'] * len(ids))}) AND (passed <> %s OR passed IS NULL)",
+        (passed,) + tuple(ids) + (passed,)
+    )
+
+
+def apply_review_decisions(conn, decisions, chunk_size=1000):
+    """按 id 批量设置审核状态
+
+    决定按目标状态分组、按 chunk_size 分块，每块一条 UPDATE ... WHERE id IN (...) 并单独提交；
+    同一 id 出现多次时以最后一次为准。不逐条检查评论是否存在。
+
+    Args:
+        decisions: 可迭代的 (comment_id, passed)
+
+    Returns:
+        {'requested', 'affected', 'chunks', 'passed': [...], 'rejected': [...]}
+        （affected 为状态实际发生变化的评论数）
+    """
+    latest = {}
+    for comment_id, passed in decisions:
+        latest[comment_id] = passed
+    groups = {1: [], 0: []}
+    for comment_id, passed in latest.items():
+        groups[passed].append(comment_id)
+
+    affected, chunks = 0, 0
+    for passed, ids in groups.items():
+        ids.sort()
+        for start in range(0, len(ids), chunk_size):
+            with conn.cursor() as cursor:
+                affected += _update_passed(cursor, passed, ids[start:start + chunk_size])
+            conn.commit()
+            chunks += 1
+    return {'requested': len(latest), 'affected': affected, 'chunks': chunks, 'passed': groups[1], 'rejected': groups[0]}
+
+
+def apply_review_by_filter(conn, conditions, params, passed, chunk_size=1000):
+    """把满足过滤条件的评论设为同一审核状态
+
+    按评论 id 游标分块：先取一批匹配的 id，再更新并提交，每个事务只锁定一块评论；
+    过滤条件包含 passed 本身时也不会漏行或重复。
+
+    Returns:
+        {'matched', 'affected', 'chunks'}（matched 为满足条件的评论数，affected 为状态实际发生变化的评论数）
+    """
+    where = " WHERE " + " AND ".join(conditions + ["c.id > %s"])
+    matched, affected, chunks, last_id = 0, 0, 0, 0
+    while True:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT c.id {COMMENT_FROM}{where} ORDER BY c.id LIMIT %s", tuple(params) + (last_id, chunk_size))
+            ids = [row['id'] for row in cursor.fetchall()]
+            if not ids:
+                break
+            affected += _update_passed(cursor, passed, ids)
+        conn.commit()
+        matched += len(ids)
+        chunks += 1
+        last_id = ids[-1]
+    return {'matched': matched, 'affected': affected, 'chunks': chunks}
+
+
+def format_id_ranges(ids, max_length=20000):
+    """把 id 列表压缩为 '1-200,305,410-412' 形式写入审计日志，超过 max_length 时截断并注明总数"""
+    parts = []
+    ids = sorted(ids)
+    start = previous = None
+    for item_id in ids + [None]:
+        if start is not None and item_id is not None and item_id == previous + 1:
+            previous = item_id
+            continue
+        if start is not None:
+            parts.append(str(start) if start == previous else f'{start}-{previous}')
+        start = previous = item_id
+    text = ','.join(parts)
+    if len(text) > max_length:
+        text = text[:max_length].rsplit(',', 1)[0] + f',...（共 {len(ids)} 个）'
+    return text
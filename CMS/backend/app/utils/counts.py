@@ -0,0 +1,140 @@
+import threading
+import time
+from flask import current_app, request
+from sqlalchemy import event, text
+from app import db
+
+# 列表接口支持的总数模式
+#   exact    - 精确 COUNT(*)，结果按规范化过滤条件缓存，写操作后失效
+#   estimate - 无过滤条件时使用 information_schema 的行数估算，有过滤条件时退化为 exact
+#   none     - 不计算总数，只返回 has_more
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+
+class CountCache:
+    """按 (表集合, 规范化过滤条件) 缓存列表总数，支持 TTL 与按表失效"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > ttl:
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+
+    def invalidate(self, table=None):
+        """删除涉及指定表的所有缓存项；table 为 None 时清空"""
+        with self._lock:
+            if table is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if table in k[1]]:
+                del self._entries[key]
+
+
+count_cache = CountCache()
+
+
+def normalize_filters(filters):
+    """把过滤条件规范化为可哈希的键：忽略空值，去除字符串首尾空白，按名称排序"""
+    items = []
+    for name, value in (filters or {}).items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            continue
+        items.append((name, value))
+    return tuple(sorted(items))
+
+
+def get_count_mode():
+    """从请求参数 count 中读取总数模式，无效值回退为 exact"""
+    mode = request.args.get('count', 'exact').lower()
+    return mode if mode in COUNT_MODES else 'exact'
+
+
+def estimate_table_rows(table):
+    """读取 InnoDB 统计信息中的表行数估算值（不扫描表）"""
+    ttl = current_app.config.get('COUNT_CACHE_TTL', 30)
+    key = ('__estimate__', (table,), ())
+    cached = count_cache.get(key, ttl)
+    if cached is not None:
+        return cached
+    result = db.session.execute(
+        text("SELECT TABLE_ROWS FROM information_schema.TABLES "
+             "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"),
+        {'table': table}
+    ).scalar()
+    estimate = int(result or 0)
+    count_cache.set(key, estimate)
+    return estimate
+
+
+def resolve_total(name, tables, filters, count_fn, mode='exact', estimate_table=None):
+    """按模式获取列表总数
+
+    Args:
+        name: 列表名称（区分同一张表上的不同查询形状）
+        tables: 该计数依赖的表名元组，任一表发生写入都会使缓存失效
+        filters: 过滤条件字典
+        count_fn: 无参可调用对象，执行精确 COUNT 并返回整数
+        mode: 'exact' | 'estimate' | 'none'
+        estimate_table: estimate 模式下用来估算行数的驱动表，单表时默认为该表；多表计数只有在其余表以
+            LEFT JOIN 按唯一键连接（不会增减驱动表的行数）时才可指定，否则只能精确计数
+
+    Returns:
+        (total, total_type)，total_type 为 'exact' / 'cached' / 'estimate' / 'none'
+    """
+    if mode == 'none':
+        return None, 'none'
+
+    normalized = normalize_filters(filters)
+    if estimate_table is None and len(tables) == 1:
+        estimate_table = tables[0]
+    if mode == 'estimate' and not normalized and estimate_table is not None:
+        try:
+            return estimate_table_rows(estimate_table), 'estimate'
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(f"Row estimate for {estimate_table} failed, falling back to COUNT(*): {e}")
+
+    ttl = current_app.config.get('COUNT_CACHE_TTL', 30)
+    key = (name, tuple(tables), normalized)
+    cached = count_cache.get(key, ttl)
+    if cached is not None:
+        return cached, 'cached'
+    total = count_fn()
+    count_cache.set(key, total)
+    return total, 'exact'
+
+
+def invalidate_counts(*tables):
+    """写操作后调用，使相关表的总数缓存失效"""
+    for table in tables:
+        count_cache.invalidate(table)
+
+
+def init_count_cache(app):
+    """注册 ORM 事件：operation_logs 写入后自动失效对应的总数缓存"""
+    from app.models.log import OperationLog
+
+    if getattr(OperationLog, '_count_cache_listeners', False):
+        return
+
+    def _invalidate_logs(mapper, connection, target):
+        invalidate_counts('operation_logs')
+
+    event.listen(OperationLog, 'after_insert', _invalidate_logs)
+    event.listen(OperationLog, 'after_delete', _invalidate_logs)
+    OperationLog._count_cache_listeners = True
@@ -0,0 +1,140 @@
+import threading
+import time
+from datetime import datetime, date
+from flask import current_app
+from .db import get_db_connection
+
+RECENT_LOG_LIMIT = 5
+
+# 一条语句取回全部统计数字和最近操作记录：计数子查询只有一行，
+# 与最近日志做 1=1 连接后每行都带着同样的计数，没有日志时也会返回一行
+DASHBOARD_STATS_SQL = f"""
+SELECT c.*, l.id, l.admin_id, l.admin_username, l.operation_type,
+       l.operation_content, l.operation_time, l.ip_address
+FROM (
+    SELECT
+        (SELECT COUNT(*) FROM met_clear) AS heritage_count,
+        (SELECT COUNT(*) FROM mobile_users) AS mobile_user_count,
+        (SELECT COUNT(*) FROM web_users) AS web_user_count,
+        (SELECT COUNT(*) FROM admin_users) AS admin_user_count,
+        (SELECT COUNT(*) FROM backup_records) AS backup_count,
+        (SELECT COUNT(*) FROM operation_logs
+         WHERE operation_type = 'login' AND operation_time >= %s) AS today_visits
+) c
+LEFT JOIN (
+    SELECT * FROM operation_logs ORDER BY operation_time DESC LIMIT {RECENT_LOG_LIMIT}
+) l ON 1 = 1
+ORDER BY l.operation_time DESC
+"""
+
+
+def compute_dashboard_stats():
+    """在一次数据库往返中计算仪表盘统计数据"""
+    today_start = datetime.combine(date.today(), datetime.min.time())
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(DASHBOARD_STATS_SQL, (today_start,))
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    first = rows[0]
+    mobile_user_count = int(first['mobile_user_count'])
+    web_user_count = int(first['web_user_count'])
+    admin_user_count = int(first['admin_user_count'])
+    recent_logs = [{
+        'id': row['id'],
+        'admin_id': row['admin_id'],
+        'admin_username': row['admin_username'],
+        'operation_type': row['operation_type'],
+        'operation_content': row['operation_content'],
+        'operation_time': row['operation_time'].strftime('%Y-%m-%d %H:%M:%S') if row['operation_time'] else None,
+        'ip_address': row['ip_address']
+    } for row in rows if row['id'] is not None]
+
+    return {
+        'heritage_count': int(first['heritage_count']),
+        'total_user_count': admin_user_count + mobile_user_count + web_user_count,
+        'admin_user_count': admin_user_count,
+        'mobile_user_count': mobile_user_count,
+        'web_user_count': web_user_count,
+        'backup_count': int(first['backup_count']),
+        'today_visits': int(first['today_visits']),
+        'recent_logs': recent_logs
+    }
+
+
+class DashboardSnapshot:
+    """进程内的仪表盘统计快照
+
+    定时任务周期性刷新；请求在快照未超出时效预算时直接返回内存中的数据，
+    超出时由一个请求重新计算，其余并发请求等待同一次计算的结果。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._data = None
+        self._computed_at = 0.0  # time.monotonic()
+        self._generated_at = None  # 墙钟时间，返回给前端展示
+
+    def _current(self):
+        with self._lock:
+            return self._data, self._computed_at, self._generated_at
+
+    def age(self):
+        """快照距今的秒数；尚未生成时返回 None"""
+        data, computed_at, _ = self._current()
+        return None if data is None else time.monotonic() - computed_at
+
+    def refresh(self):
+        """重新计算并替换快照"""
+        data = compute_dashboard_stats()
+        with self._lock:
+            self._data = data
+            self._computed_at = time.monotonic()
+            self._generated_at = datetime.now()
+        return data
+
+    def get(self, max_age):
+        """返回 (数据, 生成时间, 快照年龄秒数)
+
+        Args:
+            max_age: 时效预算（秒），快照年龄不超过该值时直接返回
+        """
+        data, computed_at, generated_at = self._current()
+        if data is not None and time.monotonic() - computed_at <= max_age:
+            return data, generated_at, time.monotonic() - computed_at
+
+        with self._refresh_lock:
+            # 等锁期间其他请求可能已经完成刷新
+            data, computed_at, generated_at = self._current()
+            if data is None or time.monotonic() - computed_at > max_age:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    if data is None:
+                        raise
+                    # 数据库暂时不可用时，宁可返回过期快照也不让仪表盘报错
+                    current_app.logger.warning(f"Dashboard stats refresh failed, serving stale snapshot: {e}")
+                    return data, generated_at, time.monotonic() - computed_at
+            data, computed_at, generated_at = self._current()
+            return data, generated_at, time.monotonic() - computed_at
+
+
+dashboard_snapshot = DashboardSnapshot()
+
+
+def get_dashboard_snapshot():
+    """按配置的时效预算 DASHBOARD_STALENESS_SECONDS 获取仪表盘统计快照"""
+    max_age = current_app.config.get('DASHBOARD_STALENESS_SECONDS', 60)
+    return dashboard_snapshot.get(max_age)
+
+
+def refresh_dashboard_snapshot():
+    """定时任务 - 刷新仪表盘统计快照（需在应用上下文中运行）"""
+    try:
+        dashboard_snapshot.refresh()
+    except Exception as e:
+        current_app.logger.error(f"Error refreshing dashboard stats snapshot: {e}", exc_info=True)
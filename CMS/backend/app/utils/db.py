@@ -1,16 +1,183 @@
+import threading
+import time
 import pymysql
 from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app import db
+
+
+def db_params_from_config(config):
+    """从 Flask 配置（或 Config 类）中提取直连数据库（工作进程、命令行工具）所需的 pymysql 连接参数"""
+    get = config.get if hasattr(config, 'get') else lambda key, default=None: getattr(config, key, default)
+    return {
+        'host': get('DB_HOST'),
+        'port': int(get('DB_PORT', 3306)),
+        'user': get('DB_USER'),
+        'password': get('DB_PASSWORD'),
+        'database': get('DB_NAME'),
+        'charset': 'utf8mb4'
+    }
+
+
+def shard_ranges(min_id, max_id, shards):
+    """把 [min_id, max_id] 均分为若干左开右闭区间 (lo, hi]"""
+    if min_id is None or max_id is None or max_id < min_id:
+        return []
+    shards = max(1, shards)
+    span = max_id - min_id + 1
+    step = max(1, -(-span // shards))
+    ranges = []
+    lo = min_id - 1
+    while lo < max_id:
+        hi = min(lo + step, max_id)
+        ranges.append((lo, hi))
+        lo = hi
+    return ranges
+
+
+class PoolMetrics:
+    """连接池运行指标（进程级，线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.created = 0        # 新建的物理连接数
+            self.recycled = 0       # 因超时回收 / 溢出归还而关闭的物理连接数
+            self.invalidated = 0    # pre-ping 失败或出错后被作废的连接数
+            self.checkouts = 0      # 累计借出次数
+            self.waiting = 0        # 当前正在等待空闲连接的线程数
+            self.timeouts = 0       # 借出超时次数
+            self.total_wait_ms = 0.0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'created': self.created,
+                'recycled': self.recycled,
+                'invalidated': self.invalidated,
+                'checkouts': self.checkouts,
+                'waiting': self.waiting,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class PooledConnection:
+    """
+    从连接池借出的 PyMySQL 连接的轻量包装。
+    保持与 pymysql.connect() 返回对象相同的用法（cursor/commit/rollback/close/open），
+    但 close() 会把连接归还到池中而不是断开 TCP 连接。
+    """
+
+    def __init__(self, fairy, cursorclass=pymysql.cursors.DictCursor):
+        self._fairy = fairy
+        self._cursorclass = cursorclass
+
+    @property
+    def open(self):
+        return self._fairy is not None and self._fairy.is_valid
+
+    def cursor(self, cursor=None):
+        return self._fairy.dbapi_connection.cursor(cursor or self._cursorclass)
+
+    def commit(self):
+        self._fairy.dbapi_connection.commit()
+
+    def rollback(self):
+        self._fairy.dbapi_connection.rollback()
+
+    def close(self):
+        """归还连接到池中（可重复调用）"""
+        if self._fairy is not None:
+            fairy, self._fairy = self._fairy, None
+            fairy.close()
+
+    def __getattr__(self, name):
+        # 其余属性（如 ping、select_db、insert_id）直接透传给底层 PyMySQL 连接
+        if self._fairy is None:
+            raise pymysql.err.InterfaceError(0, '连接已归还到连接池')
+        return getattr(self._fairy.dbapi_connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.open:
+            self.rollback()
+        self.close()
+
+
+def init_db_pool(app):
+    """为应用的 SQLAlchemy 引擎注册连接池指标监听器。
+
+    ORM 会话与 get_db_connection() 借出的原生连接共用同一个引擎连接池，
+    池大小、溢出、pre-ping、回收与借出超时均由 SQLALCHEMY_ENGINE_OPTIONS 控制。
+    """
+    with app.app_context():
+        pool = db.engine.pool
+        if getattr(pool, '_cms_metrics_installed', False):
+            return
+
+        @event.listens_for(pool, 'connect')
+        def _on_connect(dbapi_connection, connection_record):
+            pool_metrics.incr('created')
+
+        @event.listens_for(pool, 'close')
+        def _on_close(dbapi_connection, connection_record):
+            pool_metrics.incr('recycled')
+
+        @event.listens_for(pool, 'invalidate')
+        def _on_invalidate(dbapi_connection, connection_record, exception):
+            pool_metrics.incr('invalidated')
+
+        pool._cms_metrics_installed = True
+
 
 def get_db_connection():
-    """获取数据库连接"""
-    conn = pymysql.connect(
-        host=current_app.config['DB_HOST'],
-        user=current_app.config['DB_USER'],
-        password=current_app.config['DB_PASSWORD'],
-        database=current_app.config['DB_NAME'],
-        cursorclass=pymysql.cursors.DictCursor
-    )
-    return conn
+    """从进程级连接池借出一个数据库连接（默认使用 DictCursor）
+
+    用完后调用 close() 归还；等待超过 DB_POOL_TIMEOUT 秒仍无空闲连接时抛出 TimeoutError。
+    """
+    pool_metrics.incr('waiting')
+    started = time.perf_counter()
+    try:
+        fairy = db.engine.raw_connection()
+    except PoolTimeoutError:
+        pool_metrics.incr('timeouts')
+        current_app.logger.warning("Timed out waiting for a pooled database connection")
+        raise
+    finally:
+        pool_metrics.incr('waiting', -1)
+    pool_metrics.incr('checkouts')
+    pool_metrics.incr('total_wait_ms', (time.perf_counter() - started) * 1000)
+    return PooledConnection(fairy)
+
+
+def get_pool_stats():
+    """返回连接池当前状态与累计指标"""
+    pool = db.engine.pool
+    stats = pool_metrics.snapshot()
+    stats.update({
+        'pool_size': pool.size() if hasattr(pool, 'size') else None,
+        'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+        'checked_in': pool.checkedin() if hasattr(pool, 'checkedin') else None,
+        'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+        'max_overflow': current_app.config.get('DB_POOL_MAX_OVERFLOW'),
+        'timeout': current_app.config.get('DB_POOL_TIMEOUT'),
+        'recycle': current_app.config.get('DB_POOL_RECYCLE')
+    })
+    return stats
 
 def execute_query(sql, params=None, fetch=True):
     """执行SQL查询"""
@@ -54,4 +221,4 @@ def batch_execute(sql, params_list):
         conn.rollback()
         raise e
     finally:
-        conn.close() 
\ No newline at end of file
+        conn.close()
@@ -0,0 +1,534 @@
+import datetime
+import decimal
+import json
+import re
+import struct
+import time
+from contextlib import closing
+
+import pymysql
+from pymysql.converters import escape_item
+
+from .backup_stream import BackupWriter, open_backup_reader
+
+# 内置导出格式的文件头：sql 为多行 INSERT 文本，rows 为紧凑二进制行格式
+SQL_MARKER = b'-- cms-dump sql v1\n'
+ROWS_MAGIC = b'CMSROWS\x01'
+DUMP_FORMATS = ('sql', 'rows')
+# 每个 MySQL 文件开头设置的会话变量，导入时各文件相互独立
+MYSQL_SESSION_HEADER = b"SET NAMES utf8mb4;\nSET FOREIGN_KEY_CHECKS=0;\nSET UNIQUE_CHECKS=0;\n"
+# 导出文件中针对某张表的语句（用于导入时跳过指定的表）
+TABLE_STATEMENT = re.compile(
+    r'^(?:DROP TABLE IF EXISTS|CREATE TABLE(?: IF NOT EXISTS)?|INSERT INTO|DELETE FROM) [`"]?([^`"\s(]+)', re.IGNORECASE
+)
+
+
+# ---------------------------------------------------------------- 源库元数据
+
+def list_tables(conn, dialect):
+    with closing(conn.cursor()) as cursor:
+        if dialect == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+        else:
+            cursor.execute("SHOW FULL TABLES WHERE Table_type = 'BASE TABLE'")
+        return [_first(row) for row in cursor.fetchall()]
+
+
+def table_columns(conn, dialect, table):
+    with closing(conn.cursor()) as cursor:
+        if dialect == 'sqlite':
+            cursor.execute(f"PRAGMA table_info(`{table}`)")
+            return [_at(row, 1, 'name') for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+            (table,)
+        )
+        return [_first(row) for row in cursor.fetchall()]
+
+
+def create_table_sql(conn, dialect, table):
+    with closing(conn.cursor()) as cursor:
+        if dialect == 'sqlite':
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            return _first(cursor.fetchone())
+        cursor.execute(f"SHOW CREATE TABLE `{table}`")
+        return _at(cursor.fetchone(), 1, 'Create Table')
+
+
+def _first(row):
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+
+def _at(row, index, key):
+    return row[key] if isinstance(row, dict) else row[index]
+
+
+def iter_row_batches(conn, dialect, table, columns, batch_rows, where='', params=None):
+    """逐批读取表中的行（元组）；MySQL 使用无缓冲的服务器端游标，内存占用与表大小无关"""
+    sql = f"SELECT {', '.join(f'`{c}`' for c in columns)} FROM `{table}`{where}"
+    if dialect == 'sqlite':
+        cursor = conn.cursor()
+        cursor.execute(sql, params or ())
+    else:
+        cursor = conn.cursor(pymysql.cursors.SSCursor)
+        cursor.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+# ---------------------------------------------------------------- sql 格式
+
+def sql_literal(value, dialect):
+    """把 Python 值转换为目标方言的 SQL 字面量；字符串中的换行被转义，保证每条语句内没有裸换行"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # 两种方言都支持十六进制字面量，避免二进制内容在按 UTF-8 编码语句时被改写
+        return f"X'{bytes(value).hex()}'"
+    if dialect != 'sqlite':
+        return escape_item(value, 'utf8mb4')
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat(' ')
+    elif isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+        value = str(value)
+    value = "'" + str(value).replace("'", "''") + "'"
+    return value.replace('\r', "' || char(13) || '").replace('\n', "' || char(10) || '")
+
+
+class SqlDumpWriter:
+    """输出多行 INSERT 文本，mysql 客户端与 load_dump 都可以导入"""
+
+    def __init__(self, out, dialect):
+        self.out = out
+        self.dialect = dialect
+        self._prefix = None
+        out.write(SQL_MARKER)
+        if dialect != 'sqlite':
+            out.write(MYSQL_SESSION_HEADER)
+
+    def begin_table(self, table, columns, create_sql=None):
+        if create_sql:
+            self.out.write(f"DROP TABLE IF EXISTS `{table}`;\n{create_sql};\n".encode('utf-8'))
+        self._prefix = f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in columns)}) VALUES\n"
+
+    def write_rows(self, rows):
+        values = ',\n'.join('(' + ','.join(sql_literal(v, self.dialect) for v in row) + ')' for row in rows)
+        self.out.write((self._prefix + values + ';\n').encode('utf-8'))
+
+    def write_statement(self, sql):
+        """写入一条单行语句（不含结尾分号）"""
+        self.out.write((sql + ';\n').encode('utf-8'))
+
+    def end_table(self, rows):
+        self._prefix = None
+
+    def close(self):
+        pass
+
+
+# ---------------------------------------------------------------- rows 格式
+# 文件以 ROWS_MAGIC 开头，之后是若干帧：
+#   b'T' + 变长长度 + JSON {table, columns, create_sql, dialect}   表开始
+#   b'B' + 变长行数 + 变长字节数 + 各行的值                           一批行
+#   b'E' + 变长行数                                                   表结束
+#   b'Z'                                                              文件结束
+# 每个值以一个类型字节开头，整数使用 zigzag 变长编码，字符串/字节串带变长长度前缀。
+
+_NULL, _INT, _FLOAT, _STR, _BYTES, _DECIMAL, _DATETIME, _DATE, _TIMEDELTA, _TIME = range(10)
+_DOUBLE = struct.Struct('<d')
+
+
+def _put_varint(buf, n):
+    while n >= 0x80:
+        buf.append((n & 0x7f) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _put_int(buf, n):
+    _put_varint(buf, (n << 1) if n >= 0 else ((-n << 1) - 1))
+
+
+def _put_bytes(buf, data):
+    _put_varint(buf, len(data))
+    buf += data
+
+
+def encode_value(buf, value):
+    if value is None:
+        buf.append(_NULL)
+    elif isinstance(value, (bool, int)):
+        buf.append(_INT)
+        _put_int(buf, int(value))
+    elif isinstance(value, float):
+        buf.append(_FLOAT)
+        buf += _DOUBLE.pack(value)
+    elif isinstance(value, str):
+        buf.append(_STR)
+        _put_bytes(buf, value.encode('utf-8'))
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        buf.append(_BYTES)
+        _put_bytes(buf, bytes(value))
+    elif isinstance(value, decimal.Decimal):
+        buf.append(_DECIMAL)
+        _put_bytes(buf, str(value).encode('ascii'))
+    elif isinstance(value, datetime.datetime):
+        buf.append(_DATETIME)
+        _put_bytes(buf, value.isoformat().encode('ascii'))
+    elif isinstance(value, datetime.date):
+        buf.append(_DATE)
+        _put_bytes(buf, value.isoformat().encode('ascii'))
+    elif isinstance(value, datetime.timedelta):
+        buf.append(_TIMEDELTA)
+        _put_int(buf, (value.days * 86400 + value.seconds) * 1000000 + value.microseconds)
+    elif isinstance(value, datetime.time):
+        buf.append(_TIME)
+        _put_bytes(buf, value.isoformat().encode('ascii'))
+    else:
+        buf.append(_STR)
+        _put_bytes(buf, str(value).encode('utf-8'))
+
+
+class RowsDumpWriter:
+    """输出紧凑二进制行格式，只能由 load_dump 导入（executemany 分批写入）"""
+
+    def __init__(self, out, dialect):
+        self.out = out
+        self.dialect = dialect
+        out.write(ROWS_MAGIC)
+
+    def begin_table(self, table, columns, create_sql=None):
+        meta = json.dumps({'table': table, 'columns': columns, 'create_sql': create_sql, 'dialect': self.dialect},
+                          ensure_ascii=False).encode('utf-8')
+        buf = bytearray(b'T')
+        _put_bytes(buf, meta)
+        self.out.write(bytes(buf))
+
+    def write_rows(self, rows):
+        payload = bytearray()
+        for row in rows:
+            for value in row:
+                encode_value(payload, value)
+        buf = bytearray(b'B')
+        _put_varint(buf, len(rows))
+        _put_varint(buf, len(payload))
+        self.out.write(bytes(buf) + bytes(payload))
+
+    def end_table(self, rows):
+        buf = bytearray(b'E')
+        _put_varint(buf, rows)
+        self.out.write(bytes(buf))
+
+    def close(self):
+        self.out.write(b'Z')
+
+
+class _FrameReader:
+    def __init__(self, f):
+        self.f = f
+
+    def read(self, n):
+        data = self.f.read(n)
+        while len(data) < n:
+            more = self.f.read(n - len(data))
+            if not more:
+                raise ValueError('备份文件不完整')
+            data += more
+        return data
+
+    def byte(self):
+        return self.read(1)[0]
+
+    def varint(self):
+        shift = result = 0
+        while True:
+            b = self.byte()
+            result |= (b & 0x7f) << shift
+            if b < 0x80:
+                return result
+            shift += 7
+
+    def bytes(self):
+        return self.read(self.varint())
+
+
+def _get_varint(data, pos):
+    shift = result = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+_DECODERS = {
+    _STR: lambda raw: raw.decode('utf-8'),
+    _BYTES: bytes,
+    _DECIMAL: lambda raw: decimal.Decimal(raw.decode('ascii')),
+    _DATETIME: lambda raw: datetime.datetime.fromisoformat(raw.decode('ascii')),
+    _DATE: lambda raw: datetime.date.fromisoformat(raw.decode('ascii')),
+    _TIME: lambda raw: datetime.time.fromisoformat(raw.decode('ascii')),
+}
+
+
+def decode_rows(data, count, width):
+    """解码一个 B 帧的内容（整批读入内存后按偏移解析），返回元组列表"""
+    rows = []
+    pos = 0
+    for _ in range(count):
+        row = []
+        for _ in range(width):
+            tag = data[pos]
+            pos += 1
+            if tag == _NULL:
+                row.append(None)
+            elif tag == _INT or tag == _TIMEDELTA:
+                n, pos = _get_varint(data, pos)
+                n = (n >> 1) if not n & 1 else -((n + 1) >> 1)
+                row.append(n if tag == _INT else datetime.timedelta(microseconds=n))
+            elif tag == _FLOAT:
+                row.append(_DOUBLE.unpack_from(data, pos)[0])
+                pos += 8
+            elif tag in _DECODERS:
+                n, pos = _get_varint(data, pos)
+                row.append(_DECODERS[tag](data[pos:pos + n]))
+                pos += n
+            else:
+                raise ValueError(f'未知的值类型: {tag}')
+        rows.append(tuple(row))
+    return rows
+
+
+# ---------------------------------------------------------------- 导出
+
+def make_dump_writer(out, fmt, dialect):
+    if fmt == 'rows':
+        return RowsDumpWriter(out, dialect)
+    if fmt == 'sql':
+        return SqlDumpWriter(out, dialect)
+    raise ValueError(f'不支持的导出格式: {fmt}')
+
+
+def dump_table(conn, dialect, writer, table, batch_rows=1000, columns=None, where='', params=None, schema=True,
+               progress=None):
+    """把一张表（或 where 限定的部分行）写入 writer，返回行数；每批以 progress(rows=行数) 报告进度"""
+    columns = columns or table_columns(conn, dialect, table)
+    writer.begin_table(table, columns, create_table_sql(conn, dialect, table) if schema else None)
+    rows = 0
+    for batch in iter_row_batches(conn, dialect, table, columns, batch_rows, where, params):
+        writer.write_rows(batch)
+        rows += len(batch)
+        if progress:
+            progress(rows=len(batch))
+    writer.end_table(rows)
+    return rows
+
+
+def start_snapshot(conn, dialect):
+    """MySQL 上开启一致性快照事务，之后该连接上的所有读取看到同一时刻的数据"""
+    if dialect != 'sqlite':
+        with closing(conn.cursor()) as cursor:
+            cursor.execute('SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            cursor.execute('START TRANSACTION WITH CONSISTENT SNAPSHOT')
+
+
+def dump_database(conn, dialect, path, tables=None, fmt='sql', method='zstd', level=3, threads=0,
+                  batch_rows=1000, logger=None, snapshot=True, progress=None):
+    """不依赖 mysqldump，把若干表导出为单个压缩文件
+
+    MySQL 上先开启一致性快照事务，所有表读取同一时刻的数据；snapshot=False 表示调用方已开启快照
+    （例如需要在同一快照中做其他读取），结束时仍会回滚结束该事务。
+    progress 回调依次收到写入的字节数、每批行数与每张导完的表（progress(tables=1)）。
+
+    Returns:
+        BackupWriter.result() 的统计信息
+    """
+    started = time.time()
+    if snapshot:
+        start_snapshot(conn, dialect)
+    try:
+        tables = tables or list_tables(conn, dialect)
+        total = 0
+        with BackupWriter(path, method, level, threads, progress) as out:
+            writer = make_dump_writer(out, fmt, dialect)
+            for table in tables:
+                total += dump_table(conn, dialect, writer, table, batch_rows, progress=progress)
+                if progress:
+                    progress(tables=1)
+            writer.close()
+    finally:
+        conn.rollback()
+    if logger:
+        logger.info(f"Dumped {len(tables)} tables ({total} rows, {fmt}) in {round((time.time() - started) * 1000, 2)} ms.")
+    return out.result()
+
+
+# ---------------------------------------------------------------- 导入
+
+def detect_dump_format(path):
+    """返回 'sql' / 'rows'，不是内置引擎生成的文件（例如 mysqldump 的输出）返回 None"""
+    with open_backup_reader(path) as reader:
+        head = reader.read(max(len(SQL_MARKER), len(ROWS_MAGIC)))
+    if head.startswith(ROWS_MAGIC):
+        return 'rows'
+    if head.startswith(SQL_MARKER):
+        return 'sql'
+    return None
+
+
+def _iter_statements(reader):
+    """按行拼接语句，以分号结尾的行结束一条语句（导出时已保证字面量中没有裸换行）"""
+    statement = []
+    for line in reader:
+        line = line.rstrip(b'\r\n')
+        if not statement and (not line or line.startswith(b'--')):
+            continue
+        statement.append(line)
+        if line.endswith(b';'):
+            yield b'\n'.join(statement)[:-1].decode('utf-8')
+            statement = []
+    if statement:
+        yield b'\n'.join(statement).decode('utf-8')
+
+
+class _ProgressReader:
+    """包装解压后的读取对象，把读到的字节数报告给进度回调"""
+
+    def __init__(self, reader, progress):
+        self._reader = reader
+        self._progress = progress
+
+    def read(self, n=-1):
+        data = self._reader.read(n)
+        if data:
+            self._progress(bytes=len(data))
+        return data
+
+    def __iter__(self):
+        for line in self._reader:
+            self._progress(bytes=len(line))
+            yield line
+
+
+def _noop_progress(**kwargs):
+    pass
+
+
+def _load_sql(conn, reader, commit_every, create, progress=_noop_progress, skip_tables=()):
+    result = {'tables': 0, 'rows': 0, 'statements': 0}
+    with closing(conn.cursor()) as cursor:
+        for statement in _iter_statements(reader):
+            if not create and statement.startswith(('DROP TABLE', 'CREATE TABLE')):
+                continue
+            if skip_tables:
+                match = TABLE_STATEMENT.match(statement)
+                if match and match.group(1) in skip_tables:
+                    continue
+            cursor.execute(statement)
+            result['statements'] += 1
+            if statement.startswith('INSERT'):
+                result['rows'] += max(cursor.rowcount, 0)
+                progress(rows=max(cursor.rowcount, 0))
+                if result['statements'] % commit_every == 0:
+                    conn.commit()
+            elif statement.startswith('CREATE TABLE'):
+                result['tables'] += 1
+                progress(tables=1)
+    conn.commit()
+    return result
+
+
+def _load_rows(conn, dialect, reader, chunk_rows, create, progress=_noop_progress, skip_tables=()):
+    frames = _FrameReader(reader)
+    if frames.read(len(ROWS_MAGIC)) != ROWS_MAGIC:
+        raise ValueError('不是 rows 格式的备份文件')
+    placeholder = '?' if dialect == 'sqlite' else '%s'
+    result = {'tables': 0, 'rows': 0, 'statements': 0}
+    insert_sql, width, pending, skipping = None, 0, [], False
+    with closing(conn.cursor()) as cursor:
+        if dialect != 'sqlite':
+            cursor.execute('SET FOREIGN_KEY_CHECKS=0')
+            cursor.execute('SET UNIQUE_CHECKS=0')
+
+        def flush():
+            if pending:
+                cursor.executemany(insert_sql, pending)
+                conn.commit()
+                result['rows'] += len(pending)
+                result['statements'] += 1
+                progress(rows=len(pending))
+                pending.clear()
+
+        while True:
+            tag = frames.read(1)
+            if tag == b'T':
+                meta = json.loads(frames.bytes().decode('utf-8'))
+                table, columns = meta['table'], meta['columns']
+                skipping = table in skip_tables
+                if skipping:
+                    continue
+                if create and meta.get('create_sql') and meta.get('dialect') == dialect:
+                    cursor.execute(f"DROP TABLE IF EXISTS `{table}`")
+                    cursor.execute(meta['create_sql'])
+                insert_sql = (f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in columns)}) "
+                              f"VALUES ({', '.join([placeholder] * len(columns))})")
+                width = len(columns)
+                result['tables'] += 1
+                progress(tables=1)
+            elif tag == b'B':
+                count = frames.varint()
+                payload = frames.bytes()
+                if skipping:
+                    continue
+                pending.extend(decode_rows(payload, count, width))
+                if len(pending) >= chunk_rows:
+                    flush()
+            elif tag == b'E':
+                frames.varint()
+                flush()
+            elif tag == b'Z':
+                break
+            else:
+                raise ValueError(f'备份文件格式错误（帧类型 {tag!r}）')
+    return result
+
+
+def load_dump(conn, dialect, path, chunk_rows=1000, create=True, logger=None, progress=None, skip_tables=()):
+    """把内置引擎生成的备份写回数据库
+
+    rows 格式按 chunk_rows 行一批 executemany，每批提交一次；sql 格式逐条执行多行 INSERT，
+    每 chunk_rows 条语句提交一次。create=False 时不删除重建表（目标表需已存在）。
+    progress 回调收到读取的（解压后）字节数、写入的行数与开始导入的表。skip_tables 中的表不导入。
+
+    Returns:
+        {'tables': 表数, 'rows': 行数, 'statements': 执行的语句/批次数, 'duration_ms': 耗时}
+    """
+    fmt = detect_dump_format(path)
+    if fmt is None:
+        raise ValueError('不是内置导出引擎生成的备份文件')
+    started = time.time()
+    with open_backup_reader(path) as reader:
+        source = _ProgressReader(reader, progress) if progress else reader
+        progress = progress or _noop_progress
+        if fmt == 'rows':
+            result = _load_rows(conn, dialect, source, chunk_rows, create, progress, skip_tables)
+        else:
+            result = _load_sql(conn, source, chunk_rows, create, progress, skip_tables)
+    result['duration_ms'] = round((time.time() - started) * 1000, 2)
+    if logger:
+        logger.info(f"Loaded {path}: {result['tables']} tables, {result['rows']} rows in {result['duration_ms']} ms.")
+    return result
+
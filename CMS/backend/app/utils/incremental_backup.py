@@ -0,0 +1,174 @@
+import hashlib
+import json
+import zlib
+from contextlib import closing
+
+from .backup_stream import BackupWriter
+from .dump_engine import SqlDumpWriter, dump_database, dump_table, iter_row_batches, start_snapshot, table_columns
+from .parallel_dump import INTEGER_TYPES
+
+# 每个全量/增量备份旁保存一份块校验状态（<备份路径>.state），下一次增量与之比较
+STATE_SUFFIX = '.state'
+STATE_VERSION = 1
+WHOLE_TABLE = '*'  # 没有整数主键的表整表作为一个块
+
+
+def primary_key(conn, dialect, table):
+    """返回整数单列主键的列名，没有时返回 None"""
+    with closing(conn.cursor()) as cursor:
+        if dialect == 'sqlite':
+            cursor.execute(f"PRAGMA table_info(`{table}`)")
+            keys = [(row[1], row[2]) for row in cursor.fetchall() if row[5]]
+            return keys[0][0] if len(keys) == 1 and 'INT' in (keys[0][1] or '').upper() else None
+        cursor.execute(
+            "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_KEY = 'PRI'",
+            (table,)
+        )
+        keys = [tuple(row.values()) if isinstance(row, dict) else row for row in cursor.fetchall()]
+        return keys[0][0] if len(keys) == 1 and keys[0][1].lower() in INTEGER_TYPES else None
+
+
+def _mysql_row_hash(columns):
+    # 与 pt-table-checksum 相同的思路：MD5 的前 64 位，NULL 与空串通过 ISNULL 标志区分
+    values = ', '.join(f'`{c}`' for c in columns)
+    nulls = ', '.join(f'ISNULL(`{c}`)' for c in columns)
+    return f"CAST(CONV(LEFT(MD5(CONCAT_WS('#', {values}, CONCAT({nulls}))), 16), 16, 10) AS UNSIGNED)"
+
+
+def _python_row_hash(row):
+    return int.from_bytes(hashlib.md5(repr(row).encode('utf-8')).digest()[:8], 'big')
+
+
+def table_blocks(conn, dialect, table, columns, pk, block_rows):
+    """按主键把表划分为 block_rows 宽的块，返回 {块号: [行数, 校验和]}
+
+    MySQL 上在服务器端聚合（GROUP BY + BIT_XOR），只有每块一行结果经过网络；
+    SQLite 上在本进程逐行计算。校验和只在同一方言的状态之间比较。
+    """
+    if dialect != 'sqlite':
+        group = f"FLOOR(`{pk}` / {block_rows})" if pk else '0'
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                f"SELECT {group} AS blk, COUNT(*) AS cnt, BIT_XOR({_mysql_row_hash(columns)}) AS checksum "
+                f"FROM `{table}` GROUP BY blk"
+            )
+            rows = [tuple(row.values()) if isinstance(row, dict) else row for row in cursor.fetchall()]
+        return {str(int(blk)) if pk else WHOLE_TABLE: [int(count), int(checksum)] for blk, count, checksum in rows}
+
+    blocks = {}
+    index = columns.index(pk) if pk else None
+    for batch in iter_row_batches(conn, dialect, table, columns, 10000):
+        for row in batch:
+            key = str(row[index] // block_rows) if pk else WHOLE_TABLE
+            block = blocks.setdefault(key, [0, 0])
+            block[0] += 1
+            block[1] ^= _python_row_hash(row)
+    return blocks
+
+
+def compute_state(conn, dialect, tables, block_rows):
+    """计算各表的块校验状态；需在导出所用的同一快照中调用"""
+    state = {'version': STATE_VERSION, 'dialect': dialect, 'block_rows': block_rows, 'tables': {}}
+    for table in tables:
+        columns = table_columns(conn, dialect, table)
+        pk = primary_key(conn, dialect, table)
+        state['tables'][table] = {
+            'pk': pk, 'columns': columns, 'blocks': table_blocks(conn, dialect, table, columns, pk, block_rows)
+        }
+    return state
+
+
+def save_state(path, state):
+    with open(path, 'wb') as f:
+        f.write(zlib.compress(json.dumps(state, separators=(',', ':')).encode('utf-8')))
+
+
+def load_state(path):
+    with open(path, 'rb') as f:
+        return json.loads(zlib.decompress(f.read()).decode('utf-8'))
+
+
+def diff_blocks(old, new):
+    """返回 (内容有变化或新增的块号, 已不存在的块号)，均为升序整数列表"""
+    changed = sorted(int(key) for key, value in new['blocks'].items() if old['blocks'].get(key) != value)
+    removed = sorted(int(key) for key in old['blocks'] if key not in new['blocks'])
+    return changed, removed
+
+
+def block_ranges(blocks, block_rows):
+    """把升序块号合并为连续的主键区间 [(lo, hi), ...]（左闭右开）"""
+    ranges = []
+    for blk in blocks:
+        lo, hi = blk * block_rows, (blk + 1) * block_rows
+        if ranges and ranges[-1][1] == lo:
+            ranges[-1] = (ranges[-1][0], hi)
+        else:
+            ranges.append((lo, hi))
+    return ranges
+
+
+def run_full(conn, dialect, path, tables, fmt='sql', method='zstd', level=3, threads=0,
+             batch_rows=1000, block_rows=1000, logger=None, progress=None):
+    """增量链的全量备份：在同一快照中计算块校验状态并导出，返回 (统计信息, 状态)"""
+    start_snapshot(conn, dialect)
+    try:
+        state = compute_state(conn, dialect, tables, block_rows)
+    except Exception:
+        conn.rollback()
+        raise
+    stats = dump_database(conn, dialect, path, tables, fmt, method, level, threads, batch_rows, logger,
+                          snapshot=False, progress=progress)
+    return stats, state
+
+
+def write_increment(conn, dialect, path, parent_state, tables, method='zstd', level=3, threads=0,
+                    batch_rows=1000, logger=None, progress=None):
+    """只导出自 parent_state 以来校验和变化的块
+
+    变化的块先按主键区间 DELETE 再 INSERT 当前内容（覆盖新增、修改和删除），消失的块只 DELETE；
+    没有整数主键或列发生变化的表整表重建。输出为内置引擎的 sql 格式，可由 load_dump 直接重放。
+    progress 回调与 dump_database 相同。
+
+    Returns:
+        (统计信息, 新状态, {表名: 摘要})
+    """
+    block_rows = parent_state['block_rows']
+    start_snapshot(conn, dialect)
+    summary = {}
+    try:
+        state = compute_state(conn, dialect, tables, block_rows)
+        with BackupWriter(path, method, level, threads, progress) as out:
+            writer = SqlDumpWriter(out, dialect)
+            for table in tables:
+                new = state['tables'][table]
+                old = parent_state['tables'].get(table)
+                if progress:
+                    progress(tables=1)
+                if old == new:
+                    continue
+                if old is None or not new['pk'] or old['columns'] != new['columns'] or old['pk'] != new['pk']:
+                    rows = dump_table(conn, dialect, writer, table, batch_rows, new['columns'], progress=progress)
+                    summary[table] = {'mode': 'full', 'rows': rows}
+                    continue
+                pk, changed, removed = new['pk'], *diff_blocks(old, new)
+                for lo, hi in block_ranges(removed, block_rows):
+                    writer.write_statement(f"DELETE FROM `{table}` WHERE `{pk}` >= {lo} AND `{pk}` < {hi}")
+                rows = 0
+                writer.begin_table(table, new['columns'])
+                for lo, hi in block_ranges(changed, block_rows):
+                    writer.write_statement(f"DELETE FROM `{table}` WHERE `{pk}` >= {lo} AND `{pk}` < {hi}")
+                    where = f" WHERE `{pk}` >= {lo} AND `{pk}` < {hi}"
+                    for batch in iter_row_batches(conn, dialect, table, new['columns'], batch_rows, where):
+                        writer.write_rows(batch)
+                        rows += len(batch)
+                        if progress:
+                            progress(rows=len(batch))
+                writer.end_table(rows)
+                summary[table] = {'mode': 'blocks', 'changed_blocks': len(changed), 'removed_blocks': len(removed),
+                                  'rows': rows}
+    finally:
+        conn.rollback()
+    if logger:
+        logger.info(f"Incremental dump {path}: {summary or 'no changes'}.")
+    return out.result(), state, summary
@@ -0,0 +1,164 @@
+from sqlalchemy.dialects import mysql
+from app.models.log import OperationLog
+from .log_export import build_log_query
+from .comment_review import build_comment_conditions, review_list_sql
+from .migrate import find_migration
+from .search import build_met_clear_search
+
+
+# 推荐索引由迁移 0002_hot_query_indexes 定义并创建，这里只记录每个索引服务的热点查询（见 advisor_queries 中的名称）
+INDEX_QUERIES = {
+    # 审核列表: WHERE passed = ? ORDER BY comment_time DESC，按索引顺序读取即可，无需 filesort
+    'idx_comments_passed_time': ('review_pending', 'review_passed'),
+    # 审核列表按用户过滤（数字 user 参数）
+    'idx_comments_user_time': ('review_by_user_id',),
+    # 不带过滤的审核列表
+    'idx_comments_time': ('review_all',),
+    # 审核列表按用户名过滤（LEFT JOIN mobile_users）
+    'idx_mobile_username': ('review_by_username',),
+    # 日志列表: 时间范围 / 类型 / 管理员过滤，均按 operation_time DESC 排序
+    'idx_operation_logs_time': ('logs_all', 'logs_time_range'),
+    'idx_operation_logs_type_time': ('logs_by_type',),
+    'idx_operation_logs_admin_time': ('logs_by_admin',),
+}
+INDEX_MIGRATION = '0002'
+
+
+class IndexSpec:
+    """热点查询需要的一个二级索引"""
+
+    __slots__ = ('table', 'name', 'columns', 'serves')
+
+    def __init__(self, table, name, columns, serves):
+        self.table = table
+        self.name = name
+        self.columns = tuple(columns)
+        self.serves = serves  # 受益的查询（见 advisor_queries 中的名称）
+
+    def describe(self):
+        return f"{self.table}.{self.name} ({', '.join(self.columns)})"
+
+
+def recommended_indexes():
+    """读取迁移 0002 中定义的推荐索引"""
+    module = find_migration(INDEX_MIGRATION).module
+    return [IndexSpec(table, name, columns, INDEX_QUERIES.get(name, ())) for table, name, columns in module.INDEXES]
+
+
+def existing_indexes(cursor, table):
+    """{索引名: (列, ...)}"""
+    cursor.execute(
+        "SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+        (table,)
+    )
+    indexes = {}
+    for row in cursor.fetchall():
+        indexes.setdefault(row['INDEX_NAME'], []).append(row['COLUMN_NAME'])
+    return {name: tuple(columns) for name, columns in indexes.items()}
+
+
+def is_covered(spec, indexes):
+    """已有索引以 spec 的列为最左前缀时视为已满足（不论索引名）"""
+    return any(columns[:len(spec.columns)] == spec.columns for columns in indexes.values())
+
+
+def missing_indexes(conn):
+    """返回尚未满足的推荐索引（表不存在的跳过）"""
+    missing, cache = [], {}
+    with conn.cursor() as cursor:
+        for spec in recommended_indexes():
+            if spec.table not in cache:
+                cache[spec.table] = existing_indexes(cursor, spec.table)
+            if cache[spec.table] and not is_covered(spec, cache[spec.table]):
+                missing.append(spec)
+    return missing
+
+
+def _compile(query):
+    """把 SQLAlchemy 查询编译为带字面量的 MySQL 语句（参数为 None，避免 PyMySQL 再做 % 替换）"""
+    return str(query.statement.compile(dialect=mysql.dialect(), compile_kwargs={'literal_binds': True})), None
+
+
+def advisor_queries(conn, sample_user_id=1, sample_username='sample', sample_type='信息审核'):
+    """各接口实际生成的热点查询，返回 [(名称, 接口, SQL, 参数)]
+
+    SQL 与接口共用同一套条件构建函数生成，需在应用上下文中调用（检索/日志查询依赖 current_app）。
+    """
+    queries = []
+
+    def review(name, passed=None, keyword='', user=''):
+        conditions, params = build_comment_conditions(passed, keyword, user)
+        sql, params = review_list_sql(conditions, params, limit=11, offset=0)
+        queries.append((name, 'GET /api/reviews/comments', sql, params))
+
+    review('review_all')
+    review('review_pending', passed='0')
+    review('review_passed', passed='1')
+    review('review_by_user_id', user=str(sample_user_id))
+    review('review_by_username', user=sample_username)
+
+    with conn.cursor() as cursor:
+        for name, filters, keyword in (
+            ('met_clear_list', {}, ''),
+            ('met_clear_by_classify', {'classify': '绘画'}, ''),
+            ('met_clear_keyword', {}, '山水'),
+        ):
+            plan = build_met_clear_search(cursor, dict({'title': '', 'artist': '', 'classify': ''}, **filters), keyword)
+            where = " WHERE " + " AND ".join(plan.conditions) if plan.conditions else ""
+            sql = f"SELECT * FROM met_clear{where} ORDER BY `id` ASC LIMIT %s OFFSET %s"
+            queries.append((name, 'GET /api/heritage/met-clear', sql, tuple(plan.params) + (11, 0)))
+
+    order = OperationLog.operation_time.desc()
+    for name, query in (
+        ('logs_all', build_log_query()),
+        ('logs_by_type', build_log_query(operation_type=sample_type)),
+        ('logs_by_admin', build_log_query(admin_id=sample_user_id)),
+        ('logs_time_range', build_log_query(start_time='2024-01-01', end_time='2024-01-31')),
+    ):
+        sql, params = _compile(query.order_by(order).offset(0).limit(11))
+        queries.append((name, 'GET /api/logs', sql, params))
+    return queries
+
+
+def analyze_plan(plan_rows, full_scan_rows=1000):
+    """从 EXPLAIN 结果中找出问题：全表扫描、全索引扫描、filesort、临时表"""
+    issues = []
+    for row in plan_rows:
+        table = row.get('table')
+        access = (row.get('type') or '').upper()
+        extra = row.get('Extra') or ''
+        rows = row.get('rows') or 0
+        if access == 'ALL' and rows >= full_scan_rows:
+            issues.append(f'{table}: 全表扫描（约 {rows} 行）')
+        elif access == 'INDEX' and rows >= full_scan_rows and 'Using index' not in extra:
+            issues.append(f'{table}: 全索引扫描（约 {rows} 行）')
+        if 'Using filesort' in extra:
+            issues.append(f'{table}: filesort')
+        if 'Using temporary' in extra:
+            issues.append(f'{table}: 使用临时表')
+    return issues
+
+
+def run_index_advisor(conn, full_scan_rows=1000, **sample):
+    """对每个热点查询执行 EXPLAIN，返回报告列表
+
+    每项包含查询名称、接口、SQL、执行计划、发现的问题，以及能解决该问题且尚未创建的推荐索引
+    （只报告，索引由 python migrate.py up 执行迁移 0002 创建）。
+    """
+    missing = missing_indexes(conn)
+    report = []
+    for name, endpoint, sql, params in advisor_queries(conn, **sample):
+        entry = {'name': name, 'endpoint': endpoint, 'sql': sql}
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('EXPLAIN ' + sql, params)
+                plan = cursor.fetchall()
+            entry['plan'] = plan
+            entry['issues'] = analyze_plan(plan, full_scan_rows)
+        except Exception as e:
+            entry['plan'] = []
+            entry['issues'] = [f'EXPLAIN 失败: {e}']
+        entry['missing_indexes'] = [spec.describe() for spec in missing if name in spec.serves]
+        report.append(entry)
+    return report
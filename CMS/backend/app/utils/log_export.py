@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+from itertools import islice
+from app.models.log import OperationLog
+
+# 导出的列: (字段名, CSV 表头)
+EXPORT_COLUMNS = (
+    ('id', 'ID'),
+    ('admin_id', '用户ID'),
+    ('admin_username', '用户名'),
+    ('operation_type', '操作类型'),
+    ('operation_content', '操作内容'),
+    ('operation_time', '操作时间'),
+    ('ip_address', 'IP地址'),
+)
+
+# 支持的导出格式: 格式 -> (MIME 类型, 文件扩展名)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson; charset=utf-8', 'ndjson'),
+    # 列式: 每行一个行组 {"row_count": n, "columns": {字段: [值, ...]}}，适合大范围导出后按列加载
+    'columnar': ('application/x-ndjson; charset=utf-8', 'columnar.ndjson'),
+}
+
+
+def build_log_query(operation_type=None, admin_id=None, start_time=None, end_time=None, keyword=''):
+    """按列表/导出接口共用的过滤条件构建 OperationLog 查询"""
+    query = OperationLog.query
+    
+    if operation_type:
+        query = query.filter(OperationLog.operation_type == operation_type)
+        
+    if admin_id:
+        query = query.filter(OperationLog.admin_id == admin_id)
+        
+    if start_time:
+        try:
+            start_datetime = datetime.strptime(start_time, '%Y-%m-%d')
+            query = query.filter(OperationLog.operation_time >= start_datetime)
+        except ValueError:
+            pass
+            
+    if end_time:
+        try:
+            end_datetime = datetime.strptime(end_time, '%Y-%m-%d') + timedelta(days=1)
+            query = query.filter(OperationLog.operation_time < end_datetime)
+        except ValueError:
+            pass
+            
+    if keyword:
+        query = query.filter(OperationLog.operation_content.like(f'%{keyword}%'))
+    
+    return query
+
+
+def iter_log_chunks(query, chunk_size=1000):
+    """按块产出日志行（元组），只查询导出所需的列
+
+    yield_per 会让 PyMySQL 使用服务端游标(SSCursor)逐批取数，不构建 ORM 对象，
+    内存占用只与块大小有关。
+    """
+    columns = [getattr(OperationLog, name) for name, _ in EXPORT_COLUMNS]
+    rows = iter(
+        query.with_entities(*columns)
+        .order_by(OperationLog.operation_time.desc())
+        .yield_per(chunk_size)
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield [_format_row(row) for row in chunk]
+
+
+_TIME_INDEX = [name for name, _ in EXPORT_COLUMNS].index('operation_time')
+
+
+def _format_row(row):
+    row = list(row)
+    if row[_TIME_INDEX] is not None:
+        row[_TIME_INDEX] = row[_TIME_INDEX].strftime('%Y-%m-%d %H:%M:%S')
+    return row
+
+
+def _csv_stream(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # UTF-8 BOM 头，确保 Excel 等软件能正确识别中文
+    buffer.write('\ufeff')
+    writer.writerow([header for _, header in EXPORT_COLUMNS])
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _ndjson_stream(chunks):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for chunk in chunks:
+        lines = [json.dumps(dict(zip(names, row)), ensure_ascii=False) for row in chunk]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _columnar_stream(chunks):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for chunk in chunks:
+        group = {'row_count': len(chunk), 'columns': dict(zip(names, map(list, zip(*chunk))))}
+        yield (json.dumps(group, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+_STREAMS = {
+    'csv': _csv_stream,
+    'ndjson': _ndjson_stream,
+    'columnar': _columnar_stream,
+}
+
+
+def gzip_stream(byte_chunks, level=6):
+    """边生成边压缩为 gzip 格式"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: 带 gzip 头
+    for data in byte_chunks:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def encode_chunks(chunks, export_format='csv'):
+    """把 iter_log_chunks 产出的行块编码为指定格式的字节流"""
+    return _STREAMS[export_format](chunks)
+
+
+def stream_log_export(query, export_format='csv', compress=False, chunk_size=1000):
+    """生成日志导出内容的字节流
+
+    Args:
+        query: 已应用过滤条件的 OperationLog 查询
+        export_format: csv / ndjson / columnar
+        compress: 是否 gzip 压缩
+        chunk_size: 每次从数据库读取并输出的行数
+    """
+    stream = encode_chunks(iter_log_chunks(query, chunk_size), export_format)
+    return gzip_stream(stream) if compress else stream
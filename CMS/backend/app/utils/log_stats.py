@@ -0,0 +1,126 @@
+from datetime import datetime, date, timedelta
+from sqlalchemy import case
+from app import db
+from app.models.log import OperationLog, OperationLogRollup
+from .log_storage import rollups_ready
+
+MAX_OVERVIEW_DAYS = 366
+MAX_OVERVIEW_HOURS = 168
+
+
+def _since(start):
+    """operation_time >= start 时计 1，用于条件聚合"""
+    return db.func.sum(case((OperationLog.operation_time >= start, 1), else_=0))
+
+
+def _rollup_since(start):
+    """按天预聚合行中 bucket_start >= start 的条数之和"""
+    return db.func.sum(case((OperationLogRollup.bucket_start >= start, OperationLogRollup.count), else_=0))
+
+
+def _as_date(value):
+    """DATE() 的结果在 MySQL 中是 date，在 SQLite 中是 'YYYY-MM-DD' 字符串"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), '%Y-%m-%d').date()
+
+
+def _raw_overview_rows(today, week_start, month_start, range_start):
+    """直接在 operation_logs 上分组统计（预聚合表尚不可用时使用）"""
+    type_rows = db.session.query(
+        OperationLog.operation_type,
+        db.func.count(OperationLog.id),
+        _since(today),
+        _since(week_start),
+        _since(month_start)
+    ).group_by(OperationLog.operation_type).all()
+
+    day_column = db.func.date(OperationLog.operation_time)
+    daily_rows = db.session.query(
+        day_column, db.func.count(OperationLog.id)
+    ).filter(
+        OperationLog.operation_time >= range_start
+    ).group_by(day_column).all()
+    return type_rows, daily_rows
+
+
+def _rollup_overview_rows(today, week_start, month_start, range_start):
+    """在按天预聚合表上统计，结果包含已归档的历史日志"""
+    day_rollups = OperationLogRollup.query.filter(OperationLogRollup.granularity == 'day')
+    type_rows = day_rollups.with_entities(
+        OperationLogRollup.operation_type,
+        db.func.sum(OperationLogRollup.count),
+        _rollup_since(today),
+        _rollup_since(week_start),
+        _rollup_since(month_start)
+    ).group_by(OperationLogRollup.operation_type).all()
+
+    daily_rows = day_rollups.with_entities(
+        OperationLogRollup.bucket_start, db.func.sum(OperationLogRollup.count)
+    ).filter(
+        OperationLogRollup.bucket_start >= range_start
+    ).group_by(OperationLogRollup.bucket_start).all()
+    return type_rows, daily_rows
+
+
+def get_hourly_stats(hours=24, now=None):
+    """最近 hours 小时（含当前小时）每小时的日志数量，来自按小时预聚合表"""
+    now = now or datetime.now()
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    range_start = current_hour - timedelta(hours=hours - 1)
+    rows = OperationLogRollup.query.with_entities(
+        OperationLogRollup.bucket_start, db.func.sum(OperationLogRollup.count)
+    ).filter(
+        OperationLogRollup.granularity == 'hour',
+        OperationLogRollup.bucket_start >= range_start
+    ).group_by(OperationLogRollup.bucket_start).all()
+    counts = {bucket: int(count) for bucket, count in rows}
+    return [
+        {'hour': (current_hour - timedelta(hours=i)).strftime('%Y-%m-%d %H:00'),
+         'count': counts.get(current_hour - timedelta(hours=i), 0)}
+        for i in range(hours)
+    ]
+
+
+def get_log_overview_stats(days=7, now=None):
+    """计算日志概览：今日/本周/本月/总数、各类型数量以及最近 days 天的每日数量
+
+    无论 days 多大都只执行两条分组查询：
+      1. 按 operation_type 分组，用条件聚合同时得到各时间段的数量，汇总后即为总体数量；
+      2. 在时间范围内按日期分组，缺失的日期补 0。
+    预聚合表可用时在 operation_log_rollups 上统计，否则直接统计 operation_logs。
+    """
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    range_start = today - timedelta(days=days - 1)
+
+    if rollups_ready():
+        source = 'rollup'
+        type_rows, daily_rows = _rollup_overview_rows(today, week_start, month_start, range_start)
+    else:
+        source = 'raw'
+        type_rows, daily_rows = _raw_overview_rows(today, week_start, month_start, range_start)
+
+    daily_counts = {_as_date(day): count for day, count in daily_rows if day is not None}
+    daily_stats = []
+    for i in range(days):
+        day = (today - timedelta(days=i)).date()
+        daily_stats.append({'date': day.strftime('%Y-%m-%d'), 'count': int(daily_counts.get(day, 0))})
+
+    return {
+        'today_logs_count': sum(int(row[2] or 0) for row in type_rows),
+        'week_logs_count': sum(int(row[3] or 0) for row in type_rows),
+        'month_logs_count': sum(int(row[4] or 0) for row in type_rows),
+        'total_logs_count': sum(int(row[1]) for row in type_rows),
+        'type_stats': [
+            {'type': type_name, 'count': int(count)}
+            for type_name, count, *_ in type_rows
+        ],
+        'daily_stats': daily_stats,
+        'days': days,
+        'source': source
+    }
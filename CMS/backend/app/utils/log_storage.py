@@ -0,0 +1,301 @@
+import os
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event, func, select, text
+from app import db
+from app.models.log import OperationLog, OperationLogRollup, OperationLogRollupState
+from .log_export import iter_log_chunks, encode_chunks, gzip_stream, EXPORT_COLUMNS
+
+STATE_ID = 1
+BACKFILL_LOCK = 'operation_log_rollups_backfill'
+
+# 回填状态持久化在 operation_log_rollup_state 中，所有进程共用；这里只缓存已确认的结果（状态只会前进）
+_recording = False  # 状态行已存在：写入日志时维护预聚合表
+_backfilled = False  # 历史日志已回填：统计可以读预聚合表
+
+
+def _bucket_starts(operation_time):
+    """返回 {粒度: 时间段起点}"""
+    hour = operation_time.replace(minute=0, second=0, microsecond=0)
+    return {'hour': hour, 'day': hour.replace(hour=0)}
+
+
+def _aggregate(events):
+    """把 (operation_time, operation_type, admin_id) 序列聚合为预聚合行"""
+    counter = Counter()
+    for operation_time, operation_type, admin_id in events:
+        for granularity, bucket_start in _bucket_starts(operation_time).items():
+            counter[(granularity, bucket_start, operation_type, admin_id)] += 1
+    return [
+        {'granularity': g, 'bucket_start': b, 'operation_type': t, 'admin_id': a, 'count': c}
+        for (g, b, t, a), c in counter.items()
+    ]
+
+
+def _upsert_increment(connection, rows):
+    """累加预聚合计数（MySQL: ON DUPLICATE KEY UPDATE，SQLite: ON CONFLICT）"""
+    if not rows:
+        return
+    table = OperationLogRollup.__table__
+    if connection.dialect.name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        stmt = stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted['count'])
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[c.name for c in table.primary_key.columns],
+            set_={'count': table.c.count + stmt.excluded['count']}
+        )
+    connection.execute(stmt, rows)
+
+
+def _load_state(connection):
+    """读取回填状态行，尚未开始回填时返回 None"""
+    global _recording, _backfilled
+    table = OperationLogRollupState.__table__
+    row = connection.execute(select(table.c.backfill_through_id, table.c.backfilled_at).where(table.c.id == STATE_ID)).first()
+    if row is None:
+        return None
+    _recording = True
+    _backfilled = row.backfilled_at is not None
+    return {'backfill_through_id': row.backfill_through_id, 'backfilled_at': row.backfilled_at}
+
+
+def record_rollups(connection, events):
+    """写入日志后维护预聚合表
+
+    回填开始时记下当时的最大日志 id，此后写入的日志（不论哪个进程）都在这里增量累加，
+    回填只统计不超过该 id 的日志，两者不重叠。
+
+    Args:
+        connection: 与日志写入同一事务的数据库连接
+        events: 可迭代的 (operation_time, operation_type, admin_id)
+    """
+    if _recording or _load_state(connection) is not None:
+        _upsert_increment(connection, _aggregate(events))
+
+
+def _replace_rollups(start, end, rows):
+    """用精确统计结果替换 [start, end) 区间内的预聚合行"""
+    table = OperationLogRollup.__table__
+    db.session.execute(table.delete().where(table.c.bucket_start >= start, table.c.bucket_start < end))
+    if rows:
+        db.session.execute(table.insert(), rows)
+
+
+def _iter_log_events(start=None, end=None, chunk_size=1000, through_id=None):
+    query = db.session.query(OperationLog.operation_time, OperationLog.operation_type, OperationLog.admin_id)
+    if start is not None:
+        query = query.filter(OperationLog.operation_time >= start)
+    if end is not None:
+        query = query.filter(OperationLog.operation_time < end)
+    if through_id is not None:
+        query = query.filter(OperationLog.id <= through_id)
+    for operation_time, operation_type, admin_id in query.yield_per(chunk_size):
+        if operation_time is not None:
+            yield operation_time, operation_type, admin_id
+
+
+@contextmanager
+def _backfill_lock(timeout=0):
+    """回填/重建预聚合数据的跨进程互斥（MySQL GET_LOCK，持有期间占用一个独立连接）；返回是否拿到锁"""
+    if db.engine.dialect.name != 'mysql':
+        yield True
+        return
+    with db.engine.connect() as connection:
+        acquired = connection.execute(text("SELECT GET_LOCK(:name, :timeout)"), {'name': BACKFILL_LOCK, 'timeout': timeout}).scalar() == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                connection.execute(text("SELECT RELEASE_LOCK(:name)"), {'name': BACKFILL_LOCK})
+
+
+def rebuild_rollups(start=None, end=None, timeout=0):
+    """从 operation_logs 重新计算 [start, end) 区间（默认全部）的预聚合数据
+
+    与回填互斥；另一个进程正在回填或重建、等待 timeout 秒仍未结束时抛出 RuntimeError。
+    """
+    with _backfill_lock(timeout) as acquired:
+        if not acquired:
+            raise RuntimeError('另一个进程正在回填或重建日志预聚合数据')
+        rows = _aggregate(_iter_log_events(start, end))
+        _replace_rollups(start or datetime.min, end or datetime.max, rows)
+        db.session.commit()
+        return len(rows)
+
+
+def ensure_log_rollups():
+    """（仅一次）从历史日志回填预聚合表（表由迁移 0001 与 0006 创建）
+
+    回填分两步，状态持久化在 operation_log_rollup_state 中：
+    1. 写入状态行并记下当前最大日志 id，提交后各进程写入日志时开始增量维护；
+    2. 统计不超过该 id 的历史日志累加到预聚合表，与标记完成在同一事务中提交，中途失败可整体重做。
+    升级前已经有数据的预聚合表（旧版本回填过）直接标记为完成。
+    多个进程同时启动时由 GET_LOCK 串行，没拿到锁的进程直接返回，等下次定时任务再确认。
+
+    Returns:
+        历史日志是否已回填完成
+    """
+    global _recording, _backfilled
+    if _backfilled:
+        return True
+    with _backfill_lock() as acquired:
+        if not acquired:
+            current_app.logger.info("Operation log rollups are being backfilled by another process.")
+            return False
+        state = db.session.get(OperationLogRollupState, STATE_ID)
+        if state is None:
+            legacy = OperationLogRollup.query.first() is not None
+            state = OperationLogRollupState(
+                id=STATE_ID,
+                backfill_through_id=db.session.query(func.max(OperationLog.id)).scalar() or 0,
+                backfilled_at=datetime.now() if legacy else None
+            )
+            db.session.add(state)
+            db.session.commit()
+        _recording = True
+        if state.backfilled_at is None:
+            current_app.logger.info(f"Backfilling operation log rollups from operation_logs (id <= {state.backfill_through_id})...")
+            rows = _aggregate(_iter_log_events(through_id=state.backfill_through_id))
+            _upsert_increment(db.session.connection(), rows)
+            state.backfilled_at = datetime.now()
+            db.session.commit()
+            current_app.logger.info(f"Operation log rollups backfilled ({len(rows)} rollup row(s)).")
+        _backfilled = True
+        return True
+
+
+def rollups_ready():
+    """历史日志是否已回填完成（统计可以读预聚合表）"""
+    if not _backfilled:
+        _load_state(db.session.connection())
+    return _backfilled
+
+
+def _month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(value):
+    return _months_before(value, -1)
+
+
+def _months_before(value, months):
+    """月初时间 value 往前推 months 个月（负数为往后）"""
+    index = value.year * 12 + value.month - 1 - months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+def archive_month(month_start, archive_dir, chunk_size=1000):
+    """把一个自然月的日志归档为 gzip 压缩的 NDJSON 文件，校正该月预聚合数据后删除原始日志
+
+    归档文件先写入临时文件，完整落盘后再改名；删除按 id 分批进行，每批单独提交。
+
+    Returns:
+        (归档文件路径, 归档行数)
+    """
+    month_end = _next_month(month_start)
+    os.makedirs(archive_dir, exist_ok=True)
+    archive_path = os.path.join(archive_dir, f"operation_logs_{month_start.strftime('%Y%m')}.ndjson.gz")
+    if os.path.exists(archive_path):
+        # 同月已有归档（上次删除中途失败），追加为新的分卷，不覆盖已归档的数据
+        archive_path = archive_path.replace('.ndjson.gz', f"_{datetime.now().strftime('%Y%m%d%H%M%S')}.ndjson.gz")
+    temp_path = archive_path + '.tmp'
+
+    query = OperationLog.query.filter(OperationLog.operation_time >= month_start, OperationLog.operation_time < month_end)
+    names = [name for name, _ in EXPORT_COLUMNS]
+    time_index, type_index, admin_index = names.index('operation_time'), names.index('operation_type'), names.index('admin_id')
+    counter = Counter()
+
+    def tap(chunks):
+        # 归档的同时重新统计该月的精确预聚合数据
+        for chunk in chunks:
+            for row in chunk:
+                operation_time = datetime.strptime(row[time_index], '%Y-%m-%d %H:%M:%S')
+                for granularity, bucket_start in _bucket_starts(operation_time).items():
+                    counter[(granularity, bucket_start, row[type_index], row[admin_index])] += 1
+            yield chunk
+
+    with open(temp_path, 'wb') as f:
+        for data in gzip_stream(encode_chunks(tap(iter_log_chunks(query, chunk_size)), 'ndjson')):
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    archived = sum(c for (g, _, _, _), c in counter.items() if g == 'day')
+    if not archived:
+        os.remove(temp_path)
+        return None, 0
+    os.replace(temp_path, archive_path)
+
+    _replace_rollups(month_start, month_end, [
+        {'granularity': g, 'bucket_start': b, 'operation_type': t, 'admin_id': a, 'count': c}
+        for (g, b, t, a), c in counter.items()
+    ])
+    db.session.commit()
+
+    while True:
+        ids = [row.id for row in db.session.query(OperationLog.id).filter(
+            OperationLog.operation_time >= month_start, OperationLog.operation_time < month_end
+        ).order_by(OperationLog.id).limit(chunk_size)]
+        if not ids:
+            break
+        OperationLog.query.filter(OperationLog.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+    return archive_path, archived
+
+
+def prune_operation_logs(retention_months=None, now=None):
+    """把超出保留期的整月日志归档到 LOG_ARCHIVE_DIR 并从 operation_logs 删除
+
+    预聚合数据保留全部历史，因此概览统计不受归档影响；operation_logs 只保留最近的数据，
+    列表、导出等按时间过滤的查询规模不随总历史增长。
+
+    Returns:
+        归档结果列表 [{'month', 'path', 'rows'}]
+    """
+    config = current_app.config
+    if retention_months is None:
+        retention_months = config.get('LOG_RETENTION_MONTHS', 12)
+    if retention_months <= 0:
+        return []
+    ensure_log_rollups()
+
+    cutoff = _months_before(_month_start(now or datetime.now()), retention_months)
+
+    oldest = db.session.query(db.func.min(OperationLog.operation_time)).scalar()
+    results = []
+    month = _month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        path, rows = archive_month(month, config.get('LOG_ARCHIVE_DIR', 'logs/archive'), config.get('LOG_EXPORT_CHUNK_SIZE', 1000))
+        if rows:
+            current_app.logger.info(f"Archived {rows} operation log(s) of {month.strftime('%Y-%m')} to {path}.")
+            results.append({'month': month.strftime('%Y-%m'), 'path': path, 'rows': rows})
+        month = _next_month(month)
+    return results
+
+
+def run_log_maintenance():
+    """定时任务 - 确保预聚合表可用并归档过期日志（需在应用上下文中运行）"""
+    try:
+        ensure_log_rollups()
+        prune_operation_logs()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error during operation log maintenance: {e}", exc_info=True)
+
+
+def init_log_storage(app):
+    """注册 ORM 事件：写入日志时维护预聚合表"""
+    if getattr(OperationLog, '_rollup_listeners', False):
+        return
+
+    def _record_rollup(mapper, connection, target):
+        record_rollups(connection, [(target.operation_time or datetime.now(), target.operation_type, target.admin_id)])
+
+    event.listen(OperationLog, 'after_insert', _record_rollup)
+    OperationLog._rollup_listeners = True
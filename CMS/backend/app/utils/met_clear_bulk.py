@@ -0,0 +1,148 @@
+from .met_clear_import import coerce_value
+
+MAX_BULK_UPDATE_ITEMS = 10000
+
+
+def validate_update_fields(fields, schema):
+    """校验要更新的字段，返回 (按表结构转换后的字典, 错误信息)
+
+    主键/自增列不允许修改，必填列不允许置空。
+    """
+    if not isinstance(fields, dict) or not fields:
+        return None, 'fields 必须是非空对象'
+    values = {}
+    for name, value in fields.items():
+        spec = schema.get(name)
+        if spec is None:
+            return None, f'未知列: {name}'
+        if name == 'id' or spec.auto_increment:
+            return None, f'不允许修改列: {name}'
+        try:
+            values[name] = coerce_value(value, spec)
+        except (TypeError, ValueError) as e:
+            return None, f'字段 {name} 的值 {value!r} 无效: {e or "类型不匹配"}'
+        if values[name] is None and not spec.nullable:
+            return None, f'字段 {name} 不能为空'
+    return values, None
+
+
+def build_case_update(patches):
+    """把一组 (id, 字段字典) 合并为一条 UPDATE
+
+    每列生成 CASE `id` WHEN ... THEN ... ELSE 原值 END，未修改该列的行保持原值，
+    不同行可以修改不同的列。
+    """
+    columns = []
+    for _, values in patches:
+        columns.extend(c for c in values if c not in columns)
+    set_parts, params = [], []
+    for column in columns:
+        whens = []
+        for item_id, values in patches:
+            if column in values:
+                whens.append('WHEN %s THEN %s')
+                params.extend([item_id, values[column]])
+        set_parts.append(f"`{column}` = CASE `id` {' '.join(whens)} ELSE `{column}` END")
+    ids = [item_id for item_id, _ in patches]
+    params.extend(ids)
+    sql = f"UPDATE `met_clear` SET {', '.join(set_parts)} WHERE `id` IN ({', '.join(['%s'] * len(ids))})"
+    return sql, params
+
+
+def _existing_ids(cursor, ids):
+    cursor.execute(f"SELECT `id` FROM `met_clear` WHERE `id` IN ({', '.join(['%s'] * len(ids))})", tuple(ids))
+    return {row['id'] for row in cursor.fetchall()}
+
+
+def bulk_update_patches(conn, items, schema, chunk_size=500, logger=None):
+    """按 id 批量更新 met_clear
+
+    合法的补丁按 chunk_size 分块，每块一条 CASE 多行 UPDATE、一个事务；不再逐行 SELECT 检查存在性。
+    UPDATE 影响行数等于块大小时所有 id 均已更新；否则（有不存在的 id 或值未变化）
+    在同一事务中用一条 SELECT id ... IN (...) 区分。某块失败时回滚该块，其余块不受影响。
+
+    Args:
+        items: [{'id': 1, 'fields': {...}}, ...]
+
+    Returns:
+        (按输入顺序的逐 id 结果列表, 汇总字典)
+    """
+    results = []
+    patches = []
+    seen = set()
+    for item in items:
+        item_id = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(item_id, int) or isinstance(item_id, bool):
+            results.append({'id': item_id, 'status': 'invalid', 'error': 'id 必须是整数'})
+            continue
+        if item_id in seen:
+            results.append({'id': item_id, 'status': 'invalid', 'error': '同一 id 重复出现'})
+            continue
+        seen.add(item_id)
+        values, error = validate_update_fields(item.get('fields'), schema)
+        result = {'id': item_id, 'status': 'invalid', 'error': error} if error else {'id': item_id, 'status': 'pending'}
+        results.append(result)
+        if not error:
+            patches.append((item_id, values, result))
+
+    chunks = 0
+    for start in range(0, len(patches), chunk_size):
+        chunk = patches[start:start + chunk_size]
+        sql, params = build_case_update([(item_id, values) for item_id, values, _ in chunk])
+        try:
+            with conn.cursor() as cursor:
+                affected = cursor.execute(sql, tuple(params))
+                existing = None if affected == len(chunk) else _existing_ids(cursor, [p[0] for p in chunk])
+            conn.commit()
+            chunks += 1
+        except Exception as e:
+            conn.rollback()
+            if logger:
+                logger.error(f"met_clear bulk update chunk starting at id {chunk[0][0]} failed: {e}")
+            for _, _, result in chunk:
+                result.update(status='failed', error=str(e))
+            continue
+        for item_id, _, result in chunk:
+            result['status'] = 'updated' if existing is None or item_id in existing else 'not_found'
+
+    summary = {'total': len(results), 'chunks': chunks}
+    for status in ('updated', 'not_found', 'invalid', 'failed'):
+        summary[status] = sum(1 for r in results if r['status'] == status)
+    return results, summary
+
+
+def bulk_update_by_filter(conn, conditions, params, values, chunk_size=500):
+    """把满足过滤条件的行的若干列设为相同的值
+
+    按 id 游标分块：每块先取一批匹配的 id，再用 UPDATE ... WHERE id IN (...) 更新并提交，
+    单个事务的锁范围与块大小相同；修改过滤列本身也不会漏行或重复。
+
+    Returns:
+        汇总字典 {'matched', 'chunks'}，中途失败时另含 'error'
+    """
+    where = ' AND '.join(conditions) if conditions else '1 = 1'
+    set_clause = ', '.join(f"`{column}` = %s" for column in values)
+    matched, chunks, last_id = 0, 0, 0
+    while True:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT `id` FROM `met_clear` WHERE ({where}) AND `id` > %s ORDER BY `id` LIMIT %s",
+                tuple(params) + (last_id, chunk_size)
+            )
+            ids = [row['id'] for row in cursor.fetchall()]
+            if not ids:
+                break
+            try:
+                cursor.execute(
+                    f"UPDATE `met_clear` SET {set_clause} WHERE `id` IN ({', '.join(['%s'] * len(ids))})",
+                    tuple(values.values()) + tuple(ids)
+                )
+                conn.commit()
+            except Exception as e:
+                # 之前的块已提交，返回已完成的进度，可用同样的请求重试剩余部分
+                conn.rollback()
+                return {'matched': matched, 'chunks': chunks, 'error': str(e)}
+        matched += len(ids)
+        chunks += 1
+        last_id = ids[-1]
+    return {'matched': matched, 'chunks': chunks}
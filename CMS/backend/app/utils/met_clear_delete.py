@@ -0,0 +1,238 @@
+import time
+import uuid
+import zlib
+from datetime import datetime
+from flask import current_app
+from app import scheduler
+from .audit_log import log_operation
+from .counts import invalidate_counts
+from .db import get_db_connection
+from .scheduling import run_in_app_context
+
+# 任务表与分块表由迁移 0008_background_job_tables 创建；完整的 id 集合按块保存为差分 + zlib 压缩的字节串
+JOB_TABLE = 'met_clear_delete_jobs'
+CHUNK_TABLE = 'met_clear_delete_job_chunks'
+UNFINISHED_STATUSES = ('pending', 'running', 'interrupted')
+# 执行失败的任务转为 interrupted 并按退避时间自动重试，达到 BATCH_DELETE_MAX_ATTEMPTS 次后转为 failed，不再重试
+
+
+def encode_ids(ids):
+    """把升序 id 列表编码为差分 + zlib 压缩的字节串"""
+    previous, deltas = 0, []
+    for item_id in ids:
+        deltas.append(item_id - previous)
+        previous = item_id
+    return zlib.compress(','.join(map(str, deltas)).encode('ascii'))
+
+
+def decode_ids(data):
+    ids, current = [], 0
+    text = zlib.decompress(bytes(data)).decode('ascii')
+    for delta in text.split(',') if text else []:
+        current += int(delta)
+        ids.append(current)
+    return ids
+
+
+def create_delete_job(conn, ids, chunk_size, admin_id=None, admin_username=None, ip_address=None):
+    """登记一个批量删除任务：去重排序后的 id 按 chunk_size 分块写入侧表，返回 job_id"""
+    ids = sorted(set(ids))
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    job_id = uuid.uuid4().hex
+    now = datetime.now()
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO `{JOB_TABLE}` (`job_id`, `status`, `total_ids`, `chunk_count`, `admin_id`, `admin_username`, "
+            f"`ip_address`, `created_at`, `updated_at`) VALUES (%s, 'pending', %s, %s, %s, %s, %s, %s, %s)",
+            (job_id, len(ids), len(chunks), admin_id, admin_username, ip_address, now, now)
+        )
+        cursor.executemany(
+            f"INSERT INTO `{CHUNK_TABLE}` (`job_id`, `chunk_no`, `id_count`, `ids`) VALUES (%s, %s, %s, %s)",
+            [(job_id, number, len(chunk), encode_ids(chunk)) for number, chunk in enumerate(chunks)]
+        )
+    conn.commit()
+    return job_id
+
+
+def _claim(conn, job_id, stale_seconds, max_attempts):
+    """把任务标记为 running 并累加尝试次数
+
+    正在被其他线程/进程执行（且未超时）、尚未到重试时间或已用完尝试次数的任务不会被执行。
+    """
+    now = datetime.now()
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE `{JOB_TABLE}` SET `status` = 'running', `attempts` = `attempts` + 1, `next_attempt_at` = NULL, "
+            f"`started_at` = COALESCE(`started_at`, %s), `updated_at` = %s "
+            f"WHERE `job_id` = %s AND `attempts` < %s AND (`next_attempt_at` IS NULL OR `next_attempt_at` <= %s) "
+            f"AND (`status` IN ('pending', 'interrupted') OR (`status` = 'running' AND `updated_at` < %s))",
+            (now, now, job_id, max_attempts, now, datetime.fromtimestamp(time.time() - stale_seconds))
+        )
+        claimed = cursor.rowcount == 1
+    conn.commit()
+    return claimed
+
+
+def _finish(conn, job_id, status, message=None, next_attempt_at=None):
+    now = datetime.now()
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE `{JOB_TABLE}` SET `status` = %s, `message` = %s, `next_attempt_at` = %s, `updated_at` = %s, "
+            f"`finished_at` = %s WHERE `job_id` = %s",
+            (status, (message or '')[:500] or None, next_attempt_at, now, now if status in ('completed', 'failed') else None, job_id)
+        )
+    conn.commit()
+
+
+def _fail_attempt(conn, job_id, message, max_attempts, backoff):
+    """一次执行失败：还有尝试次数时转为 interrupted 并按指数退避安排重试，否则转为 failed"""
+    job = get_delete_job(conn, job_id)
+    attempts = job['attempts'] if job else max_attempts
+    if attempts >= max_attempts:
+        _finish(conn, job_id, 'failed', f"执行 {attempts} 次后仍失败: {message}")
+        return 'failed'
+    delay = backoff * 2 ** max(attempts - 1, 0)
+    _finish(conn, job_id, 'interrupted', message, datetime.fromtimestamp(time.time() + delay))
+    return 'interrupted'
+
+
+def run_delete_job(job_id):
+    """执行（或继续执行）批量删除任务（需在应用上下文中运行）
+
+    每块一个事务：DELETE ... WHERE id IN (本块 id)，并在同一事务中标记该块完成、累加任务进度，
+    中断后重新执行只处理未完成的块。块之间可配置短暂停顿，让其他事务有机会获取锁。
+    """
+    config = current_app.config
+    pause = config.get('BATCH_DELETE_CHUNK_PAUSE', 0.05)
+    max_attempts = config.get('BATCH_DELETE_MAX_ATTEMPTS', 5)
+    conn = get_db_connection()
+    try:
+        if not _claim(conn, job_id, config.get('BATCH_DELETE_STALE_SECONDS', 300), max_attempts):
+            return
+        current_app.logger.info(f"met_clear batch delete job {job_id} started.")
+        while True:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT `chunk_no`, `id_count`, `ids` FROM `{CHUNK_TABLE}` WHERE `job_id` = %s AND `done` = 0 "
+                    f"ORDER BY `chunk_no` LIMIT 1",
+                    (job_id,)
+                )
+                chunk = cursor.fetchone()
+                if chunk is None:
+                    break
+                ids = decode_ids(chunk['ids'])
+                deleted = cursor.execute(
+                    f"DELETE FROM `met_clear` WHERE `id` IN ({', '.join(['%s'] * len(ids))})", tuple(ids)
+                )
+                cursor.execute(
+                    f"UPDATE `{CHUNK_TABLE}` SET `done` = 1, `deleted_rows` = %s WHERE `job_id` = %s AND `chunk_no` = %s",
+                    (deleted, job_id, chunk['chunk_no'])
+                )
+                cursor.execute(
+                    f"UPDATE `{JOB_TABLE}` SET `processed_ids` = `processed_ids` + %s, `deleted_rows` = `deleted_rows` + %s, "
+                    f"`chunks_done` = `chunks_done` + 1, `updated_at` = %s WHERE `job_id` = %s",
+                    (chunk['id_count'], deleted, datetime.now(), job_id)
+                )
+            conn.commit()
+            invalidate_counts('met_clear')
+            if pause:
+                time.sleep(pause)
+
+        _finish(conn, job_id, 'completed')
+        job = get_delete_job(conn, job_id)
+        current_app.logger.info(f"met_clear batch delete job {job_id} completed: {job['deleted_rows']} row(s) deleted.")
+        log_operation(
+            admin_id=job['admin_id'],
+            admin_username=job['admin_username'],
+            operation_type='batch_delete_heritage',
+            operation_content=(f"批量删除文物(met_clear): 任务 {job_id}, 请求 {job['total_ids']} 个ID, "
+                               f"删除 {job['deleted_rows']} 条（完整ID列表见 {CHUNK_TABLE}）"),
+            ip_address=job['ip_address']
+        )
+    except Exception as e:
+        conn.rollback()
+        current_app.logger.error(f"met_clear batch delete job {job_id} failed: {e}", exc_info=True)
+        try:
+            status = _fail_attempt(conn, job_id, str(e), max_attempts, config.get('BATCH_DELETE_RETRY_BACKOFF', 60))
+            if status == 'failed':
+                current_app.logger.error(f"met_clear batch delete job {job_id} gave up after {max_attempts} attempt(s).")
+        except Exception:
+            pass
+    finally:
+        conn.close()
+
+
+def get_delete_job(conn, job_id):
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM `{JOB_TABLE}` WHERE `job_id` = %s", (job_id,))
+        return cursor.fetchone()
+
+
+def get_delete_job_ids(conn, job_id):
+    """从侧表还原任务的完整 id 列表"""
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT `ids` FROM `{CHUNK_TABLE}` WHERE `job_id` = %s ORDER BY `chunk_no`", (job_id,))
+        return [item_id for row in cursor.fetchall() for item_id in decode_ids(row['ids'])]
+
+
+def delete_job_status(job, now=None):
+    """任务记录转换为接口返回的进度信息（含百分比、速率与预计剩余时间）"""
+    now = now or datetime.now()
+    data = dict(job)
+    total, processed = data['total_ids'], data['processed_ids']
+    data['progress'] = round(processed * 100.0 / total, 2) if total else 100.0
+    data['ids_per_second'] = None
+    data['eta_seconds'] = None
+    started_at = data.get('started_at')
+    if started_at is not None and processed:
+        elapsed = ((data.get('finished_at') or now) - started_at).total_seconds()
+        if elapsed > 0:
+            rate = processed / elapsed
+            data['ids_per_second'] = round(rate, 2)
+            if data['status'] == 'running':
+                data['eta_seconds'] = round((total - processed) / rate, 1)
+    if data['status'] == 'completed':
+        data['eta_seconds'] = 0
+    for key in ('created_at', 'started_at', 'updated_at', 'finished_at', 'next_attempt_at'):
+        if isinstance(data.get(key), datetime):
+            data[key] = data[key].strftime('%Y-%m-%d %H:%M:%S')
+    return data
+
+
+def submit_delete_job(app, job_id):
+    """把任务交给后台调度器立即执行，Web 请求不等待删除完成"""
+    scheduler.add_job(
+        id=f'met_clear_delete_{job_id}', func=run_in_app_context, args=[app, run_delete_job, job_id],
+        trigger='date', replace_existing=True, misfire_grace_time=None
+    )
+
+
+def resume_delete_jobs(app):
+    """定期继续执行未完成的批量删除任务（需在应用上下文中运行）
+
+    只重新提交到了重试时间、还有尝试次数的任务；执行中进程崩溃（running 超时）且已用完尝试次数的任务转为 failed。
+    """
+    config = current_app.config
+    max_attempts = config.get('BATCH_DELETE_MAX_ATTEMPTS', 5)
+    now = datetime.now()
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE `{JOB_TABLE}` SET `status` = 'failed', `message` = %s, `updated_at` = %s, `finished_at` = %s "
+                f"WHERE `status` = 'running' AND `attempts` >= %s AND `updated_at` < %s",
+                (f"执行 {max_attempts} 次后仍未完成（进程中断）", now, now, max_attempts,
+                 datetime.fromtimestamp(time.time() - config.get('BATCH_DELETE_STALE_SECONDS', 300)))
+            )
+            cursor.execute(
+                f"SELECT `job_id` FROM `{JOB_TABLE}` WHERE `status` IN ({', '.join(['%s'] * len(UNFINISHED_STATUSES))}) "
+                f"AND `attempts` < %s AND (`next_attempt_at` IS NULL OR `next_attempt_at` <= %s)",
+                UNFINISHED_STATUSES + (max_attempts, now)
+            )
+            job_ids = [row['job_id'] for row in cursor.fetchall()]
+        conn.commit()
+    finally:
+        conn.close()
+    for job_id in job_ids:
+        current_app.logger.info(f"Resuming met_clear batch delete job {job_id}.")
+        submit_delete_job(app, job_id)
@@ -0,0 +1,333 @@
+import csv
+import json
+import os
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+JOB_TABLE = 'met_clear_import_jobs'  # 由迁移 0008_background_job_tables 创建
+MAX_STORED_ERRORS = 500
+
+_INT_TYPES = {'tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint'}
+_DECIMAL_TYPES = {'decimal', 'numeric'}
+_FLOAT_TYPES = {'float', 'double', 'real'}
+_STRING_TYPES = {'char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext'}
+
+
+class ImportFileError(ValueError):
+    """文件级错误（格式不支持、表头与表结构不匹配等），整个文件无法导入"""
+
+
+class ColumnSpec:
+    """met_clear 的一列：类型、是否可空、长度上限、是否有默认值/自增"""
+
+    __slots__ = ('name', 'data_type', 'nullable', 'max_length', 'has_default', 'auto_increment')
+
+    def __init__(self, name, data_type, nullable, max_length=None, has_default=False, auto_increment=False):
+        self.name = name
+        self.data_type = (data_type or '').lower()
+        self.nullable = nullable
+        self.max_length = max_length
+        self.has_default = has_default
+        self.auto_increment = auto_increment
+
+    @property
+    def required(self):
+        return not self.nullable and not self.has_default and not self.auto_increment
+
+
+def load_met_clear_schema(conn):
+    """从 information_schema 读取 met_clear 的列定义"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE, CHARACTER_MAXIMUM_LENGTH, COLUMN_DEFAULT, EXTRA "
+            "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'met_clear' "
+            "ORDER BY ORDINAL_POSITION"
+        )
+        rows = cursor.fetchall()
+    if not rows:
+        raise RuntimeError('无法读取 met_clear 表结构')
+    return {
+        row['COLUMN_NAME']: ColumnSpec(
+            row['COLUMN_NAME'], row['DATA_TYPE'], row['IS_NULLABLE'] == 'YES', row['CHARACTER_MAXIMUM_LENGTH'],
+            row['COLUMN_DEFAULT'] is not None, 'auto_increment' in (row['EXTRA'] or '').lower()
+        )
+        for row in rows
+    }
+
+
+_schema_cache = {'schema': None, 'loaded_at': 0.0}
+
+
+def get_met_clear_schema(conn, ttl=300):
+    """带进程内缓存的 met_clear 表结构，ttl 秒后重新读取"""
+    if _schema_cache['schema'] is None or time.monotonic() - _schema_cache['loaded_at'] > ttl:
+        _schema_cache['schema'] = load_met_clear_schema(conn)
+        _schema_cache['loaded_at'] = time.monotonic()
+    return _schema_cache['schema']
+
+
+def detect_format(filename, explicit=None):
+    fmt = (explicit or os.path.splitext(filename or '')[1].lstrip('.')).lower()
+    if fmt in ('ndjson', 'json'):
+        fmt = 'jsonl'
+    if fmt not in IMPORT_FORMATS:
+        raise ImportFileError(f"不支持的导入格式: {fmt or '未知'}，可选: {', '.join(IMPORT_FORMATS)}")
+    return fmt
+
+
+def iter_records(path, fmt):
+    """流式读取导入文件，逐条产出 (数据行号, 记录字典)，行号从 1 开始"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            yield 0, reader.fieldnames or []  # 第 0 条为表头，供校验列名
+            for number, record in enumerate(reader, start=1):
+                yield number, record
+        else:
+            header_sent = False
+            for number, line in enumerate((l for l in f if l.strip()), start=1):
+                if not header_sent:
+                    yield 0, None
+                    header_sent = True
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    record = e
+                yield number, record
+
+
+def check_columns(columns, schema):
+    """校验表头：不允许未知列，必填列必须存在"""
+    unknown = [c for c in columns if c not in schema]
+    if unknown:
+        raise ImportFileError(f"met_clear 中不存在的列: {', '.join(unknown)}")
+    missing = [name for name, spec in schema.items() if spec.required and name not in columns]
+    if missing:
+        raise ImportFileError(f"缺少必填列: {', '.join(missing)}")
+
+
+def coerce_value(value, spec, from_csv=False):
+    """按列类型转换并校验一个值；CSV 中非字符串列的空串视为 NULL"""
+    if value is None or (from_csv and value == '' and spec.data_type not in _STRING_TYPES):
+        return None
+    data_type = spec.data_type
+    if data_type in _INT_TYPES:
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError('应为整数')
+        return int(value)
+    if data_type in _DECIMAL_TYPES:
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError('应为数字')
+    if data_type in _FLOAT_TYPES:
+        return float(value)
+    if data_type == 'date':
+        return value if isinstance(value, date) else date.fromisoformat(str(value))
+    if data_type in ('datetime', 'timestamp'):
+        return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    value = str(value)
+    if spec.max_length is not None and data_type in _STRING_TYPES and len(value) > spec.max_length:
+        raise ValueError(f'长度超过 {spec.max_length}')
+    return value
+
+
+def validate_record(record, schema, from_csv=False):
+    """按表结构校验并转换一条记录，返回 (行字典, 错误信息)"""
+    if isinstance(record, Exception):
+        return None, f'JSON 解析失败: {record}'
+    if not isinstance(record, dict):
+        return None, '每行必须是一个 JSON 对象'
+    row = {}
+    for name, value in record.items():
+        spec = schema.get(name)
+        if spec is None:
+            return None, f'未知列: {name}'
+        try:
+            row[name] = coerce_value(value, spec, from_csv)
+        except (TypeError, ValueError) as e:
+            return None, f'字段 {name} 的值 {value!r} 无效: {e or "类型不匹配"}'
+        if row[name] is None and spec.required:
+            return None, f'字段 {name} 不能为空'
+    for name, spec in schema.items():
+        if spec.required and name not in row:
+            return None, f'缺少必填字段 {name}'
+    return row, None
+
+
+class ImportJobStore:
+    """导入任务状态表（与数据写入使用同一连接，进度与数据在同一事务中提交）"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def create(self, source_name, source_path, fmt, created_by=None, job_id=None):
+        job_id = job_id or uuid.uuid4().hex
+        now = datetime.now()
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO `{JOB_TABLE}` (`job_id`, `source_name`, `source_path`, `format`, `status`, `errors`, "
+                f"`created_by`, `created_at`, `updated_at`) VALUES (%s, %s, %s, %s, 'pending', '[]', %s, %s, %s)",
+                (job_id, source_name, source_path, fmt, created_by, now, now)
+            )
+        self.conn.commit()
+        return job_id
+
+    def get(self, job_id):
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"SELECT * FROM `{JOB_TABLE}` WHERE `job_id` = %s", (job_id,))
+            return cursor.fetchone()
+
+    def claim(self, job_id, stale_seconds=300):
+        """把任务标记为 running；正在被其他请求处理（且未超时）的任务无法认领"""
+        now = datetime.now()
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE `{JOB_TABLE}` SET `status` = 'running', `updated_at` = %s WHERE `job_id` = %s "
+                f"AND `status` <> 'completed' AND (`status` <> 'running' OR `updated_at` < %s)",
+                (now, job_id, datetime.fromtimestamp(time.time() - stale_seconds))
+            )
+            claimed = cursor.rowcount == 1
+        self.conn.commit()
+        return claimed
+
+    def record_batch(self, job_id, processed, inserted, failed, errors):
+        """在当前事务中更新进度（不提交，由调用方与数据一起提交）"""
+        job = self.get(job_id)
+        stored = json.loads(job['errors'] or '[]')
+        stored.extend(errors[:max(0, MAX_STORED_ERRORS - len(stored))])
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE `{JOB_TABLE}` SET `processed_rows` = %s, `inserted_rows` = `inserted_rows` + %s, "
+                f"`failed_rows` = `failed_rows` + %s, `batches` = `batches` + 1, `errors` = %s, `updated_at` = %s "
+                f"WHERE `job_id` = %s",
+                (processed, inserted, failed, json.dumps(stored, ensure_ascii=False), datetime.now(), job_id)
+            )
+
+    def finish(self, job_id, status, message=None):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE `{JOB_TABLE}` SET `status` = %s, `message` = %s, `updated_at` = %s WHERE `job_id` = %s",
+                (status, (message or '')[:500] or None, datetime.now(), job_id)
+            )
+        self.conn.commit()
+
+
+def job_to_dict(job):
+    """任务记录转换为接口返回的字典"""
+    if not job:
+        return None
+    data = dict(job)
+    data['errors'] = json.loads(data.get('errors') or '[]')
+    for key in ('created_at', 'updated_at'):
+        if isinstance(data.get(key), datetime):
+            data[key] = data[key].strftime('%Y-%m-%d %H:%M:%S')
+    data.pop('source_path', None)
+    return data
+
+
+class MetClearImporter:
+    """met_clear 批量导入
+
+    流式读取 CSV/JSONL，逐行按表结构校验，合法行按 batch_size 分批用 executemany 写入
+    （PyMySQL 会改写为一条多行 INSERT）。每批与任务进度在同一事务中提交，中断后用同一
+    job_id 重新执行即可从上次提交的位置继续，不会重复插入。某批写入失败时逐行重试以定位出错的行。
+    """
+
+    def __init__(self, conn, schema, batch_size=1000, on_batch=None, logger=None):
+        self.conn = conn
+        self.schema = schema
+        self.batch_size = batch_size
+        self.on_batch = on_batch  # on_batch(job_id, summary)，每批提交后调用（写审计日志）
+        self.logger = logger
+        self.store = ImportJobStore(conn)
+
+    def _insert_rows(self, rows):
+        """批量插入同一列集合的行，返回失败的 [(行号, 错误)]"""
+        columns = list(rows[0][1].keys())
+        sql = f"INSERT INTO `met_clear` ({', '.join(f'`{c}`' for c in columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        params = [tuple(row[c] for c in columns) for _, row in rows]
+        with self.conn.cursor() as cursor:
+            cursor.execute("SAVEPOINT met_clear_import")
+            try:
+                cursor.executemany(sql, params)
+                return []
+            except Exception as batch_error:
+                if self.logger:
+                    self.logger.warning(f"met_clear import batch insert failed, retrying row by row: {batch_error}")
+            # 整批失败（例如主键冲突）：只回滚到本组之前的保存点，再逐行插入，找出具体失败的行
+            cursor.execute("ROLLBACK TO SAVEPOINT met_clear_import")
+            failures = []
+            for (number, _), values in zip(rows, params):
+                cursor.execute("SAVEPOINT met_clear_import_row")
+                try:
+                    cursor.execute(sql, values)
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT met_clear_import_row")
+                    failures.append((number, str(e)))
+            return failures
+
+    def _flush(self, job_id, pending, errors, last_number):
+        groups = {}
+        for number, row in pending:
+            groups.setdefault(tuple(row.keys()), []).append((number, row))
+        failures = []
+        for rows in groups.values():
+            failures.extend(self._insert_rows(rows))
+        batch_errors = errors + [{'row': n, 'error': e} for n, e in failures]
+        inserted = len(pending) - len(failures)
+        self.store.record_batch(job_id, last_number, inserted, len(batch_errors), batch_errors)
+        self.conn.commit()
+        summary = {
+            'first_row': pending[0][0] if pending else (errors[0]['row'] if errors else last_number),
+            'last_row': last_number,
+            'inserted': inserted,
+            'failed': len(batch_errors)
+        }
+        if self.on_batch:
+            self.on_batch(job_id, summary)
+        return inserted, len(batch_errors)
+
+    def run(self, job_id):
+        """执行（或继续执行）导入任务，返回任务记录"""
+        job = self.store.get(job_id)
+        if job is None:
+            raise ValueError(f'导入任务不存在: {job_id}')
+        start_after = job['processed_rows']
+        fmt = job['format']
+        pending, errors = [], []
+        last_number = start_after
+        try:
+            for number, record in iter_records(job['source_path'], fmt):
+                if number == 0:
+                    if fmt == 'csv':
+                        check_columns(record, self.schema)
+                    continue
+                if number <= start_after:
+                    continue
+                last_number = number
+                row, error = validate_record(record, self.schema, from_csv=(fmt == 'csv'))
+                if error:
+                    errors.append({'row': number, 'error': error})
+                else:
+                    pending.append((number, row))
+                if len(pending) + len(errors) >= self.batch_size:
+                    self._flush(job_id, pending, errors, last_number)
+                    pending, errors = [], []
+            if pending or errors:
+                self._flush(job_id, pending, errors, last_number)
+        except ImportFileError as e:
+            self.conn.rollback()
+            self.store.finish(job_id, 'failed', str(e))
+            raise
+        except Exception as e:
+            self.conn.rollback()
+            self.store.finish(job_id, 'interrupted', f'导入中断，可使用相同 job_id 继续: {e}')
+            raise
+        self.store.finish(job_id, 'completed')
+        return self.store.get(job_id)
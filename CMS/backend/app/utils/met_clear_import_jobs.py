@@ -0,0 +1,62 @@
+from flask import current_app
+from app import scheduler
+from .audit_log import log_operation
+from .counts import invalidate_counts
+from .db import get_db_connection
+from .met_clear_import import ImportFileError, ImportJobStore, MetClearImporter, get_met_clear_schema
+from .scheduling import run_in_app_context
+
+
+def _log_import_batch(admin_id, admin_username, ip_address):
+    """每批提交后写入一条汇总操作日志"""
+    def on_batch(job_id, summary):
+        log_operation(
+            admin_id=admin_id,
+            admin_username=admin_username,
+            operation_type='import_heritage',
+            operation_content=(f"批量导入文物(met_clear): 任务 {job_id}, 第 {summary['first_row']}-{summary['last_row']} 行, "
+                               f"成功 {summary['inserted']} 条, 失败 {summary['failed']} 条"),
+            ip_address=ip_address
+        )
+    return on_batch
+
+
+def run_import_job(job_id, batch_size, admin_id=None, admin_username=None, ip_address=None):
+    """执行已认领（running）的导入任务（需在应用上下文中运行）
+
+    结果与错误都写回任务记录：文件级错误为 failed，其他异常为 interrupted（可用同一 job_id 继续），
+    通过 GET /api/heritage/met-clear/import/<job_id> 查询。
+    """
+    conn = get_db_connection()
+    try:
+        importer = MetClearImporter(
+            conn, get_met_clear_schema(conn), batch_size=batch_size,
+            on_batch=_log_import_batch(admin_id, admin_username, ip_address), logger=current_app.logger
+        )
+        job = importer.run(job_id)
+        current_app.logger.info(f"met_clear import job {job_id} completed: {job['inserted_rows']} row(s) inserted, "
+                                f"{job['failed_rows']} row(s) failed.")
+    except ImportFileError as e:
+        current_app.logger.warning(f"met_clear import job {job_id} failed: {e}")
+    except Exception as e:
+        current_app.logger.error(f"met_clear import job {job_id} interrupted: {e}", exc_info=True)
+        try:
+            # 读取表结构等步骤在 importer.run 之前失败时，任务仍停留在 running
+            conn.rollback()
+            job = ImportJobStore(conn).get(job_id)
+            if job and job['status'] == 'running':
+                ImportJobStore(conn).finish(job_id, 'interrupted', f'导入中断，可使用相同 job_id 继续: {e}')
+        except Exception:
+            pass
+    finally:
+        invalidate_counts('met_clear')
+        conn.close()
+
+
+def submit_import_job(app, job_id, batch_size, admin_id=None, admin_username=None, ip_address=None):
+    """把已认领的导入任务交给后台调度器立即执行，Web 请求不等待导入完成"""
+    scheduler.add_job(
+        id=f'met_clear_import_{job_id}', func=run_in_app_context,
+        args=[app, run_import_job, job_id, batch_size, admin_id, admin_username, ip_address],
+        trigger='date', replace_existing=True, misfire_grace_time=None
+    )
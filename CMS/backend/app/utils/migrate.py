@@ -0,0 +1,405 @@
+import hashlib
+import importlib.util
+import os
+import re
+import time
+from datetime import datetime
+
+HISTORY_TABLE = 'schema_migrations'
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.py$')
+ONLINE_DDL = 'ALGORITHM=INPLACE, LOCK=NONE'
+
+MIGRATION_TEMPLATE = '''"""{description}"""
+
+
+def up(ctx):
+    pass
+
+
+def down(ctx):
+    pass
+'''
+
+
+class MigrationError(RuntimeError):
+    """某个迁移执行失败；statements 为失败前已执行的语句及耗时"""
+
+    def __init__(self, message, statements=None):
+        super().__init__(message)
+        self.statements = statements or []
+
+
+class MigrationContext:
+    """传给迁移脚本 up/down 的上下文
+
+    封装 MySQL 与 SQLite 的差异（参数占位符、自增主键、表选项、元数据查询），
+    结构变更辅助方法默认幂等（已存在/不存在时跳过），MySQL 上默认使用在线 DDL。
+    每条语句的耗时记录在 statements 中。
+    """
+
+    def __init__(self, conn, dialect, online=True):
+        self.conn = conn
+        self.dialect = dialect
+        self.online = online
+        self.statements = []
+
+    # ---- 执行与查询 ----
+
+    def _execute(self, cursor, sql, params):
+        # 没有参数时不传 args，避免 PyMySQL 对语句中的 % 做格式化
+        if self.dialect == 'sqlite':
+            sql = sql.replace('%s', '?')
+        if params:
+            cursor.execute(sql, tuple(params))
+        else:
+            cursor.execute(sql)
+
+    def execute(self, sql, params=None):
+        """执行一条语句（占位符统一写 %s），返回影响行数"""
+        started = time.perf_counter()
+        cursor = self.conn.cursor()
+        try:
+            self._execute(cursor, sql, params)
+            return cursor.rowcount
+        finally:
+            cursor.close()
+            self.statements.append({'sql': ' '.join(sql.split()), 'duration_ms': round((time.perf_counter() - started) * 1000, 2)})
+
+    def query(self, sql, params=None):
+        cursor = self.conn.cursor()
+        try:
+            self._execute(cursor, sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def has_table(self, table):
+        if self.dialect == 'sqlite':
+            return bool(self.query("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", (table,)))
+        return bool(self.query(
+            "SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table,)
+        ))
+
+    def has_column(self, table, column):
+        if self.dialect == 'sqlite':
+            return any(row[1] == column for row in self.query(f"PRAGMA table_info(`{table}`)"))
+        return bool(self.query(
+            "SELECT 1 FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+            (table, column)
+        ))
+
+    def has_index(self, table, name):
+        if self.dialect == 'sqlite':
+            return bool(self.query("SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s", (table, name)))
+        return bool(self.query(
+            "SELECT 1 FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+            (table, name)
+        ))
+
+    def index_columns(self, table):
+        """{索引名: (列, ...)}"""
+        if self.dialect == 'sqlite':
+            return {
+                row[1]: tuple(info[2] for info in self.query(f"PRAGMA index_info(`{row[1]}`)"))
+                for row in self.query(f"PRAGMA index_list(`{table}`)")
+            }
+        indexes = {}
+        for name, column in self.query(
+            "SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+            (table,)
+        ):
+            indexes.setdefault(name, []).append(column)
+        return {name: tuple(columns) for name, columns in indexes.items()}
+
+    # ---- 方言相关的片段 ----
+
+    def auto_id(self, name='id'):
+        """自增整数主键列定义"""
+        if self.dialect == 'sqlite':
+            return f'`{name}` INTEGER PRIMARY KEY AUTOINCREMENT'
+        return f'`{name}` INT NOT NULL AUTO_INCREMENT PRIMARY KEY'
+
+    def table_options(self):
+        return '' if self.dialect == 'sqlite' else ' ENGINE=InnoDB DEFAULT CHARSET=utf8mb4'
+
+    def _online(self, online):
+        use_online = self.online if online is None else online
+        return f', {ONLINE_DDL}' if use_online and self.dialect == 'mysql' else ''
+
+    # ---- 结构变更 ----
+
+    def create_table(self, table, body):
+        """CREATE TABLE IF NOT EXISTS；body 为括号内的列与约束定义"""
+        self.execute(f"CREATE TABLE IF NOT EXISTS `{table}` ({body}){self.table_options()}")
+
+    def drop_table(self, table):
+        self.execute(f"DROP TABLE IF EXISTS `{table}`")
+
+    def add_column(self, table, column, definition, online=None):
+        if not self.has_column(table, column):
+            self.execute(f"ALTER TABLE `{table}` ADD COLUMN `{column}` {definition}{self._online(online)}")
+
+    def drop_column(self, table, column, online=None):
+        if self.has_column(table, column):
+            self.execute(f"ALTER TABLE `{table}` DROP COLUMN `{column}`{self._online(online)}")
+
+    def add_index(self, table, name, columns, unique=False, online=None):
+        """同名索引已存在，或（非唯一索引时）已有索引以这些列为最左前缀时跳过"""
+        existing = self.index_columns(table)
+        if name in existing:
+            return
+        if not unique and any(cols[:len(columns)] == tuple(columns) for cols in existing.values()):
+            return
+        kind = 'UNIQUE INDEX' if unique else 'INDEX'
+        column_list = ', '.join(f'`{c}`' for c in columns)
+        if self.dialect == 'sqlite':
+            self.execute(f"CREATE {kind} `{name}` ON `{table}` ({column_list})")
+        else:
+            self.execute(f"ALTER TABLE `{table}` ADD {kind} `{name}` ({column_list}){self._online(online)}")
+
+    def drop_index(self, table, name, online=None):
+        if not self.has_index(table, name):
+            return
+        if self.dialect == 'sqlite':
+            self.execute(f"DROP INDEX `{name}`")
+        else:
+            self.execute(f"ALTER TABLE `{table}` DROP INDEX `{name}`{self._online(online)}")
+
+
+def normalize_version(version):
+    """把 2、'2'、'0002' 统一为四位版本号 '0002'；版本号之间按整数比较"""
+    try:
+        return f'{int(version):04d}'
+    except (TypeError, ValueError):
+        raise MigrationError(f'无效的迁移版本号: {version}') from None
+
+
+class Migration:
+    """迁移目录中的一个脚本: NNNN_name.py，定义 up(ctx) 与 down(ctx)"""
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, 'rb') as f:
+            self.checksum = hashlib.sha256(f.read()).hexdigest()
+        self._module = None
+
+    @property
+    def module(self):
+        if self._module is None:
+            spec = importlib.util.spec_from_file_location(f'migration_{self.version}_{self.name}', self.path)
+            self._module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(self._module)
+        return self._module
+
+    @property
+    def description(self):
+        doc = (self.module.__doc__ or '').strip()
+        return doc.splitlines()[0] if doc else ''
+
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    """按版本号排序的迁移脚本列表"""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append(Migration(match.group(1), match.group(2), os.path.join(directory, filename)))
+    return migrations
+
+
+def find_migration(version, directory=MIGRATIONS_DIR):
+    """按版本号查找迁移脚本（供需要读取迁移中定义的索引等常量的工具使用）"""
+    version = normalize_version(version)
+    for migration in discover_migrations(directory):
+        if migration.version == version:
+            return migration
+    raise MigrationError(f'迁移 {version} 不存在')
+
+
+class Migrator:
+    """版本化结构迁移
+
+    按版本号顺序执行迁移目录中的脚本，已执行的版本、脚本校验和与耗时记录在 schema_migrations 表中。
+    MySQL 上用 GET_LOCK 保证同一时间只有一个进程执行迁移（lock_timeout 秒内拿不到锁则报错）；MySQL 的 DDL 不能回滚，
+    因此上下文中的辅助方法都是幂等的，失败后修正脚本重新执行即可。
+    """
+
+    def __init__(self, conn, dialect, directory, online=True, logger=None, lock_timeout=0):
+        if dialect not in ('mysql', 'sqlite'):
+            raise ValueError(f'不支持的数据库类型: {dialect}')
+        self.conn = conn
+        self.dialect = dialect
+        self.directory = directory
+        self.online = online
+        self.logger = logger
+        self.lock_timeout = lock_timeout
+
+    def _context(self):
+        return MigrationContext(self.conn, self.dialect, self.online)
+
+    def ensure_history(self):
+        ctx = self._context()
+        ctx.create_table(HISTORY_TABLE, (
+            "`version` VARCHAR(32) NOT NULL PRIMARY KEY, "
+            "`name` VARCHAR(255) NOT NULL, "
+            "`checksum` CHAR(64) NOT NULL, "
+            "`applied_at` DATETIME NOT NULL, "
+            "`duration_ms` INT NOT NULL"
+        ))
+        self.conn.commit()
+
+    def discover(self):
+        migrations = discover_migrations(self.directory)
+        versions = [m.version for m in migrations]
+        duplicates = {v for v in versions if versions.count(v) > 1}
+        if duplicates:
+            raise MigrationError(f"迁移版本号重复: {', '.join(sorted(duplicates))}")
+        return migrations
+
+    def applied(self):
+        rows = self._context().query(
+            f"SELECT `version`, `name`, `checksum`, `applied_at`, `duration_ms` FROM `{HISTORY_TABLE}` ORDER BY `version`"
+        )
+        return {row[0]: {'version': row[0], 'name': row[1], 'checksum': row[2], 'applied_at': row[3], 'duration_ms': row[4]}
+                for row in rows}
+
+    def status(self):
+        """每个版本的状态: applied / pending / changed（执行后脚本被修改）/ missing（已执行但脚本不存在）"""
+        self.ensure_history()
+        applied = self.applied()
+        result = []
+        for migration in self.discover():
+            row = applied.pop(migration.version, None)
+            if row is None:
+                state = 'pending'
+            else:
+                state = 'applied' if row['checksum'] == migration.checksum else 'changed'
+            result.append({'version': migration.version, 'name': migration.name, 'description': migration.description, 'state': state,
+                           'applied_at': row['applied_at'] if row else None,
+                           'duration_ms': row['duration_ms'] if row else None})
+        for row in applied.values():
+            result.append(dict(row, state='missing'))
+        return sorted(result, key=lambda item: item['version'])
+
+    def _lock(self):
+        if self.dialect == 'mysql':
+            rows = self._context().query("SELECT GET_LOCK(%s, %s)", (HISTORY_TABLE, self.lock_timeout))
+            if not rows or rows[0][0] != 1:
+                raise MigrationError('另一个进程正在执行迁移')
+
+    def _unlock(self):
+        if self.dialect == 'mysql':
+            self._context().query("SELECT RELEASE_LOCK(%s)", (HISTORY_TABLE,))
+
+    def _run(self, migration, direction):
+        ctx = self._context()
+        started = time.perf_counter()
+        try:
+            getattr(migration.module, direction)(ctx)
+            if direction == 'up':
+                ctx.execute(
+                    f"INSERT INTO `{HISTORY_TABLE}` (`version`, `name`, `checksum`, `applied_at`, `duration_ms`) "
+                    f"VALUES (%s, %s, %s, %s, %s)",
+                    (migration.version, migration.name, migration.checksum, datetime.now().replace(microsecond=0),
+                     int((time.perf_counter() - started) * 1000))
+                )
+            else:
+                ctx.execute(f"DELETE FROM `{HISTORY_TABLE}` WHERE `version` = %s", (migration.version,))
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise MigrationError(f"{direction} {migration.version}_{migration.name} 失败: {e}", ctx.statements) from e
+        report = {
+            'version': migration.version,
+            'name': migration.name,
+            'direction': direction,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'statements': ctx.statements
+        }
+        if self.logger:
+            self.logger.info(f"Migration {direction} {migration.version}_{migration.name} finished in {report['duration_ms']} ms.")
+        return report
+
+    def upgrade(self, target=None):
+        """依次执行未执行的迁移（到 target 版本为止，含），返回每个迁移的耗时报告"""
+        if target is not None:
+            target = int(normalize_version(target))
+        self.ensure_history()
+        self._lock()
+        try:
+            applied = self.applied()
+            reports = []
+            for migration in self.discover():
+                if target is not None and int(migration.version) > target:
+                    break
+                if migration.version not in applied:
+                    reports.append(self._run(migration, 'up'))
+            return reports
+        finally:
+            self._unlock()
+
+    def downgrade(self, target=None, steps=1):
+        """回滚迁移：指定 target 时回滚所有高于 target 的版本，否则回滚最近 steps 个"""
+        if target is not None:
+            target = int(normalize_version(target))
+        self.ensure_history()
+        self._lock()
+        try:
+            applied = self.applied()
+            by_version = {m.version: m for m in self.discover()}
+            versions = sorted(applied, key=int, reverse=True)
+            versions = [v for v in versions if int(v) > target] if target is not None else versions[:steps]
+            missing = [v for v in versions if v not in by_version]
+            if missing:
+                raise MigrationError(f"找不到迁移脚本，无法回滚: {', '.join(missing)}")
+            return [self._run(by_version[v], 'down') for v in versions]
+        finally:
+            self._unlock()
+
+    def create(self, name, description=''):
+        """在迁移目录中新建下一个版本的脚本，返回路径"""
+        if not re.match(r'^\w+$', name):
+            raise ValueError('迁移名称只能包含字母、数字和下划线')
+        existing = self.discover()
+        version = f"{int(existing[-1].version) + 1 if existing else 1:04d}"
+        path = os.path.join(self.directory, f'{version}_{name}.py')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(MIGRATION_TEMPLATE.format(description=description or name))
+        return path
+
+
+def migrate_on_startup(app):
+    """应用启动时检查结构迁移
+
+    默认只检查：存在未执行的迁移则抛出 MigrationError 拒绝启动，避免模型访问尚不存在的列，迁移由部署步骤
+    python migrate.py up 执行。DB_AUTO_MIGRATE 开启时（开发环境）改为直接执行所有未执行的迁移
+    （多进程同时启动时由 GET_LOCK 串行，后到的进程等待后发现已无待执行的迁移）。
+    迁移失败同样抛出异常，不带着不完整的结构继续运行。
+    """
+    from app import db
+
+    with app.app_context():
+        fairy = db.engine.raw_connection()
+        try:
+            migrator = Migrator(fairy.dbapi_connection, db.engine.dialect.name, MIGRATIONS_DIR, logger=app.logger,
+                                lock_timeout=app.config['DB_MIGRATE_LOCK_TIMEOUT'])
+            if app.config['DB_AUTO_MIGRATE']:
+                reports = migrator.upgrade()
+                if reports:
+                    app.logger.info(f"Applied {len(reports)} schema migration(s): "
+                                    f"{', '.join(r['version'] + '_' + r['name'] for r in reports)}")
+                return reports
+            states = migrator.status()
+            pending = [f"{item['version']}_{item['name']}" for item in states if item['state'] == 'pending']
+            if pending:
+                raise MigrationError(f"存在未执行的迁移 {', '.join(pending)}，请先执行 python migrate.py up")
+            for item in states:
+                if item['state'] in ('changed', 'missing'):
+                    app.logger.warning(f"Schema migration {item['version']}_{item['name']} is {item['state']}.")
+            return []
+        finally:
+            fairy.close()
@@ -1,12 +1,188 @@
 # CMS/backend/app/utils/moderation.py
+import hashlib
+import threading
+from collections import deque
+
+# 示例敏感词列表（按类别）
+SENSITIVE_WORD_CATEGORIES = {
+    '辱骂': ["脏话", "妈的", "操", "滚", "傻逼", "去死", "神经病"],
+    '色情': ["色情", "裸聊", "约炮", "卖淫", "嫖娼"],
+    '暴力': ["暴力", "砍人", "自杀", "恐怖袭击"],
+    # 可以根据需要添加更多类别和词汇
+}
+
+# 扁平的敏感词列表，兼容旧的调用方式
+DEFAULT_SENSITIVE_WORDS = [word for words in SENSITIVE_WORD_CATEGORIES.values() for word in words]
+
+DEFAULT_CATEGORY = '其他'
+
+
+def _fold(ch):
+    """逐字符转小写；转换后长度变化的字符（如 'İ'）保持原样，保证命中位置与原文一致"""
+    lowered = ch.lower()
+    return lowered if len(lowered) == 1 else ch
+
+
+class SensitiveWordMatcher:
+    """基于 Aho-Corasick 自动机的多模式敏感词匹配器
+
+    构建一次后可对任意文本做单遍扫描，耗时与文本长度成正比，与词表大小基本无关。
+    匹配忽略大小写。
+    """
+
+    def __init__(self, words_with_categories):
+        """
+        :param words_with_categories: 可迭代的 (敏感词, 类别) 二元组
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]  # 每个状态结束的模式: (词, 类别, 词长)
+        self.word_count = 0
+        for word, category in words_with_categories:
+            self._add_word(word, category)
+        self._build_fail_links()
+
+    def _add_word(self, word, category):
+        if not word:
+            return
+        state = 0
+        for ch in word:
+            ch = _fold(ch)
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((word, category, len(word)))
+        self.word_count += 1
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # 合并后缀状态的输出，扫描时无需再沿失败链回溯
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def _scan(self, text):
+        goto, fail, output = self._goto, self._fail, self._output
+        # 整段小写一次；只有长度发生变化时才退回逐字符转换，保证位置与原文一致
+        lowered = text.lower()
+        chars = lowered if len(lowered) == len(text) else [_fold(ch) for ch in text]
+        state = 0
+        for index, ch in enumerate(chars):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                yield index, output[state]
+
+    def find_all(self, text):
+        """返回文本中所有命中的敏感词
+
+        :return: 列表，元素为 {'word', 'category', 'start', 'end'}，按结束位置排序，end 为开区间
+        """
+        if not text:
+            return []
+        hits = []
+        for index, matches in self._scan(text):
+            for word, category, length in matches:
+                hits.append({'word': word, 'category': category, 'start': index - length + 1, 'end': index + 1})
+        return hits
+
+    def contains(self, text):
+        """文本中是否包含任意敏感词（命中第一个即返回）"""
+        if not text:
+            return False
+        for _ in self._scan(text):
+            return True
+        return False
+
+
+def word_list_version(sensitive_words_list=None, categories=None):
+    """计算词表的版本号（内容哈希），词表变化时版本号随之变化"""
+    if categories is None:
+        categories = resolve_categories(sensitive_words_list)
+    digest = hashlib.sha1()
+    for category in sorted(categories):
+        for word in sorted(set(categories[category])):
+            digest.update(f"{category}\x1f{word}\x1e".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+_matcher_lock = threading.Lock()
+_matcher_cache = {}
+
+
+def resolve_categories(sensitive_words_list=None):
+    """返回 {类别: [词, ...]}；传入扁平词表时按 SENSITIVE_WORD_CATEGORIES 反查归类"""
+    if sensitive_words_list is None:
+        return SENSITIVE_WORD_CATEGORIES
+    return _categorize(sensitive_words_list)
+
+
+def _categorize(sensitive_words_list):
+    """把扁平词表按 SENSITIVE_WORD_CATEGORIES 反查归类，查不到的归为“其他”"""
+    lookup = {w: c for c, words in SENSITIVE_WORD_CATEGORIES.items() for w in words}
+    categories = {}
+    for word in sensitive_words_list:
+        categories.setdefault(lookup.get(word, DEFAULT_CATEGORY), []).append(word)
+    return categories
+
+
+def get_matcher(sensitive_words_list=None, categories=None):
+    """获取（必要时构建）词表对应的匹配器；同一词表只构建一次
+
+    匹配器的 version 属性为词表内容哈希，可用于判断词表是否变化。
+
+    :param sensitive_words_list: 扁平词表。如果为None，则使用 SENSITIVE_WORD_CATEGORIES。
+    :param categories: {类别: [词, ...]}，优先于 sensitive_words_list
+    """
+    if categories is not None:
+        key = ('categories',) + tuple((c, tuple(ws)) for c, ws in categories.items())
+    elif sensitive_words_list is not None:
+        key = ('words',) + tuple(sensitive_words_list)
+    else:
+        key = ('default',) + tuple((c, tuple(ws)) for c, ws in SENSITIVE_WORD_CATEGORIES.items())
+
+    matcher = _matcher_cache.get(key)
+    if matcher is not None:
+        return matcher
+
+    with _matcher_lock:
+        matcher = _matcher_cache.get(key)
+        if matcher is None:
+            if categories is None:
+                categories = resolve_categories(sensitive_words_list)
+            matcher = SensitiveWordMatcher(
+                (word, category) for category, words in categories.items() for word in words
+            )
+            matcher.version = word_list_version(categories=categories)
+            # 词表变化后旧的自动机不再需要，只保留最近构建的少量版本
+            if len(_matcher_cache) >= 4:
+                _matcher_cache.clear()
+            _matcher_cache[key] = matcher
+        return matcher
+
+
+def find_sensitive_words(text, sensitive_words_list=None):
+    """
+    返回文本中命中的所有敏感词及其位置和类别。
+    :param text: 要检测的文本字符串。
+    :param sensitive_words_list: 包含敏感词的列表。如果为None，则使用DEFAULT_SENSITIVE_WORDS。
+    :return: [{'word', 'category', 'start', 'end'}, ...]
+    """
+    return get_matcher(sensitive_words_list).find_all(text)
 
-# 示例敏感词列表 
-DEFAULT_SENSITIVE_WORDS = [
-    "脏话", "妈的", "操", "滚", "傻逼", "去死", "神经病",
-    "色情", "裸聊", "约炮", "卖淫", "嫖娼", 
-    "暴力", "砍人", "自杀", "恐怖袭击",
-    # 可以根据需要添加更多词汇
-]
 
 def contains_sensitive_word(text, sensitive_words_list=None):
     """
@@ -17,12 +193,4 @@ def contains_sensitive_word(text, sensitive_words_list=None):
     """
     if not text:
         return False
-    
-    words_to_check = sensitive_words_list if sensitive_words_list is not None else DEFAULT_SENSITIVE_WORDS
-    
-    # 对于较长的敏感词列表和文本，可以考虑更高级的匹配算法 (如Aho-Corasick)
-    # 但对于简易版本，直接遍历检查即可。
-    for word in words_to_check:
-        if word.lower() in text.lower(): # 忽略大小写进行匹配
-            return True
-    return False 
\ No newline at end of file
+    return get_matcher(sensitive_words_list).contains(text)
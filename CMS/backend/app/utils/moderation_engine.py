@@ -0,0 +1,118 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pymysql
+
+from .db import shard_ranges
+from .moderation import SensitiveWordMatcher, SENSITIVE_WORD_CATEGORIES
+from .moderation_job import iter_comment_chunks, flag_chunk
+
+# 工作进程内的全局状态，由 _init_worker 在进程启动时设置一次
+_worker_matcher = None
+_worker_db_params = None
+
+
+def _init_worker(db_params, categories):
+    """工作进程初始化：预先构建匹配器，之后每个分片复用"""
+    global _worker_matcher, _worker_db_params
+    _worker_db_params = db_params
+    _worker_matcher = SensitiveWordMatcher(
+        (word, category) for category, words in categories.items() for word in words
+    )
+
+
+def _moderate_shard(lo, hi, chunk_size):
+    """在工作进程中审核 id 属于 (lo, hi] 的评论，返回 (lo, hi, 审核数, 标记数)"""
+    conn = pymysql.connect(cursorclass=pymysql.cursors.DictCursor, **_worker_db_params)
+    reviewed = flagged = 0
+    try:
+        for rows in iter_comment_chunks(conn, chunk_size, start_id=lo, extra_condition=" AND id <= %s", extra_params=(hi,)):
+            flagged += len(flag_chunk(conn, rows, _worker_matcher))
+            reviewed += len(rows)
+    finally:
+        conn.close()
+    return lo, hi, reviewed, flagged
+
+
+class ModerationEngine:
+    """多进程评论审核引擎
+
+    把评论 id 空间切分为多个分片，交给 ProcessPoolExecutor 并行处理。每个工作进程启动时
+    构建一次匹配器并使用自己的数据库连接。
+    只在 moderate_comments.py 等独立命令行进程中使用：spawn 出的工作进程会重新导入主模块，
+    在 Web 进程中调用会重复执行 run.py 并创建应用。
+    """
+
+    def __init__(self, db_params, categories=None, workers=4, chunk_size=1000, shards_per_worker=4, logger=None):
+        self.db_params = db_params
+        self.categories = categories or SENSITIVE_WORD_CATEGORIES
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.shards_per_worker = shards_per_worker
+        self.logger = logger
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.info(message)
+
+    def _id_bounds(self, from_id, to_id):
+        conn = pymysql.connect(cursorclass=pymysql.cursors.DictCursor, **self.db_params)
+        try:
+            with conn.cursor() as cursor:
+                sql = "SELECT MIN(id) AS min_id, MAX(id) AS max_id FROM comments WHERE passed = 1 AND id > %s"
+                params = [from_id]
+                if to_id is not None:
+                    sql += " AND id <= %s"
+                    params.append(to_id)
+                cursor.execute(sql, tuple(params))
+                row = cursor.fetchone()
+            return row['min_id'], row['max_id']
+        finally:
+            conn.close()
+
+    def run(self, from_id=0, to_id=None, on_progress=None):
+        """并行审核 id 属于 (from_id, to_id] 的已通过评论
+
+        Args:
+            on_progress: 可选回调 on_progress(safe_id)，safe_id 之前（含）的分片都已完成，
+                可用于持久化断点
+        Returns:
+            统计信息字典，包括吞吐量 comments_per_second
+        """
+        started = time.perf_counter()
+        min_id, max_id = self._id_bounds(from_id, to_id)
+        ranges = shard_ranges(min_id, max_id, self.workers * self.shards_per_worker)
+        reviewed = flagged = 0
+        if ranges:
+            self._log(f"Moderation engine: {len(ranges)} shard(s) over comment IDs {min_id}-{max_id} with {self.workers} worker(s).")
+            completed = set()
+            next_index = 0
+            mp_context = multiprocessing.get_context('spawn')  # 工作进程不继承父进程的数据库连接
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=mp_context,
+                                     initializer=_init_worker, initargs=(self.db_params, self.categories)) as executor:
+                futures = [executor.submit(_moderate_shard, lo, hi, self.chunk_size) for lo, hi in ranges]
+                for future in as_completed(futures):
+                    lo, hi, shard_reviewed, shard_flagged = future.result()
+                    reviewed += shard_reviewed
+                    flagged += shard_flagged
+                    completed.add(lo)
+                    # 只有前面的分片全部完成，断点才能前移
+                    advanced = False
+                    while next_index < len(ranges) and ranges[next_index][0] in completed:
+                        next_index += 1
+                        advanced = True
+                    if on_progress and advanced:
+                        on_progress(ranges[next_index - 1][1])
+
+        elapsed = time.perf_counter() - started
+        stats = {
+            'reviewed': reviewed,
+            'flagged': flagged,
+            'shards': len(ranges),
+            'max_id': max_id,
+            'workers': self.workers,
+            'elapsed_seconds': round(elapsed, 3),
+            'comments_per_second': round(reviewed / elapsed, 1) if elapsed > 0 else 0.0
+        }
+        self._log(f"Moderation engine finished: {stats}")
+        return stats
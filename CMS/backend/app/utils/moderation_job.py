@@ -0,0 +1,146 @@
+from datetime import timedelta
+import pymysql
+from app import db
+from app.models.moderation import ModerationCheckpoint
+from .db import get_db_connection
+from .counts import invalidate_counts
+from .moderation import get_matcher
+
+JOB_NAME = 'auto_moderate_comments'
+
+
+def load_checkpoint(job_name=JOB_NAME):
+    """读取（不存在时创建）任务断点记录；moderation_checkpoints 表由迁移 0008 创建"""
+    checkpoint = db.session.get(ModerationCheckpoint, job_name)
+    if checkpoint is None:
+        checkpoint = ModerationCheckpoint(job_name=job_name, last_comment_id=0, rescan_from_id=0)
+        db.session.add(checkpoint)
+        db.session.commit()
+    return checkpoint
+
+
+def iter_comment_chunks(conn, chunk_size, start_id=0, extra_condition='', extra_params=()):
+    """按 id 区间分块读取已通过的评论
+
+    每块用服务端游标(SSDictCursor)流式读取，块与块之间按 id 定位（不使用 OFFSET），
+    内存占用只与块大小有关。
+    """
+    last_id = start_id
+    while True:
+        with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(
+                f"SELECT id, comment FROM comments WHERE passed = 1 AND id > %s{extra_condition} ORDER BY id LIMIT %s",
+                (last_id,) + tuple(extra_params) + (chunk_size,)
+            )
+            rows = list(cursor)
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+        if len(rows) < chunk_size:
+            return
+
+
+def flag_chunk(conn, rows, matcher):
+    """检测一块评论，用一条 UPDATE ... WHERE id IN (...) 标记敏感评论并提交，返回被标记的ID列表"""
+    flagged_ids = [row['id'] for row in rows if matcher.contains(row['comment'])]
+    if flagged_ids:
+        placeholders = ', '.join(['%s'] * len(flagged_ids))
+        with conn.cursor() as cursor:
+            # 显式保留 updated_at，审核自身的更新不刷新水位列，否则被标记的评论会在下一轮被重复扫描
+            cursor.execute(f"UPDATE comments SET passed = 0, updated_at = updated_at WHERE passed = 1 AND id IN ({placeholders})",
+                           tuple(flagged_ids))
+    conn.commit()  # 每块单独提交，行锁只持有一个块的时间
+    return flagged_ids
+
+
+def _scan_chunks(conn, checkpoint, matcher, config, logger, full):
+    """分块扫描评论并在每块提交后保存断点"""
+    chunk_size = config.get('MODERATION_CHUNK_SIZE', 1000)
+    if full:
+        chunks = iter_comment_chunks(conn, chunk_size, start_id=checkpoint.rescan_from_id)
+    else:
+        column = config.get('MODERATION_WATERMARK_COLUMN', 'updated_at')
+        lookback = timedelta(seconds=config.get('MODERATION_LOOKBACK_SECONDS', 120))
+        # 回看一小段时间，覆盖扫描期间尚未提交、时间戳略早于水位的评论；重复检测是幂等的
+        since = checkpoint.last_comment_time - lookback
+        chunks = iter_comment_chunks(conn, chunk_size, extra_condition=f" AND `{column}` >= %s", extra_params=(since,))
+
+    reviewed = flagged = 0
+    for rows in chunks:
+        flagged_ids = flag_chunk(conn, rows, matcher)
+        if flagged_ids:
+            logger.info(f"Comment IDs {flagged_ids[:20]}{'...' if len(flagged_ids) > 20 else ''} automatically marked as not passed (sensitive content found).")
+        reviewed += len(rows)
+        flagged += len(flagged_ids)
+        last_id = rows[-1]['id']
+        if full:
+            checkpoint.rescan_from_id = last_id
+        checkpoint.last_comment_id = max(checkpoint.last_comment_id or 0, last_id)
+        db.session.commit()
+    return reviewed, flagged
+
+
+def run_auto_moderation(app, sensitive_words_list=None):
+    """定时任务 - 自动审核评论（增量）
+
+    以高水位方式只处理上次运行之后新增或修改的评论；词表版本变化时执行一次全量重扫，
+    全量重扫的进度同样持久化，进程重启后从断点继续。
+    评论按 MODERATION_CHUNK_SIZE 分块流式读取，每块一条 UPDATE 并单独提交。
+    大规模回填请使用 moderate_comments.py（多进程引擎，不在 Web 进程中启动进程池）：
+    不指定 id 区间时为全量重扫，与本任务共用断点，完成后本任务不再为同一词表重复全量重扫。
+
+    Returns:
+        本次运行的统计信息字典
+    """
+    with app.app_context():
+        logger = app.logger
+        config = app.config
+        logger.info("Starting automatic comment moderation task...")
+        matcher = get_matcher(sensitive_words_list)
+        conn = None
+        try:
+            checkpoint = load_checkpoint()
+            conn = get_db_connection()
+            with conn.cursor() as cursor:
+                # 以数据库时间作为本次扫描的水位，避免应用服务器与数据库时钟不一致
+                cursor.execute("SELECT NOW() AS now")
+                scan_started = cursor.fetchone()['now']
+
+            if checkpoint.word_list_version != matcher.version or checkpoint.last_comment_time is None:
+                mode = 'full'
+                if checkpoint.rescan_version != matcher.version:
+                    checkpoint.rescan_version = matcher.version
+                    checkpoint.rescan_from_id = 0
+                    db.session.commit()
+                else:
+                    logger.info(f"Resuming full moderation rescan from comment ID {checkpoint.rescan_from_id}.")
+                reviewed, flagged = _scan_chunks(conn, checkpoint, matcher, config, logger, full=True)
+                checkpoint.word_list_version = matcher.version
+                checkpoint.rescan_version = None
+                checkpoint.rescan_from_id = 0
+            else:
+                mode = 'incremental'
+                reviewed, flagged = _scan_chunks(conn, checkpoint, matcher, config, logger, full=False)
+
+            checkpoint.last_comment_time = scan_started
+            db.session.commit()
+
+            if flagged:
+                invalidate_counts('comments')
+                logger.info(f"Moderation task: {flagged} comment(s) updated to passed=0 due to sensitive content.")
+            logger.info(f"Automatic comment moderation task finished ({mode}). Reviewed: {reviewed} comments. Updated due to sensitive content: {flagged}.")
+            return {'mode': mode, 'reviewed': reviewed, 'flagged': flagged, 'word_list_version': matcher.version}
+
+        except Exception as e:
+            if conn and conn.open:
+                try:
+                    conn.rollback()
+                    logger.warning("Transaction rolled back due to error in moderation task.")
+                except Exception as rb_e:
+                    logger.error(f"Error during rollback: {rb_e}")
+            db.session.rollback()
+            logger.error(f"Error during comment moderation task: {e}", exc_info=True)
+        finally:
+            if conn and conn.open:
+                conn.close()
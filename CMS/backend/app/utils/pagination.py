@@ -0,0 +1,65 @@
+import base64
+import json
+
+
+def encode_cursor(sort_by, order, row):
+    """把一行数据的排序列值和 id 编码为不透明的游标字符串
+
+    Args:
+        sort_by: 排序列名
+        order: 'asc' 或 'desc'
+        row: 查询结果行（字典）
+
+    Returns:
+        URL 安全的 base64 字符串
+    """
+    payload = {'s': sort_by, 'o': order, 'v': row.get(sort_by), 'id': row.get('id')}
+    raw = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_by, order):
+    """解析游标，返回 (排序列值, id)
+
+    游标必须与当前请求的排序列和方向一致，否则视为无效。
+
+    Raises:
+        ValueError: 游标格式错误或与排序参数不匹配
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        value, last_id = payload['v'], int(payload['id'])
+        cursor_sort, cursor_order = payload['s'], payload['o']
+    except (ValueError, KeyError, TypeError, UnicodeError):
+        raise ValueError('无效的分页游标')
+    if cursor_sort != sort_by or cursor_order != order:
+        raise ValueError('分页游标与当前排序参数不一致')
+    return value, last_id
+
+
+def build_keyset_clause(sort_by, value, last_id, op):
+    """构建按 (排序列, id) 定位的 seek 条件
+
+    MySQL 中 NULL 在升序里排在最前，这里把 NULL 视为最小值，保证翻页不丢行。
+
+    Args:
+        sort_by: 排序列名（调用方须保证已通过白名单校验）
+        value: 游标所在行的排序列值
+        last_id: 游标所在行的 id
+        op: '>' 表示向排序值更大的方向翻页，'<' 表示向更小的方向翻页
+
+    Returns:
+        (条件 SQL 片段, 参数列表)
+    """
+    if sort_by == 'id':
+        return f"`id` {op} %s", [last_id]
+
+    col = f"`{sort_by}`"
+    if op == '>':
+        if value is None:
+            return f"(({col} IS NULL AND `id` > %s) OR {col} IS NOT NULL)", [last_id]
+        return f"({col} > %s OR ({col} = %s AND `id` > %s))", [value, value, last_id]
+    if value is None:
+        return f"({col} IS NULL AND `id` < %s)", [last_id]
+    return f"({col} < %s OR ({col} = %s AND `id` < %s) OR {col} IS NULL)", [value, value, last_id]
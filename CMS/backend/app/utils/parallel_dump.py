@@ -0,0 +1,288 @@
+import datetime
+import json
+import os
+import queue
+import shutil
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pymysql
+
+from .backup_stream import BACKUP_SUFFIXES, BackupWriter, file_checksum, resolve_compression
+from .db import shard_ranges
+from .dump_engine import SqlDumpWriter, create_table_sql, dump_table, list_tables
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_FORMAT = 'parallel-v1'
+INTEGER_TYPES = ('tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint')
+
+
+class DumpTask:
+    """一个备份分块：整张表，或整数主键在 (lo, hi] 范围内的行"""
+
+    __slots__ = ('table', 'seq', 'columns', 'pk', 'lo', 'hi', 'estimated_rows', 'artifact')
+
+    def __init__(self, table, seq, columns, pk=None, lo=None, hi=None, estimated_rows=0, suffix='.sql'):
+        self.table = table
+        self.seq = seq
+        self.columns = columns
+        self.pk = pk
+        self.lo = lo
+        self.hi = hi
+        self.estimated_rows = estimated_rows
+        self.artifact = f"{table}.{seq:04d}{suffix}"
+
+    def where(self):
+        """返回 (WHERE 子句, 参数)，整表时为空"""
+        if self.lo is None:
+            return '', None
+        return f" WHERE `{self.pk}` > %s AND `{self.pk}` <= %s ORDER BY `{self.pk}`", (self.lo, self.hi)
+
+
+def table_layout(cursor, table):
+    """返回 (列名列表, 整数单列主键或 None, 估算行数)"""
+    cursor.execute(
+        "SELECT COLUMN_NAME, DATA_TYPE, COLUMN_KEY FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+        (table,)
+    )
+    rows = cursor.fetchall()
+    columns = [row[0] for row in rows]
+    primary = [row for row in rows if row[2] == 'PRI']
+    pk = primary[0][0] if len(primary) == 1 and primary[0][1].lower() in INTEGER_TYPES else None
+    cursor.execute(
+        "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,)
+    )
+    row = cursor.fetchone()
+    return columns, pk, int(row[0] or 0) if row else 0
+
+
+def plan_tasks(cursor, tables, chunk_rows, suffix):
+    """按估算行数把大表切分为主键范围块，没有整数主键的表整表作为一块；大块排在前面以均衡负载"""
+    tasks = []
+    for table in tables:
+        columns, pk, estimated = table_layout(cursor, table)
+        chunks = -(-estimated // chunk_rows) if chunk_rows else 1
+        if pk and chunks > 1:
+            cursor.execute(f"SELECT MIN(`{pk}`), MAX(`{pk}`) FROM `{table}`")
+            min_id, max_id = cursor.fetchone()
+            ranges = shard_ranges(min_id, max_id, chunks)
+            for seq, (lo, hi) in enumerate(ranges):
+                tasks.append(DumpTask(table, seq, columns, pk, lo, hi, estimated // len(ranges), suffix))
+        if not tasks or tasks[-1].table != table:
+            tasks.append(DumpTask(table, 0, columns, estimated_rows=estimated, suffix=suffix))
+    tasks.sort(key=lambda task: task.estimated_rows, reverse=True)
+    return tasks
+
+
+def open_snapshot_connections(db_params, tables, workers):
+    """打开 workers 个处于同一一致性快照中的连接
+
+    协调连接对要备份的表加 READ 锁，在锁内让每个工作连接执行
+    START TRANSACTION WITH CONSISTENT SNAPSHOT，随后立即解锁。锁只持续建立快照的瞬间，
+    之后各连接并行读取的都是同一时刻的数据。返回 (连接列表, 锁内读取的 binlog 位置或 None)。
+    """
+    coordinator = pymysql.connect(**db_params)
+    connections = []
+    binlog = None
+    try:
+        with coordinator.cursor() as cursor:
+            cursor.execute('LOCK TABLES ' + ', '.join(f'`{table}` READ' for table in tables))
+            try:
+                for _ in range(workers):
+                    conn = pymysql.connect(cursorclass=pymysql.cursors.SSCursor, **db_params)
+                    connections.append(conn)
+                    with conn.cursor() as worker_cursor:
+                        worker_cursor.execute('SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+                        worker_cursor.execute('START TRANSACTION WITH CONSISTENT SNAPSHOT')
+                try:
+                    cursor.execute('SHOW MASTER STATUS')
+                    row = cursor.fetchone()
+                    if row:
+                        binlog = {'file': row[0], 'position': row[1]}
+                except pymysql.MySQLError:
+                    pass  # 没有 REPLICATION CLIENT 权限或未开启 binlog
+            finally:
+                cursor.execute('UNLOCK TABLES')
+    except Exception:
+        for conn in connections:
+            conn.close()
+        raise
+    finally:
+        coordinator.close()
+    return connections, binlog
+
+
+def _write_schema(conn, table, path, method, level, threads, progress=None):
+    with BackupWriter(path, method, level, threads, progress) as out:
+        writer = SqlDumpWriter(out, 'mysql')
+        writer.begin_table(table, [], create_table_sql(conn, 'mysql', table))
+        writer.end_table(0)
+    return out.result()
+
+
+def _write_task(conn, task, path, method, level, threads, insert_rows, progress=None):
+    """用无缓冲游标流式读取一个分块，按 insert_rows 行一条 INSERT 写入压缩文件"""
+    where, params = task.where()
+    with BackupWriter(path, method, level, threads, progress) as out:
+        writer = SqlDumpWriter(out, 'mysql')
+        rows = dump_table(conn, 'mysql', writer, task.table, insert_rows, task.columns, where, params, schema=False,
+                          progress=progress)
+    return rows, out.result()
+
+
+def dump_parallel(db_params, path, tables=None, method='zstd', level=3, threads=0,
+                  workers=4, chunk_rows=500000, insert_rows=1000, logger=None, progress=None):
+    """从同一一致性快照并行导出多张表，每个分块一个压缩文件，另写 manifest.json
+
+    Args:
+        db_params: pymysql 连接参数（见 db_params_from_config）
+        path: 备份目录，先写入 <path>.part，全部完成后改名
+        tables: 要备份的表，None 表示库中所有基表
+        workers: 并行连接/线程数
+        chunk_rows: 大表每个主键范围块的估算行数
+        progress: 进度回调（需线程安全），收到写入的字节数、行数，以及一张表的所有分块完成时的 tables=1
+
+    Returns:
+        与 BackupWriter.result() 相同的汇总统计，checksum 为 manifest.json 的 SHA-256
+    """
+    method = resolve_compression(method)
+    suffix = BACKUP_SUFFIXES[method]
+    started = time.time()
+    part_path = path + '.part'
+    os.makedirs(part_path)
+    connections = []
+    try:
+        if tables is None:
+            with pymysql.connect(**db_params) as conn:
+                tables = list_tables(conn, 'mysql')
+        connections, binlog = open_snapshot_connections(db_params, tables, max(1, workers))
+        # 切分与读取使用同一快照，保证主键范围覆盖快照中的所有行
+        with connections[0].cursor(pymysql.cursors.Cursor) as cursor:
+            tasks = plan_tasks(cursor, tables, chunk_rows, suffix)
+
+        idle = queue.Queue()
+        for conn in connections:
+            idle.put(conn)
+        remaining = {table: sum(1 for task in tasks if task.table == table) for table in tables}
+        remaining_lock = threading.Lock()
+
+        def run(kind, target):
+            conn = idle.get()
+            try:
+                task_started = time.time()
+                if kind == 'schema':
+                    artifact = f"{target}.schema{suffix}"
+                    rows, stats = None, _write_schema(conn, target, os.path.join(part_path, artifact), method, level,
+                                                      threads, progress)
+                    entry = {'name': artifact, 'table': target, 'kind': 'schema'}
+                else:
+                    artifact = target.artifact
+                    rows, stats = _write_task(conn, target, os.path.join(part_path, artifact), method, level, threads,
+                                              insert_rows, progress)
+                    with remaining_lock:
+                        remaining[target.table] -= 1
+                        table_done = remaining[target.table] == 0
+                    if progress and table_done:
+                        progress(tables=1)
+                    entry = {'name': artifact, 'table': target.table, 'kind': 'data',
+                             'range': [target.lo, target.hi] if target.lo is not None else None, 'rows': rows}
+                entry.update(stats, duration_ms=round((time.time() - task_started) * 1000, 2))
+                if logger and kind == 'data':
+                    logger.info(f"Dumped {artifact}: {rows} rows, {stats['backup_size']} bytes.")
+                return entry
+            finally:
+                idle.put(conn)
+
+        with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+            futures = [executor.submit(run, 'schema', table) for table in tables]
+            futures += [executor.submit(run, 'data', task) for task in tasks]
+            artifacts = [future.result() for future in futures]
+
+        original_size = sum(entry['original_size'] for entry in artifacts)
+        backup_size = sum(entry['backup_size'] for entry in artifacts)
+        manifest = {
+            'format': MANIFEST_FORMAT,
+            'database': db_params.get('database'),
+            'created_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'compression': method,
+            'workers': len(connections),
+            'binlog': binlog,
+            'tables': tables,
+            'rows': sum(entry.get('rows') or 0 for entry in artifacts),
+            'original_size': original_size,
+            'backup_size': backup_size,
+            'duration_ms': round((time.time() - started) * 1000, 2),
+            'artifacts': artifacts
+        }
+        with open(os.path.join(part_path, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(part_path, path)
+    except Exception:
+        shutil.rmtree(part_path, ignore_errors=True)
+        raise
+    finally:
+        for conn in connections:
+            conn.close()
+
+    if logger:
+        logger.info(
+            f"Parallel dump of {len(tables)} tables ({len(artifacts)} artifacts) finished in "
+            f"{manifest['duration_ms']} ms with {manifest['workers']} workers."
+        )
+    manifest_size = os.path.getsize(os.path.join(path, MANIFEST_NAME))
+    return {
+        'compression': method,
+        'original_size': original_size,
+        'backup_size': backup_size + manifest_size,
+        'compression_ratio': round(original_size / backup_size, 2) if backup_size else None,
+        'checksum': file_checksum(os.path.join(path, MANIFEST_NAME))
+    }
+
+
+def load_manifest(path):
+    with open(os.path.join(path, MANIFEST_NAME), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def verify_manifest(path, checksum=None):
+    """检查 manifest 与其中列出的每个分块文件的 SHA-256，返回第一个问题的描述，全部一致时返回 None"""
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return '备份目录中缺少 manifest.json'
+    if checksum and file_checksum(manifest_path) != checksum:
+        return 'manifest.json 校验失败'
+    for entry in load_manifest(path)['artifacts']:
+        artifact_path = os.path.join(path, entry['name'])
+        if not os.path.exists(artifact_path):
+            return f"缺少备份文件 {entry['name']}"
+        if file_checksum(artifact_path) != entry['checksum']:
+            return f"备份文件 {entry['name']} 校验失败"
+    return None
+
+
+def restore_order(manifest):
+    """先建表（schema），再导入数据块"""
+    return ([entry['name'] for entry in manifest['artifacts'] if entry['kind'] == 'schema'] +
+            [entry['name'] for entry in manifest['artifacts'] if entry['kind'] == 'data'])
+
+
+def iter_directory_tar(path, chunk_size=1024 * 1024):
+    """把备份目录按 tar 格式逐块输出（不落盘、不整体读入内存），用于下载"""
+    name = os.path.basename(path.rstrip(os.sep))
+    for filename in sorted(os.listdir(path)):
+        file_path = os.path.join(path, filename)
+        info = tarfile.TarInfo(f"{name}/{filename}")
+        info.size = os.path.getsize(file_path)
+        info.mtime = int(os.path.getmtime(file_path))
+        info.mode = 0o644
+        yield info.tobuf(format=tarfile.PAX_FORMAT)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                yield chunk
+        if info.size % tarfile.BLOCKSIZE:
+            yield tarfile.NUL * (tarfile.BLOCKSIZE - info.size % tarfile.BLOCKSIZE)
+    yield tarfile.NUL * (tarfile.BLOCKSIZE * 2)
@@ -0,0 +1,4 @@
+def run_in_app_context(app, func, *args):
+    """在应用上下文中执行定时任务，使其可以使用 current_app、db.session 和连接池"""
+    with app.app_context():
+        return func(*args)
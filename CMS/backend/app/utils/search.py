@@ -0,0 +1,116 @@
+import re
+import threading
+import time
+from flask import current_app
+
+# met_clear 全文索引（ngram 解析器，支持中文），由迁移 0009_met_clear_fulltext 创建
+FULLTEXT_INDEX_NAME = 'ft_met_clear_search'
+FULLTEXT_COLUMNS = ('title', 'artist', 'classify')
+MATCH_EXPR = "MATCH(`title`, `artist`, `classify`) AGAINST (%s IN BOOLEAN MODE)"
+
+# 布尔模式下有特殊含义的字符，检索词中需要去除
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+
+_state_lock = threading.Lock()
+_fulltext_state = {'available': None, 'checked_at': 0.0}
+
+
+class SearchPlan:
+    """一次检索的执行计划：WHERE 条件、参数、相关度表达式以及使用的引擎"""
+
+    def __init__(self):
+        self.conditions = []
+        self.params = []
+        self.relevance_sql = None
+        self.relevance_params = []
+        self.engine = None  # None 表示没有检索条件，否则为 'fulltext' 或 'like'
+
+
+def fulltext_available(cursor):
+    """检查 met_clear 上是否存在全文索引（结果缓存 SEARCH_INDEX_CHECK_TTL 秒）"""
+    ttl = current_app.config.get('SEARCH_INDEX_CHECK_TTL', 300)
+    with _state_lock:
+        if _fulltext_state['available'] is not None and time.monotonic() - _fulltext_state['checked_at'] < ttl:
+            return _fulltext_state['available']
+    try:
+        cursor.execute(
+            "SELECT COUNT(*) AS cnt FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'met_clear' "
+            "AND INDEX_NAME = %s AND INDEX_TYPE = 'FULLTEXT'",
+            (FULLTEXT_INDEX_NAME,)
+        )
+        row = cursor.fetchone()
+        available = bool(row and row['cnt'])
+    except Exception as e:
+        current_app.logger.warning(f"Could not inspect met_clear full-text index: {e}")
+        available = False
+    with _state_lock:
+        _fulltext_state['available'] = available
+        _fulltext_state['checked_at'] = time.monotonic()
+    return available
+
+
+def reset_fulltext_state():
+    """创建或删除全文索引后调用，强制下次重新检测"""
+    with _state_lock:
+        _fulltext_state['available'] = None
+
+
+def to_boolean_phrase(term):
+    """把用户输入转换为布尔模式下的短语检索串；无法使用全文检索时返回 None
+
+    ngram 解析器按 ngram_token_size（默认 2）切词，短于该长度的词无法命中索引。
+    """
+    cleaned = ' '.join(_BOOLEAN_OPERATORS.sub(' ', term).split())
+    min_len = current_app.config.get('SEARCH_MIN_TOKEN', 2)
+    if len(cleaned.replace(' ', '')) < min_len:
+        return None
+    return f'"{cleaned}"'
+
+
+def build_met_clear_search(cursor, field_filters, keyword='', engine=None):
+    """为 met_clear 的 title/artist/classify 过滤和组合关键词构建检索条件
+
+    Args:
+        cursor: 数据库游标（用于检测全文索引）
+        field_filters: {'title': ..., 'artist': ..., 'classify': ...}，逐字段模糊匹配
+        keyword: 组合关键词，在三个字段中任一命中即可，并提供相关度排序
+        engine: 'auto' / 'fulltext' / 'like'，为空时使用配置 SEARCH_ENGINE
+
+    Returns:
+        SearchPlan
+    """
+    plan = SearchPlan()
+    field_filters = {k: v.strip() for k, v in field_filters.items() if k in FULLTEXT_COLUMNS and v and v.strip()}
+    keyword = (keyword or '').strip()
+    if not field_filters and not keyword:
+        return plan
+
+    engine = engine or current_app.config.get('SEARCH_ENGINE', 'auto')
+    use_fulltext = engine != 'like' and fulltext_available(cursor)
+
+    # 全文索引先按词缩小候选集，再用 LIKE 在候选行上精确校验对应字段
+    for field, term in field_filters.items():
+        phrase = to_boolean_phrase(term) if use_fulltext else None
+        if phrase:
+            plan.conditions.append(MATCH_EXPR)
+            plan.params.append(phrase)
+            plan.engine = 'fulltext'
+        plan.conditions.append(f"`{field}` LIKE %s")
+        plan.params.append(f'%{term}%')
+
+    if keyword:
+        phrase = to_boolean_phrase(keyword) if use_fulltext else None
+        if phrase:
+            plan.conditions.append(MATCH_EXPR)
+            plan.params.append(phrase)
+            plan.relevance_sql = MATCH_EXPR
+            plan.relevance_params = [phrase]
+            plan.engine = 'fulltext'
+        else:
+            plan.conditions.append("(`title` LIKE %s OR `artist` LIKE %s OR `classify` LIKE %s)")
+            plan.params.extend([f'%{keyword}%'] * 3)
+
+    if plan.engine is None:
+        plan.engine = 'like'
+    return plan
@@ -0,0 +1,74 @@
+"""敏感词匹配性能对比脚本
+
+对比旧的逐词子串扫描实现与 Aho-Corasick 自动机（app/utils/moderation.py）
+在不同词表规模和评论语料规模下的耗时。
+
+用法: python benchmark_moderation.py [评论条数] [词表规模 ...]
+例如: python benchmark_moderation.py 20000 16 1000 5000
+"""
+import random
+import sys
+import time
+
+from app.utils.moderation import DEFAULT_SENSITIVE_WORDS, SensitiveWordMatcher
+
+# 常用汉字，用于生成随机评论和随机敏感词
+CHARSET = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处理"
+
+
+def naive_contains(text, sensitive_words_list):
+    """旧实现：每个词都对整段文本小写后做一次子串扫描"""
+    if not text:
+        return False
+    for word in sensitive_words_list:
+        if word.lower() in text.lower():
+            return True
+    return False
+
+
+def make_words(n, rng):
+    words = list(DEFAULT_SENSITIVE_WORDS)
+    while len(words) < n:
+        words.append(''.join(rng.choice(CHARSET) for _ in range(rng.randint(2, 5))))
+    return words[:n]
+
+
+def make_corpus(n, rng, words, hit_ratio=0.02):
+    corpus = []
+    for _ in range(n):
+        text = ''.join(rng.choice(CHARSET) for _ in range(rng.randint(20, 300)))
+        if rng.random() < hit_ratio:
+            pos = rng.randint(0, len(text))
+            text = text[:pos] + rng.choice(words) + text[pos:]
+        corpus.append(text)
+    return corpus
+
+
+def run(comment_count, word_counts):
+    rng = random.Random(42)
+    print(f"评论条数: {comment_count}")
+    print(f"{'词表规模':>8} {'旧实现(s)':>10} {'自动机构建(s)':>14} {'自动机扫描(s)':>14} {'加速比':>8} {'结果一致':>8}")
+    for word_count in word_counts:
+        words = make_words(word_count, rng)
+        corpus = make_corpus(comment_count, rng, words)
+
+        started = time.perf_counter()
+        naive_result = [naive_contains(text, words) for text in corpus]
+        naive_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        matcher = SensitiveWordMatcher((word, '') for word in words)
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        ac_result = [matcher.contains(text) for text in corpus]
+        scan_seconds = time.perf_counter() - started
+
+        speedup = naive_seconds / scan_seconds if scan_seconds else float('inf')
+        print(f"{word_count:>8} {naive_seconds:>10.3f} {build_seconds:>14.3f} {scan_seconds:>14.3f} {speedup:>7.1f}x {str(naive_result == ac_result):>8}")
+
+
+if __name__ == "__main__":
+    comments = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    sizes = [int(arg) for arg in sys.argv[2:]] or [16, 1000, 5000]
+    run(comments, sizes)
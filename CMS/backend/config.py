@@ -12,14 +12,103 @@ class Config:
     DB_NAME = os.environ.get('DB_NAME') or 'museumdb'
     
     # 默认使用阿里云MySQL数据库
-    SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # 连接池配置 - ORM 与原生 PyMySQL 连接共用同一个进程级连接池
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW') or 20)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)  # 秒，早于 MySQL wait_timeout 回收连接
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 10)  # 秒，借出连接的最长等待时间
+    DB_POOL_PRE_PING = (os.environ.get('DB_POOL_PRE_PING') or 'true').lower() == 'true'
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_POOL_MAX_OVERFLOW,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_pre_ping': DB_POOL_PRE_PING
+    }
+    
+    # 结构迁移: 部署时先执行 python migrate.py up；存在未执行的迁移时后端拒绝启动。
+    # 开启 DB_AUTO_MIGRATE 后改为启动时自动执行（大表 DDL 会在 Web 进程中运行，仅建议开发环境使用）
+    DB_AUTO_MIGRATE = (os.environ.get('DB_AUTO_MIGRATE') or 'false').lower() == 'true'
+    DB_MIGRATE_LOCK_TIMEOUT = int(os.environ.get('DB_MIGRATE_LOCK_TIMEOUT') or 300)  # 秒，等待其他进程执行完迁移的最长时间
+    
+    # 鉴权: 管理员角色/状态的进程内缓存有效期（秒）；AUTH_TRUST_JWT_ROLE=true 时直接信任令牌中的角色声明，
+    # 角色变更要等旧令牌过期（8 小时）才在其他进程中生效
+    ADMIN_CACHE_TTL = int(os.environ.get('ADMIN_CACHE_TTL') or 30)
+    AUTH_TRUST_JWT_ROLE = (os.environ.get('AUTH_TRUST_JWT_ROLE') or 'false').lower() == 'true'
+    
+    # 列表总数缓存有效期（秒），写操作会提前失效
+    COUNT_CACHE_TTL = int(os.environ.get('COUNT_CACHE_TTL') or 30)
+    
+    # 文物检索配置: auto 表示存在全文索引时使用 FULLTEXT，否则回退到 LIKE
+    SEARCH_ENGINE = os.environ.get('SEARCH_ENGINE') or 'auto'
+    SEARCH_MIN_TOKEN = int(os.environ.get('SEARCH_MIN_TOKEN') or 2)  # 与 MySQL ngram_token_size 保持一致
+    SEARCH_INDEX_CHECK_TTL = int(os.environ.get('SEARCH_INDEX_CHECK_TTL') or 300)
+    
+    # 评论自动审核配置
+    MODERATION_WATERMARK_COLUMN = os.environ.get('MODERATION_WATERMARK_COLUMN') or 'updated_at'  # 评论新增/编辑时由数据库刷新的时间列（见迁移 0005），审核状态变更不刷新
+    MODERATION_LOOKBACK_SECONDS = int(os.environ.get('MODERATION_LOOKBACK_SECONDS') or 120)
+    MODERATION_CHUNK_SIZE = int(os.environ.get('MODERATION_CHUNK_SIZE') or 1000)  # 每块读取/更新/提交的评论数
+    REVIEW_BATCH_CHUNK_SIZE = int(os.environ.get('REVIEW_BATCH_CHUNK_SIZE') or 1000)  # 批量审核每条 UPDATE 的评论数
+    
+    # 仪表盘统计快照: 定时刷新间隔与允许返回的最大快照年龄（秒）
+    DASHBOARD_REFRESH_SECONDS = int(os.environ.get('DASHBOARD_REFRESH_SECONDS') or 30)
+    DASHBOARD_STALENESS_SECONDS = int(os.environ.get('DASHBOARD_STALENESS_SECONDS') or 60)
+    
+    # 日志导出时每次从数据库读取并输出的行数
+    LOG_EXPORT_CHUNK_SIZE = int(os.environ.get('LOG_EXPORT_CHUNK_SIZE') or 1000)
+    
+    # met_clear 批量导入: 上传文件保存目录与每批写入的行数
+    IMPORT_DIR = os.environ.get('IMPORT_DIR') or 'imports'
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE') or 1000)
+    BULK_UPDATE_CHUNK_SIZE = int(os.environ.get('BULK_UPDATE_CHUNK_SIZE') or 500)  # 批量更新每个事务的行数
+    
+    # met_clear 批量删除任务: 每个事务删除的 id 数、块间停顿（秒）、running 状态多久未更新视为中断
+    BATCH_DELETE_CHUNK_SIZE = int(os.environ.get('BATCH_DELETE_CHUNK_SIZE') or 1000)
+    BATCH_DELETE_CHUNK_PAUSE = float(os.environ.get('BATCH_DELETE_CHUNK_PAUSE') or 0.05)
+    BATCH_DELETE_STALE_SECONDS = int(os.environ.get('BATCH_DELETE_STALE_SECONDS') or 300)
+    # 失败后的自动重试: 最多执行的次数（之后任务转为 failed），首次重试前的等待秒数（之后每次翻倍）
+    BATCH_DELETE_MAX_ATTEMPTS = int(os.environ.get('BATCH_DELETE_MAX_ATTEMPTS') or 5)
+    BATCH_DELETE_RETRY_BACKOFF = int(os.environ.get('BATCH_DELETE_RETRY_BACKOFF') or 60)
+    
     # 备份配置
     BACKUP_DIR = os.environ.get('BACKUP_DIR') or 'backups'
+    # 备份流式压缩: zstd（未安装 zstandard 时回退 gzip）/ gzip / none；threads 仅 zstd 有效，0 表示单线程
+    BACKUP_COMPRESSION = os.environ.get('BACKUP_COMPRESSION') or 'zstd'
+    BACKUP_COMPRESSION_LEVEL = int(os.environ.get('BACKUP_COMPRESSION_LEVEL') or 3)
+    BACKUP_COMPRESSION_THREADS = int(os.environ.get('BACKUP_COMPRESSION_THREADS') or 0)
+    BACKUP_STREAM_CHUNK_SIZE = int(os.environ.get('BACKUP_STREAM_CHUNK_SIZE') or 1024 * 1024)  # 每次从 mysqldump 读取的字节数
+    # 备份模式: single 为单个 mysqldump 进程；parallel 为多连接从同一快照按表/主键范围并行导出（需要 LOCK TABLES 权限）
+    BACKUP_MODE = os.environ.get('BACKUP_MODE') or 'single'
+    BACKUP_PARALLEL_WORKERS = int(os.environ.get('BACKUP_PARALLEL_WORKERS') or 4)
+    BACKUP_CHUNK_ROWS = int(os.environ.get('BACKUP_CHUNK_ROWS') or 500000)  # 大表每个主键范围块的估算行数
+    BACKUP_INSERT_ROWS = int(os.environ.get('BACKUP_INSERT_ROWS') or 1000)  # 每条 INSERT 语句包含的行数，也是导入时每批的行数
+    # 单文件模式的导出方式: mysqldump 或 python（内置引擎，不需要 mysqldump/mysql 客户端）
+    BACKUP_ENGINE = os.environ.get('BACKUP_ENGINE') or 'mysqldump'
+    BACKUP_DUMP_FORMAT = os.environ.get('BACKUP_DUMP_FORMAT') or 'sql'  # 内置引擎的输出: sql（多行 INSERT）或 rows（紧凑二进制）
+    # 增量备份: 开启后定时备份组成“全量 + 增量”链，每 BACKUP_FULL_EVERY 次做一次全量；
+    # 变化按主键块（BACKUP_BLOCK_ROWS 行一块）的校验和检测，只导出有变化的块
+    BACKUP_INCREMENTAL = (os.environ.get('BACKUP_INCREMENTAL') or 'false').lower() == 'true'
+    BACKUP_FULL_EVERY = int(os.environ.get('BACKUP_FULL_EVERY') or 7)
+    BACKUP_BLOCK_ROWS = int(os.environ.get('BACKUP_BLOCK_ROWS') or 1000)
+    # 备份/恢复在后台任务中执行（同一数据库同时只有一个任务）: 进度写回间隔，以及多久没有进度视为任务中断（秒）
+    BACKUP_JOB_PROGRESS_INTERVAL = float(os.environ.get('BACKUP_JOB_PROGRESS_INTERVAL') or 2.0)
+    BACKUP_JOB_STALE_SECONDS = int(os.environ.get('BACKUP_JOB_STALE_SECONDS') or 900)
     
     # 日志配置
     LOG_DIR = os.environ.get('LOG_DIR') or 'logs'
+    # 操作日志保留的整月数，更早的日志归档为压缩文件后从 operation_logs 删除（0 表示不归档）
+    LOG_RETENTION_MONTHS = int(os.environ.get('LOG_RETENTION_MONTHS') or 12)
+    LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR') or os.path.join(LOG_DIR, 'archive')
+    # 操作日志异步批量写入: 路由只入队，后台线程按批量大小或时间间隔写库，数据库不可用时写入溢出文件
+    AUDIT_LOG_ASYNC = (os.environ.get('AUDIT_LOG_ASYNC') or 'true').lower() == 'true'
+    AUDIT_LOG_QUEUE_SIZE = int(os.environ.get('AUDIT_LOG_QUEUE_SIZE') or 10000)
+    AUDIT_LOG_BATCH_SIZE = int(os.environ.get('AUDIT_LOG_BATCH_SIZE') or 200)
+    AUDIT_LOG_FLUSH_INTERVAL = float(os.environ.get('AUDIT_LOG_FLUSH_INTERVAL') or 1.0)  # 秒
+    AUDIT_LOG_ENQUEUE_TIMEOUT = float(os.environ.get('AUDIT_LOG_ENQUEUE_TIMEOUT') or 0.5)  # 秒，队列满时的最长等待
+    AUDIT_LOG_SPILL_DIR = os.environ.get('AUDIT_LOG_SPILL_DIR') or os.path.join(LOG_DIR, 'audit_spill')
 
 class DevelopmentConfig(Config):
     DEBUG = True
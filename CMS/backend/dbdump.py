@@ -0,0 +1,133 @@
+"""内置导出/导入引擎命令行入口（不需要 mysqldump / mysql 客户端）
+
+默认连接 config.py 中的 MySQL；--sqlite 改为本地 SQLite 文件，可在没有数据库服务器时
+离线测试与比较各格式、各压缩方式的吞吐量。
+
+用法:
+    python dbdump.py dump backups/museum.sql.zst --tables comments operation_logs
+    python dbdump.py dump /tmp/museum.rows.gz --format rows --compression gzip
+    python dbdump.py load backups/museum.sql.zst
+    python dbdump.py load /tmp/museum.rows.gz --sqlite /tmp/restore.db
+    python dbdump.py bench --generate 200000              # 生成示例 SQLite 库后测试
+    python dbdump.py bench --sqlite /tmp/museum.db         # 用已有 SQLite 库测试
+"""
+import argparse
+import datetime
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+# 禁用.env文件加载
+os.environ['FLASK_SKIP_DOTENV'] = '1'
+
+import pymysql
+
+from config import config
+from app.utils.backup_stream import BACKUP_SUFFIXES, resolve_compression
+from app.utils.dump_engine import DUMP_FORMATS, dump_database, load_dump
+from app.utils.db import db_params_from_config
+
+
+def connect(args):
+    if args.sqlite:
+        return sqlite3.connect(args.sqlite), 'sqlite'
+    return pymysql.connect(**db_params_from_config(config[args.config])), 'mysql'
+
+
+def generate_sample(path, rows):
+    """生成结构与 comments / operation_logs 相近的示例库"""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE comments (id INTEGER PRIMARY KEY, user_id INT, artifact_id INT, content TEXT, "
+                 "comment_time DATETIME, passed INT)")
+    conn.execute("CREATE TABLE operation_logs (id INTEGER PRIMARY KEY, admin_id INT, admin_username VARCHAR(50), "
+                 "operation_type VARCHAR(50), operation_content TEXT, operation_time DATETIME, ip_address VARCHAR(50))")
+    start = datetime.datetime(2024, 1, 1)
+    rng = random.Random(42)
+    for offset in range(0, rows, 10000):
+        batch = range(offset, min(offset + 10000, rows))
+        conn.executemany("INSERT INTO comments VALUES (?, ?, ?, ?, ?, ?)", [
+            (i + 1, rng.randint(1, 5000), rng.randint(1, 50000), f"评论内容 {i} " + 'x' * rng.randint(10, 200),
+             (start + datetime.timedelta(seconds=i * 37)).isoformat(' '), i % 2) for i in batch
+        ])
+        conn.executemany("INSERT INTO operation_logs VALUES (?, ?, ?, ?, ?, ?, ?)", [
+            (i + 1, i % 20, f"admin{i % 20}", '信息审核', f"审核评论 (ID: {i})，状态更新为: 通过",
+             (start + datetime.timedelta(seconds=i * 11)).isoformat(' '), f"10.0.{i % 256}.{i % 250}") for i in batch
+        ])
+    conn.commit()
+    conn.close()
+
+
+def bench(args):
+    workdir = tempfile.mkdtemp(prefix='dbdump_bench_')
+    source = args.sqlite
+    if args.generate:
+        source = os.path.join(workdir, 'source.db')
+        generate_sample(source, args.generate)
+    if not source:
+        raise SystemExit('bench 需要 --sqlite 或 --generate')
+    conn = sqlite3.connect(source)
+    print(f"{'格式':<6}{'压缩':<7}{'文件大小':>12}{'压缩比':>8}{'导出 行/秒':>14}{'导出 MB/秒':>12}{'导入 行/秒':>14}")
+    # 未安装 zstandard 时 zstd 回退为 gzip，去掉重复项
+    methods = list(dict.fromkeys(resolve_compression(m) for m in args.compression or ['zstd', 'gzip', 'none']))
+    for fmt in DUMP_FORMATS:
+        for method in methods:
+            path = os.path.join(workdir, f"dump_{fmt}_{method}")
+            started = time.time()
+            stats = dump_database(conn, 'sqlite', path, fmt=fmt, method=method, batch_rows=args.batch_rows)
+            dump_seconds = time.time() - started
+            target = sqlite3.connect(os.path.join(workdir, f"target_{fmt}_{method}.db"))
+            loaded = load_dump(target, 'sqlite', path, args.batch_rows)
+            target.close()
+            rows = loaded['rows']
+            print(f"{fmt:<6}{stats['compression']:<7}{stats['backup_size']:>12}{stats['compression_ratio'] or 0:>8}"
+                  f"{rows / dump_seconds:>14.0f}{stats['original_size'] / dump_seconds / 1048576:>12.1f}"
+                  f"{rows * 1000 / loaded['duration_ms']:>14.0f}")
+    conn.close()
+    print(f"临时文件: {workdir}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='内置导出/导入引擎')
+    parser.add_argument('command', choices=['dump', 'load', 'bench'])
+    parser.add_argument('path', nargs='?', help='备份文件路径')
+    parser.add_argument('--tables', nargs='*', help='dump: 要导出的表，默认全部')
+    parser.add_argument('--format', choices=DUMP_FORMATS, default='sql', help='dump: 输出格式')
+    parser.add_argument('--compression', nargs='*', choices=sorted(BACKUP_SUFFIXES), help='压缩方式（bench 可指定多个）')
+    parser.add_argument('--level', type=int, default=3, help='压缩级别')
+    parser.add_argument('--batch-rows', type=int, default=1000, help='每条 INSERT / 每批 executemany 的行数')
+    parser.add_argument('--no-create', action='store_true', help='load: 不删除重建表')
+    parser.add_argument('--generate', type=int, metavar='ROWS', help='bench: 生成每表 ROWS 行的示例 SQLite 库')
+    parser.add_argument('--sqlite', metavar='PATH', help='改为连接本地 SQLite 数据库')
+    parser.add_argument('--config', default=os.getenv('FLASK_CONFIG') or 'default', help='配置名称')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s %(message)s')
+    logger = logging.getLogger('dbdump')
+    if args.command == 'bench':
+        bench(args)
+        return 0
+    if not args.path:
+        parser.error(f'{args.command} 需要备份文件路径')
+
+    conn, dialect = connect(args)
+    try:
+        if args.command == 'dump':
+            method = (args.compression or ['zstd'])[0]
+            stats = dump_database(conn, dialect, args.path, args.tables, args.format, method, args.level,
+                                  batch_rows=args.batch_rows, logger=logger)
+            print(f"已导出 {args.path}: {stats['original_size']} -> {stats['backup_size']} 字节 "
+                  f"({stats['compression']}, 压缩比 {stats['compression_ratio']}), SHA-256 {stats['checksum']}")
+        else:
+            result = load_dump(conn, dialect, args.path, args.batch_rows, create=not args.no_create, logger=logger)
+            print(f"已导入 {result['tables']} 张表、{result['rows']} 行，耗时 {result['duration_ms']} ms")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
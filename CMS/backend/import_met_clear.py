@@ -0,0 +1,128 @@
+"""met_clear 批量导入命令行入口
+
+不启动 Web 服务，流式读取 CSV/JSONL 文件并分批写入 met_clear，每批写入一条汇总操作日志。
+导入中断后使用输出的任务号继续，已提交的批次不会重复插入。
+
+用法:
+    python import_met_clear.py items.csv --admin admin
+    python import_met_clear.py items.jsonl --batch-size 2000
+    python import_met_clear.py --resume 3f2a...c9 --admin admin
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import uuid
+from datetime import datetime
+
+# 禁用.env文件加载
+os.environ['FLASK_SKIP_DOTENV'] = '1'
+
+import pymysql
+from sqlalchemy import create_engine
+
+from config import config
+from app.models.log import OperationLog
+from app.utils.met_clear_import import (
+    ImportFileError, ImportJobStore, MetClearImporter, detect_format, load_met_clear_schema
+)
+from app.utils.db import db_params_from_config
+from app.utils.log_storage import record_rollups
+
+
+def find_admin(conn, username):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT id, username FROM admin_users WHERE username = %s", (username,))
+        return cursor.fetchone()
+
+
+def make_batch_logger(engine, admin):
+    """每批提交后写入一条操作日志，与 Web 端的异步写入相同：同一事务中按回填状态维护预聚合表"""
+    def on_batch(job_id, summary):
+        now = datetime.now()
+        content = (f"批量导入文物(met_clear): 任务 {job_id}, 第 {summary['first_row']}-{summary['last_row']} 行, "
+                   f"成功 {summary['inserted']} 条, 失败 {summary['failed']} 条")
+        with engine.begin() as connection:
+            connection.execute(OperationLog.__table__.insert(), [{
+                'admin_id': admin['id'], 'admin_username': admin['username'], 'operation_type': 'import_heritage',
+                'operation_content': content, 'operation_time': now, 'ip_address': None
+            }])
+            record_rollups(connection, [(now, 'import_heritage', admin['id'])])
+    return on_batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量导入 met_clear（CSV/JSONL）')
+    parser.add_argument('file', nargs='?', help='导入文件（.csv / .jsonl）')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='文件格式，默认按扩展名判断')
+    parser.add_argument('--resume', metavar='JOB_ID', help='继续执行中断的导入任务')
+    parser.add_argument('--batch-size', type=int, default=None, help='每批写入的行数')
+    parser.add_argument('--admin', default='admin', help='写入操作日志时使用的管理员用户名')
+    parser.add_argument('--config', default=os.getenv('FLASK_CONFIG') or 'default', help='配置名称')
+    args = parser.parse_args(argv)
+    if not args.file and not args.resume:
+        parser.error('需要指定导入文件或 --resume')
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s %(message)s')
+    app_config = config[args.config]
+    conn = pymysql.connect(cursorclass=pymysql.cursors.DictCursor, **db_params_from_config(app_config))
+    engine = create_engine(app_config.SQLALCHEMY_DATABASE_URI)
+    try:
+        admin = find_admin(conn, args.admin)
+        if admin is None:
+            print(f"管理员不存在: {args.admin}")
+            return 1
+        store = ImportJobStore(conn)
+
+        job_id = args.resume
+        if job_id is None:
+            try:
+                fmt = detect_format(args.file, args.format)
+            except ImportFileError as e:
+                print(e)
+                return 1
+            os.makedirs(app_config.IMPORT_DIR, exist_ok=True)
+            job_id = uuid.uuid4().hex
+            source_path = os.path.join(app_config.IMPORT_DIR, f'{job_id}.{fmt}')
+            shutil.copyfile(args.file, source_path)
+            store.create(os.path.basename(args.file), source_path, fmt, created_by=admin['username'], job_id=job_id)
+            print(f"导入任务: {job_id}")
+        elif store.get(job_id) is None:
+            print(f"导入任务不存在: {job_id}")
+            return 1
+        if not store.claim(job_id):
+            print(f"导入任务已完成或正在执行: {job_id}")
+            return 1
+
+        importer = MetClearImporter(
+            conn, load_met_clear_schema(conn),
+            batch_size=args.batch_size or app_config.IMPORT_BATCH_SIZE,
+            on_batch=make_batch_logger(engine, admin),
+            logger=logging.getLogger('met_clear_import')
+        )
+        try:
+            job = importer.run(job_id)
+        except ImportFileError as e:
+            print(f"导入失败: {e}")
+            return 1
+        except Exception as e:
+            print(f"导入中断: {e}\n可执行 python import_met_clear.py --resume {job_id} 继续")
+            return 1
+
+        errors = json.loads(job['errors'] or '[]')
+        for error in errors[:20]:
+            print(f"  第 {error['row']} 行: {error['error']}")
+        if job['failed_rows'] > 20:
+            print(f"  ……共 {job['failed_rows']} 行失败（最多保存 {len(errors)} 条错误详情）")
+        print(f"导入完成: 处理 {job['processed_rows']} 行，成功 {job['inserted_rows']} 行，"
+              f"失败 {job['failed_rows']} 行，共 {job['batches']} 批")
+        return 0
+    finally:
+        conn.close()
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
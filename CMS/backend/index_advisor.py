@@ -0,0 +1,74 @@
+"""索引顾问命令行入口
+
+对审核列表、文物列表、日志列表等接口实际生成的 SQL 逐条执行 EXPLAIN，
+标出全表扫描、filesort 和临时表，并列出尚未创建的推荐复合索引。
+推荐索引由迁移 0002_hot_query_indexes 定义，本工具只报告，不执行 DDL；缺失的索引通过 python migrate.py up 创建。
+
+用法:
+    python index_advisor.py
+    python index_advisor.py --json > report.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+# 禁用.env文件加载
+os.environ['FLASK_SKIP_DOTENV'] = '1'
+
+import pymysql
+from flask import Flask
+
+from config import config
+from app import db
+from app.utils.indexes import run_index_advisor
+from app.utils.db import db_params_from_config
+
+
+def print_report(report):
+    problems = 0
+    for entry in report:
+        mark = '×' if entry['issues'] else '✓'
+        print(f"{mark} {entry['name']}  ({entry['endpoint']})")
+        for row in entry['plan']:
+            print(f"    {row.get('table')}: type={row.get('type')} key={row.get('key')} rows={row.get('rows')} extra={row.get('Extra')}")
+        for issue in entry['issues']:
+            print(f"    ! {issue}")
+        for index in entry['missing_indexes']:
+            print(f"    缺少索引: {index}")
+        problems += bool(entry['issues'])
+    print(f"\n共检查 {len(report)} 条查询，{problems} 条存在问题")
+    if any(entry['missing_indexes'] for entry in report):
+        print("缺少的索引由迁移 0002_hot_query_indexes 定义，执行 python migrate.py up 创建")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='基于 EXPLAIN 的索引顾问')
+    parser.add_argument('--full-scan-rows', type=int, default=1000, help='预估扫描行数达到该值的全表扫描才报告')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出报告')
+    parser.add_argument('--config', default=os.getenv('FLASK_CONFIG') or 'default', help='配置名称')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s %(message)s')
+    # 只用于生成与接口一致的 SQL（检索与日志查询依赖应用上下文），不启动定时任务
+    app = Flask(__name__)
+    app.config.from_object(config[args.config])
+    db.init_app(app)
+
+    conn = pymysql.connect(cursorclass=pymysql.cursors.DictCursor, **db_params_from_config(app.config))
+    try:
+        with app.app_context():
+            report = run_index_advisor(conn, full_scan_rows=args.full_scan_rows)
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+        return 0
+    return 1 if print_report(report) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
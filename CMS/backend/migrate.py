@@ -0,0 +1,88 @@
+"""数据库结构迁移命令行入口
+
+迁移脚本位于 migrations/ 目录（NNNN_name.py，定义 up(ctx) / down(ctx)），
+执行记录保存在 schema_migrations 表中。数据库连接参数取自 config.py，
+也可以用 --sqlite 指定本地 SQLite 文件做演练或测试。
+
+用法:
+    python migrate.py status
+    python migrate.py up                    # 执行全部未执行的迁移
+    python migrate.py up --to 0002
+    python migrate.py down --steps 1
+    python migrate.py down --to 0001
+    python migrate.py new add_comment_flags
+    python migrate.py up --sqlite /tmp/museum.db
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+
+# 禁用.env文件加载
+os.environ['FLASK_SKIP_DOTENV'] = '1'
+
+import pymysql
+
+from config import config
+from app.utils.migrate import MIGRATIONS_DIR, Migrator, MigrationError
+from app.utils.db import db_params_from_config
+
+
+def print_reports(reports):
+    total = 0.0
+    for report in reports:
+        action = '执行' if report['direction'] == 'up' else '回滚'
+        print(f"✓ {action} {report['version']}_{report['name']}: {report['duration_ms']} ms")
+        for statement in report['statements']:
+            print(f"    {statement['duration_ms']:>10.2f} ms  {statement['sql'][:120]}")
+        total += report['duration_ms']
+    print(f"共 {len(reports)} 个迁移，耗时 {round(total, 2)} ms" if reports else "没有需要执行的迁移")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='版本化数据库结构迁移')
+    parser.add_argument('command', choices=['status', 'up', 'down', 'new'])
+    parser.add_argument('name', nargs='?', help='new 命令的迁移名称')
+    parser.add_argument('--to', help='up: 执行到该版本（含）；down: 回滚到该版本（不含更高版本）')
+    parser.add_argument('--steps', type=int, default=1, help='down 未指定 --to 时回滚的迁移数')
+    parser.add_argument('--no-online', action='store_true', help='MySQL 上不附加 ALGORITHM=INPLACE, LOCK=NONE')
+    parser.add_argument('--sqlite', metavar='PATH', help='改为连接本地 SQLite 数据库')
+    parser.add_argument('--config', default=os.getenv('FLASK_CONFIG') or 'default', help='配置名称')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s %(message)s')
+    if args.sqlite:
+        conn, dialect = sqlite3.connect(args.sqlite), 'sqlite'
+    elif args.command != 'new':
+        conn, dialect = pymysql.connect(**db_params_from_config(config[args.config])), 'mysql'
+    else:
+        conn, dialect = None, 'mysql'
+    migrator = Migrator(conn, dialect, MIGRATIONS_DIR, online=not args.no_online, logger=logging.getLogger('migrate'))
+
+    try:
+        if args.command == 'new':
+            if not args.name:
+                parser.error('new 命令需要迁移名称')
+            print(f"已创建 {migrator.create(args.name)}")
+        elif args.command == 'status':
+            for item in migrator.status():
+                applied = f"  {item['applied_at']}  {item['duration_ms']} ms" if item['applied_at'] else ''
+                print(f"[{item['state']:>7}] {item['version']}_{item['name']}{applied}  {item.get('description') or ''}")
+        elif args.command == 'up':
+            print_reports(migrator.upgrade(args.to))
+        else:
+            print_reports(migrator.downgrade(args.to, args.steps))
+    except MigrationError as e:
+        print(f"× {e}")
+        for statement in e.statements:
+            print(f"    {statement['duration_ms']:>10.2f} ms  {statement['sql'][:120]}")
+        return 1
+    finally:
+        if conn is not None:
+            conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
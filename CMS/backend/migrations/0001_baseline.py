@@ -0,0 +1,85 @@
+"""基线：后台自身使用的表（取代 create_*_tables.py / update_*.py 等一次性脚本）
+
+对已有数据库执行时，已存在的表会被跳过；随后的迁移在此基础上增量修改。
+met_clear 由数据清洗流程维护，不在此创建。
+"""
+
+
+def up(ctx):
+    ctx.create_table('admin_users', f"""
+        {ctx.auto_id()},
+        `username` VARCHAR(50) NOT NULL UNIQUE,
+        `password` VARCHAR(255) NOT NULL,
+        `email` VARCHAR(100),
+        `status` VARCHAR(20) DEFAULT 'active',
+        `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+        `last_login` DATETIME,
+        `role` VARCHAR(50) NOT NULL DEFAULT 'admin'
+    """)
+    ctx.add_column('admin_users', 'role', "VARCHAR(50) NOT NULL DEFAULT 'admin'")
+
+    ctx.create_table('mobile_users', f"""
+        {ctx.auto_id('userid')},
+        `username` VARCHAR(50) NOT NULL UNIQUE,
+        `email` VARCHAR(100),
+        `password` VARCHAR(255) NOT NULL,
+        `avatar` LONGBLOB,
+        `registration_time` DATETIME DEFAULT CURRENT_TIMESTAMP,
+        `last_login` DATETIME,
+        `status` VARCHAR(20) DEFAULT '正常'
+    """)
+    ctx.add_column('mobile_users', 'status', "VARCHAR(20) DEFAULT '正常'")
+
+    ctx.create_table('operation_logs', f"""
+        {ctx.auto_id()},
+        `admin_id` INT NOT NULL,
+        `admin_username` VARCHAR(50) NOT NULL,
+        `operation_type` VARCHAR(50) NOT NULL,
+        `operation_content` TEXT,
+        `operation_time` DATETIME DEFAULT CURRENT_TIMESTAMP,
+        `ip_address` VARCHAR(50)
+    """)
+    ctx.add_index('operation_logs', 'idx_operation_admin', ['admin_id'])
+
+    ctx.create_table('operation_log_rollups', """
+        `granularity` VARCHAR(10) NOT NULL,
+        `bucket_start` DATETIME NOT NULL,
+        `operation_type` VARCHAR(50) NOT NULL,
+        `admin_id` INT NOT NULL,
+        `count` INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (`granularity`, `bucket_start`, `operation_type`, `admin_id`)
+    """)
+
+    ctx.create_table('backup_records', f"""
+        {ctx.auto_id()},
+        `backup_name` VARCHAR(255) NOT NULL,
+        `backup_path` VARCHAR(512) NOT NULL,
+        `backup_size` BIGINT,
+        `backup_time` DATETIME DEFAULT CURRENT_TIMESTAMP,
+        `backup_type` VARCHAR(50) NOT NULL DEFAULT 'manual',
+        `status` VARCHAR(50) NOT NULL DEFAULT 'unknown',
+        `description` TEXT
+    """)
+
+    ctx.create_table('comments', f"""
+        {ctx.auto_id()},
+        `user_id` INT NOT NULL,
+        `artifact_id` INT NOT NULL,
+        `comment` TEXT NOT NULL,
+        `comment_time` DATETIME DEFAULT CURRENT_TIMESTAMP,
+        `passed` TINYINT DEFAULT 1
+    """)
+    ctx.add_index('comments', 'idx_comments_user_artifact', ['user_id', 'artifact_id'])
+    ctx.add_index('comments', 'idx_comments_artifact', ['artifact_id'])
+
+    ctx.create_table('loves', """
+        `user_id` INT NOT NULL,
+        `artifact_id` INT NOT NULL,
+        `love_time` DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (`user_id`, `artifact_id`)
+    """)
+    ctx.add_index('loves', 'idx_loves_artifact', ['artifact_id'])
+
+
+def down(ctx):
+    raise RuntimeError('基线迁移不支持回滚，请手动处理')
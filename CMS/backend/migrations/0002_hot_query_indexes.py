@@ -0,0 +1,24 @@
+"""审核列表、日志列表热点查询的复合索引
+
+INDEXES 是这些索引的唯一定义，index_advisor.py（app/utils/indexes.py）从这里读取并只报告缺失情况。
+"""
+
+INDEXES = [
+    ('comments', 'idx_comments_passed_time', ['passed', 'comment_time']),
+    ('comments', 'idx_comments_user_time', ['user_id', 'comment_time']),
+    ('comments', 'idx_comments_time', ['comment_time']),
+    ('mobile_users', 'idx_mobile_username', ['username']),
+    ('operation_logs', 'idx_operation_logs_time', ['operation_time']),
+    ('operation_logs', 'idx_operation_logs_type_time', ['operation_type', 'operation_time']),
+    ('operation_logs', 'idx_operation_logs_admin_time', ['admin_id', 'operation_time']),
+]
+
+
+def up(ctx):
+    for table, name, columns in INDEXES:
+        ctx.add_index(table, name, columns)
+
+
+def down(ctx):
+    for table, name, _ in reversed(INDEXES):
+        ctx.drop_index(table, name)
@@ -0,0 +1,18 @@
+"""备份记录增加压缩方式、原始大小、压缩比与 SHA-256 校验和"""
+
+COLUMNS = [
+    ('compression', 'VARCHAR(10) NULL'),
+    ('original_size', 'BIGINT NULL'),
+    ('compression_ratio', 'FLOAT NULL'),
+    ('checksum', 'VARCHAR(64) NULL'),
+]
+
+
+def up(ctx):
+    for column, definition in COLUMNS:
+        ctx.add_column('backup_records', column, definition)
+
+
+def down(ctx):
+    for column, _ in reversed(COLUMNS):
+        ctx.drop_column('backup_records', column)
@@ -0,0 +1,19 @@
+"""备份记录增加增量链字段：备份类别、上一个备份、链起点的全量备份"""
+
+COLUMNS = [
+    ('backup_kind', 'VARCHAR(20) NULL'),
+    ('parent_id', 'INT NULL'),
+    ('base_id', 'INT NULL'),
+]
+
+
+def up(ctx):
+    for column, definition in COLUMNS:
+        ctx.add_column('backup_records', column, definition)
+    ctx.add_index('backup_records', 'idx_backup_records_parent', ['parent_id'])
+
+
+def down(ctx):
+    ctx.drop_index('backup_records', 'idx_backup_records_parent')
+    for column, _ in reversed(COLUMNS):
+        ctx.drop_column('backup_records', column)
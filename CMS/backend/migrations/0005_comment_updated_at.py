@@ -0,0 +1,44 @@
+"""评论增加 updated_at（新增/编辑评论时由数据库刷新），作为自动审核增量扫描的水位列
+
+MySQL 上用 ON UPDATE CURRENT_TIMESTAMP；SQLite 没有 ON UPDATE，改用触发器，且只在 comment 列被修改时刷新。
+已有评论按 comment_time 回填。审核状态的 UPDATE 显式写 updated_at = updated_at，不会刷新该列。
+"""
+
+BACKFILL_CHUNK = 10000
+
+
+def up(ctx):
+    if ctx.dialect == 'sqlite':
+        # SQLite 的 ADD COLUMN 不允许 CURRENT_TIMESTAMP 这类非常量默认值
+        ctx.add_column('comments', 'updated_at', 'DATETIME NULL')
+        ctx.execute(
+            "CREATE TRIGGER IF NOT EXISTS `trg_comments_updated_at_insert` AFTER INSERT ON `comments` "
+            "FOR EACH ROW WHEN NEW.`updated_at` IS NULL "
+            "BEGIN UPDATE `comments` SET `updated_at` = COALESCE(NEW.`comment_time`, CURRENT_TIMESTAMP) WHERE `id` = NEW.`id`; END"
+        )
+        ctx.execute(
+            "CREATE TRIGGER IF NOT EXISTS `trg_comments_updated_at_update` AFTER UPDATE OF `comment` ON `comments` "
+            "FOR EACH ROW BEGIN UPDATE `comments` SET `updated_at` = CURRENT_TIMESTAMP WHERE `id` = NEW.`id`; END"
+        )
+    else:
+        # 默认值为 CURRENT_TIMESTAMP 的列不能在线添加（需要重建表）
+        ctx.add_column('comments', 'updated_at', 'DATETIME NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP',
+                       online=False)
+
+    # 按主键分块回填并逐块提交，避免一条 UPDATE 长时间锁住整张表；显式赋值时 ON UPDATE 不生效
+    max_id = ctx.query("SELECT MAX(`id`) FROM `comments`")[0][0] or 0
+    for lo in range(0, max_id, BACKFILL_CHUNK):
+        ctx.execute(
+            "UPDATE `comments` SET `updated_at` = COALESCE(`comment_time`, `updated_at`) WHERE `id` > %s AND `id` <= %s",
+            (lo, lo + BACKFILL_CHUNK)
+        )
+        ctx.conn.commit()
+    ctx.add_index('comments', 'idx_comments_updated', ['updated_at'])
+
+
+def down(ctx):
+    ctx.drop_index('comments', 'idx_comments_updated')
+    if ctx.dialect == 'sqlite':
+        ctx.execute("DROP TRIGGER IF EXISTS `trg_comments_updated_at_insert`")
+        ctx.execute("DROP TRIGGER IF EXISTS `trg_comments_updated_at_update`")
+    ctx.drop_column('comments', 'updated_at')
@@ -0,0 +1,13 @@
+"""操作日志预聚合表的回填状态（见 app/utils/log_storage.py 的 ensure_log_rollups）"""
+
+
+def up(ctx):
+    ctx.create_table('operation_log_rollup_state', """
+        `id` INT NOT NULL PRIMARY KEY,
+        `backfill_through_id` BIGINT NOT NULL DEFAULT 0,
+        `backfilled_at` DATETIME NULL
+    """)
+
+
+def down(ctx):
+    ctx.drop_table('operation_log_rollup_state')
@@ -0,0 +1,20 @@
+"""met_clear 批量删除任务增加尝试次数与下次重试时间（表由 app/utils/met_clear_delete.py 按需创建，不存在时跳过）"""
+
+COLUMNS = [
+    ('attempts', 'INT NOT NULL DEFAULT 0'),
+    ('next_attempt_at', 'DATETIME NULL'),
+]
+
+
+def up(ctx):
+    if not ctx.has_table('met_clear_delete_jobs'):
+        return
+    for column, definition in COLUMNS:
+        ctx.add_column('met_clear_delete_jobs', column, definition)
+
+
+def down(ctx):
+    if not ctx.has_table('met_clear_delete_jobs'):
+        return
+    for column, _ in reversed(COLUMNS):
+        ctx.drop_column('met_clear_delete_jobs', column)
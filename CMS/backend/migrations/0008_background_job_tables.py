@@ -0,0 +1,95 @@
+"""后台任务的状态表：备份/恢复任务、met_clear 批量删除与导入任务、自动审核断点
+
+此前由各模块在运行时 CREATE TABLE IF NOT EXISTS，已存在的表会被跳过（met_clear_delete_jobs 的重试列由 0007 补齐）。
+"""
+
+
+def up(ctx):
+    # lock_key 只在任务未结束时等于所在数据库的标识，结束时置空；
+    # 唯一约束保证同一数据库同时只有一个备份/恢复任务（跨进程也成立）
+    ctx.create_table('backup_jobs', """
+        `job_id` VARCHAR(32) NOT NULL PRIMARY KEY,
+        `job_type` VARCHAR(20) NOT NULL,
+        `status` VARCHAR(20) NOT NULL,
+        `lock_key` VARCHAR(255) UNIQUE,
+        `record_id` INT,
+        `backup_type` VARCHAR(50),
+        `description` TEXT,
+        `bytes_done` BIGINT NOT NULL DEFAULT 0,
+        `bytes_total` BIGINT,
+        `rows_done` BIGINT NOT NULL DEFAULT 0,
+        `rows_total` BIGINT,
+        `tables_done` INT NOT NULL DEFAULT 0,
+        `tables_total` INT,
+        `admin_id` INT,
+        `admin_username` VARCHAR(50),
+        `ip_address` VARCHAR(50),
+        `message` VARCHAR(500),
+        `created_at` DATETIME,
+        `started_at` DATETIME,
+        `updated_at` DATETIME,
+        `finished_at` DATETIME
+    """)
+
+    ctx.create_table('met_clear_delete_jobs', """
+        `job_id` VARCHAR(32) NOT NULL PRIMARY KEY,
+        `status` VARCHAR(20) NOT NULL,
+        `total_ids` INT NOT NULL,
+        `processed_ids` INT NOT NULL DEFAULT 0,
+        `deleted_rows` INT NOT NULL DEFAULT 0,
+        `chunk_count` INT NOT NULL,
+        `chunks_done` INT NOT NULL DEFAULT 0,
+        `admin_id` INT,
+        `admin_username` VARCHAR(50),
+        `ip_address` VARCHAR(50),
+        `message` VARCHAR(500),
+        `attempts` INT NOT NULL DEFAULT 0,
+        `next_attempt_at` DATETIME,
+        `created_at` DATETIME,
+        `started_at` DATETIME,
+        `updated_at` DATETIME,
+        `finished_at` DATETIME
+    """)
+    # 完整的 id 集合按块保存：升序 id 做差分后 zlib 压缩，连续 id 每块只占几十字节
+    ctx.create_table('met_clear_delete_job_chunks', """
+        `job_id` VARCHAR(32) NOT NULL,
+        `chunk_no` INT NOT NULL,
+        `id_count` INT NOT NULL,
+        `ids` MEDIUMBLOB NOT NULL,
+        `deleted_rows` INT,
+        `done` TINYINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (`job_id`, `chunk_no`)
+    """)
+
+    ctx.create_table('met_clear_import_jobs', """
+        `job_id` VARCHAR(32) NOT NULL PRIMARY KEY,
+        `source_name` VARCHAR(255),
+        `source_path` VARCHAR(500) NOT NULL,
+        `format` VARCHAR(10) NOT NULL,
+        `status` VARCHAR(20) NOT NULL,
+        `processed_rows` INT NOT NULL DEFAULT 0,
+        `inserted_rows` INT NOT NULL DEFAULT 0,
+        `failed_rows` INT NOT NULL DEFAULT 0,
+        `batches` INT NOT NULL DEFAULT 0,
+        `errors` MEDIUMTEXT,
+        `message` VARCHAR(500),
+        `created_by` VARCHAR(50),
+        `created_at` DATETIME,
+        `updated_at` DATETIME
+    """)
+
+    ctx.create_table('moderation_checkpoints', """
+        `job_name` VARCHAR(50) NOT NULL PRIMARY KEY,
+        `last_comment_id` INT NOT NULL DEFAULT 0,
+        `last_comment_time` DATETIME,
+        `word_list_version` VARCHAR(32),
+        `rescan_version` VARCHAR(32),
+        `rescan_from_id` INT NOT NULL DEFAULT 0,
+        `updated_at` DATETIME
+    """)
+
+
+def down(ctx):
+    for table in ('moderation_checkpoints', 'met_clear_import_jobs', 'met_clear_delete_job_chunks',
+                  'met_clear_delete_jobs', 'backup_jobs'):
+        ctx.drop_table(table)
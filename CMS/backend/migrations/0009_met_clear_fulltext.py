@@ -0,0 +1,21 @@
+"""met_clear 的 ngram 全文索引（取代 create_search_index.py），与 app/utils/search.py 的 FULLTEXT_INDEX_NAME / FULLTEXT_COLUMNS 一致
+
+met_clear 由数据清洗流程维护，表不存在时跳过；SQLite 没有 FULLTEXT 索引，同样跳过（检索回退到 LIKE）。
+"""
+
+INDEX_NAME = 'ft_met_clear_search'
+COLUMNS = ('title', 'artist', 'classify')
+
+
+def up(ctx):
+    if ctx.dialect != 'mysql' or not ctx.has_table('met_clear') or ctx.has_index('met_clear', INDEX_NAME):
+        return
+    # FULLTEXT 索引不支持 LOCK=NONE，建索引期间表只读；大表可能需要几分钟
+    column_list = ', '.join(f'`{c}`' for c in COLUMNS)
+    ctx.execute(f"ALTER TABLE `met_clear` ADD FULLTEXT INDEX `{INDEX_NAME}` ({column_list}) WITH PARSER ngram")
+
+
+def down(ctx):
+    if ctx.dialect != 'mysql' or not ctx.has_table('met_clear'):
+        return
+    ctx.drop_index('met_clear', INDEX_NAME)
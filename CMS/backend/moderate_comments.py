@@ -0,0 +1,123 @@
+"""评论审核命令行入口
+
+不启动 Web 服务，直接用多进程引擎对评论做一次敏感词审核，适合大规模回填。
+
+不指定 id 区间时为全量重扫：与定时审核任务共用 moderation_checkpoints 中的断点，
+进度随分片完成写入 rescan_from_id，中断后再次运行从断点继续；完成后记录词表版本与扫描水位，
+定时任务不再为同一词表重复全量重扫，只做增量审核。
+指定 --from-id/--to-id 时只审核该区间，不读写断点。
+
+用法:
+    python moderate_comments.py --workers 8
+    python moderate_comments.py --from-id 100000 --to-id 200000 --words-file words.txt
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+
+# 禁用.env文件加载
+os.environ['FLASK_SKIP_DOTENV'] = '1'
+
+import pymysql
+
+from config import config
+from app.utils.moderation import resolve_categories, word_list_version
+from app.utils.db import db_params_from_config
+from app.utils.moderation_engine import ModerationEngine
+from app.utils.moderation_job import JOB_NAME
+
+
+def load_words(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith('#')]
+
+
+def load_checkpoint(conn, job_name=JOB_NAME):
+    """读取（不存在时创建）与定时审核任务共用的断点记录"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT * FROM moderation_checkpoints WHERE job_name = %s", (job_name,))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                "INSERT INTO moderation_checkpoints (job_name, last_comment_id, rescan_from_id, updated_at) "
+                "VALUES (%s, 0, 0, %s)", (job_name, datetime.now())
+            )
+            cursor.execute("SELECT * FROM moderation_checkpoints WHERE job_name = %s", (job_name,))
+            row = cursor.fetchone()
+    conn.commit()
+    return row
+
+
+def save_checkpoint(conn, job_name=JOB_NAME, **fields):
+    assignments = ', '.join(f"`{name}` = %s" for name in fields)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE moderation_checkpoints SET {assignments}, `updated_at` = %s WHERE job_name = %s",
+            tuple(fields.values()) + (datetime.now(), job_name)
+        )
+    conn.commit()
+
+
+def full_rescan(engine, db_params, version, logger):
+    """全量重扫并维护断点：同一词表的重扫从 rescan_from_id 继续，完成后记录词表版本与扫描水位"""
+    conn = pymysql.connect(cursorclass=pymysql.cursors.DictCursor, **db_params)
+    try:
+        checkpoint = load_checkpoint(conn)
+        with conn.cursor() as cursor:
+            # 与定时任务相同，以数据库时间作为本次扫描的水位
+            cursor.execute("SELECT NOW() AS now")
+            scan_started = cursor.fetchone()['now']
+        if checkpoint['rescan_version'] == version:
+            from_id = checkpoint['rescan_from_id']
+            logger.info(f"Resuming full moderation rescan from comment ID {from_id}.")
+        else:
+            from_id = 0
+            save_checkpoint(conn, rescan_version=version, rescan_from_id=0)
+
+        stats = engine.run(from_id=from_id, to_id=None,
+                           on_progress=lambda safe_id: save_checkpoint(conn, rescan_from_id=safe_id))
+
+        last_comment_id = max(checkpoint['last_comment_id'] or 0, stats['max_id'] or 0)
+        save_checkpoint(conn, word_list_version=version, rescan_version=None, rescan_from_id=0,
+                        last_comment_id=last_comment_id, last_comment_time=scan_started)
+        return stats
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='并行审核评论中的敏感词')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='工作进程数')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='每块读取/更新/提交的评论数')
+    parser.add_argument('--from-id', type=int, default=None, help='只处理 id 大于该值的评论')
+    parser.add_argument('--to-id', type=int, default=None, help='只处理 id 小于等于该值的评论')
+    parser.add_argument('--words-file', help='敏感词文件（每行一个词），默认使用内置词表')
+    parser.add_argument('--config', default=os.getenv('FLASK_CONFIG') or 'default', help='配置名称')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s %(message)s')
+    logger = logging.getLogger('moderation')
+    words = load_words(args.words_file) if args.words_file else None
+    categories = resolve_categories(words)
+    db_params = db_params_from_config(config[args.config])
+
+    engine = ModerationEngine(
+        db_params,
+        categories=categories,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        logger=logger
+    )
+    if args.from_id is not None or args.to_id is not None:
+        stats = engine.run(from_id=args.from_id or 0, to_id=args.to_id)
+    else:
+        stats = full_rescan(engine, db_params, word_list_version(categories=categories), logger)
+    print(f"审核完成: 共审核 {stats['reviewed']} 条评论，标记 {stats['flagged']} 条，"
+          f"耗时 {stats['elapsed_seconds']} 秒，吞吐量 {stats['comments_per_second']} 条/秒")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -26,6 +26,31 @@ export function restoreBackup(id) {
   })
 }
 
+// 最近的备份/恢复任务
+export function getBackupJobs(params) {
+  return request({
+    url: '/api/backup/jobs',
+    method: 'get',
+    params
+  })
+}
+
+// 查询备份/恢复任务的进度
+export function getBackupJob(jobId) {
+  return request({
+    url: `/api/backup/jobs/${jobId}`,
+    method: 'get'
+  })
+}
+
+// 取消备份/恢复任务
+export function cancelBackupJob(jobId) {
+  return request({
+    url: `/api/backup/jobs/${jobId}/cancel`,
+    method: 'post'
+  })
+}
+
 // 删除备份
 export function deleteBackup(id) {
   return request({
@@ -50,4 +50,12 @@ export function batchDeleteMetClearItems(ids) {
     method: 'delete',
     data: { ids } // 将ids数组作为请求体发送，通常DELETE请求体通过data参数
   })
+}
+
+// 查询批量删除任务的进度
+export function getBatchDeleteJob(jobId) {
+  return request({
+    url: `/api/heritage/met-clear/batch-delete/${jobId}`,
+    method: 'get'
+  })
 } 
\ No newline at end of file
@@ -18,6 +18,16 @@ export function updateCommentStatus(commentId, passedStatus) {
   })
 }
 
+// 批量更新评论审核状态
+// payload: { ids, passed } / { decisions: [{ id, passed }] } / { filter: { passed, user, keyword }, passed }
+export function batchUpdateCommentStatus(payload) {
+  return request({
+    url: '/api/reviews/comments/status',
+    method: 'put',
+    data: payload
+  })
+}
+
 // 更新移动用户状态
 export function updateMobileUserStatusByReview(userId, status) {
   return request({